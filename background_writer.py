@@ -0,0 +1,160 @@
+"""
+Runs a run's file and console output on a separate thread so that evolution does not wait for it
+"""
+import queue
+import threading
+import time
+from typing import Callable, List
+
+
+class BackgroundWriter:
+    """
+    Executes output tasks in order on a writer thread. Tasks are taken from a bounded queue in batches,
+        record logs are flushed once per batch, and console output is combined and printed at a limited rate
+    """
+    def __init__(self, background: bool, queue_size: int, console_interval: float):
+        """
+        :param background: Whether tasks should run on a writer thread.
+            If `False`, tasks run as soon as they are submitted
+        :param queue_size: The most tasks that can be waiting at once. Submitting to a full queue waits for space
+        :param console_interval: The minimum number of seconds between console prints
+        """
+        self.background = background
+        self.console_interval = console_interval
+
+        # Objects with a `flush` method that should be flushed after every batch of tasks
+        self.logs: List = []
+
+        self.console_output: List[str] = []
+        self.last_console_print = 0.0
+
+        self.error = None
+
+        self.tasks = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        if self.background:
+            self.thread = threading.Thread(target=self.process_tasks, daemon=True)
+            self.thread.start()
+
+    def register_log(self, log):
+        """
+        Adds a log that will be flushed after every batch of tasks
+        :param log: An object with a `flush` method
+        """
+        self.logs.append(log)
+
+    def submit(self, task: Callable, *args):
+        """
+        Adds a task to the queue
+        :param task: The function to run
+        :param args: The arguments to pass to the function
+        """
+        self.raise_error()
+
+        if self.background:
+            self.tasks.put((task, args))
+        else:
+            task(*args)
+            self.flush_logs()
+            self.print_console_output(force=True)
+
+    def print(self, text: str):
+        """
+        Prints text to the console. In background mode, text is combined with other waiting text
+            and printed at most once every `console_interval` seconds
+        :param text: The text to print
+        """
+        self.submit(self.add_console_output, text)
+
+    def add_console_output(self, text: str):
+        """
+        Adds text to the waiting console output. Should only be called from within a submitted task
+        :param text: The text to print
+        """
+        self.console_output.append(text)
+
+    def flush(self):
+        """
+        Waits until every submitted task has finished and all output has been written
+        """
+        if self.background:
+            self.tasks.join()
+            self.raise_error()
+
+    def close(self):
+        """
+        Finishes every submitted task, writes all remaining output, and stops the writer thread
+        """
+        if self.background and self.thread.is_alive():
+            self.tasks.put(None)
+            self.thread.join()
+
+        self.flush_logs()
+        self.print_console_output(force=True)
+        self.raise_error()
+
+    def process_tasks(self):
+        """
+        Runs on the writer thread. Takes every waiting task from the queue, runs them, then writes the batch's output
+        """
+        running = True
+        while running:
+            try:
+                batch = [self.tasks.get(timeout=max(self.console_interval, 0.1))]
+            except queue.Empty:
+                self.print_console_output(force=True)
+                continue
+
+            while not self.tasks.empty():
+                batch.append(self.tasks.get_nowait())
+
+            for task in batch:
+                if task is None:
+                    running = False
+                    continue
+
+                function, args = task
+                if self.error is None:
+                    try:
+                        function(*args)
+                    except Exception as error:
+                        self.error = error
+
+            try:
+                self.flush_logs()
+            except Exception as error:
+                self.error = error
+
+            self.print_console_output(force=not running)
+
+            for _ in batch:
+                self.tasks.task_done()
+
+    def flush_logs(self):
+        """
+        Flushes every registered log
+        """
+        for log in self.logs:
+            log.flush()
+
+    def print_console_output(self, force: bool):
+        """
+        Prints all waiting console output if enough time has passed since the last print
+        :param force: Whether the output should be printed regardless of the time since the last print
+        """
+        if len(self.console_output) == 0:
+            return
+
+        if force or time.time() - self.last_console_print >= self.console_interval:
+            print("\n".join(self.console_output))
+            self.console_output = []
+            self.last_console_print = time.time()
+
+    def raise_error(self):
+        """
+        Raises any error that occurred on the writer thread
+        """
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
@@ -0,0 +1,77 @@
+"""
+Saves and loads the state of an evolutionary run so that it can be resumed after a crash
+"""
+import os
+import pickle
+from typing import Dict, Optional
+
+import sim_controls as sc
+
+
+def create_checkpoint_filename(checkpoints_folder: str, run_index: int, num_legs: int, cpg_active: bool,
+                               num_frames: int = None) -> str:
+    """
+    Creates the filename of a run's checkpoint in the format
+        `<checkpoints folder>/checkpoint<index>(<number of legs>_legs, <active/inactive>_cpg).pkl`.
+        If the run uses a different number of frames than `SIMULATION_CONTROLS`, `, <frames>_frames` is added
+    :param checkpoints_folder: The folder the checkpoint is saved in
+    :param run_index: The index of the evolutionary run
+    :param num_legs: The number of legs of the robots
+    :param cpg_active: Whether the robots have a cpg
+    :param num_frames: The number of frames each robot is simulated for
+    :return: The checkpoint filename
+    """
+    if cpg_active:
+        cpg_mode = "active_cpg"
+    else:
+        cpg_mode = "inactive_cpg"
+
+    if num_frames is not None and num_frames != sc.SIMULATION_CONTROLS["num_frames"]:
+        cpg_mode += ", " + str(num_frames) + "_frames"
+
+    return os.path.join(checkpoints_folder,
+                        "checkpoint" + str(run_index) + "(" + str(num_legs) + "_legs, " + cpg_mode + ").pkl")
+
+
+def save_checkpoint(filename: str, state: Dict):
+    """
+    Saves a checkpoint. The checkpoint is written to a temporary file that then replaces the old checkpoint,
+        so a crash while saving never leaves a partially written checkpoint
+    :param filename: The checkpoint file
+    :param state: The state of the run
+    """
+    folder = os.path.dirname(filename)
+    if folder != "":
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as fileout:
+        pickle.dump(state, fileout, protocol=pickle.HIGHEST_PROTOCOL)
+        fileout.flush()
+        os.fsync(fileout.fileno())
+
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename: str) -> Optional[Dict]:
+    """
+    Loads a checkpoint
+    :param filename: The checkpoint file
+    :return: The state of the run, or `None` if there is no checkpoint
+    """
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "rb") as filein:
+        return pickle.load(filein)
+
+
+def truncate_output_file(filename: str, offset: int):
+    """
+    Removes everything written to an output file after a checkpoint was saved
+    :param filename: The output file
+    :param offset: The size of the file when the checkpoint was saved
+    """
+    if os.path.exists(filename) and os.path.getsize(filename) > offset:
+        with open(filename, "r+b") as fileout:
+            fileout.truncate(offset)
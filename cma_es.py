@@ -0,0 +1,226 @@
+"""
+Evolves robots with the Covariance Matrix Adaptation Evolution Strategy (CMA-ES).
+    Each generation, every weight of every child, and the cpg rate if the cpg is active, is sampled at once from
+    a Gaussian distribution, which is then moved toward and shaped by the fittest children
+"""
+import math
+from typing import Dict, Optional
+
+import numpy
+
+from hillclimber import Hillclimber
+import sim_controls as sc
+
+
+class CovarianceMatrixAdaptation:
+    """
+    A Gaussian search distribution over genome vectors, updated with the (mu/mu_w, lambda) rules of CMA-ES
+    """
+    def __init__(self, mean: numpy.ndarray, sigma: float, num_samples: int):
+        """
+        :param mean: The starting mean of the distribution
+        :param sigma: The starting step size
+        :param num_samples: How many vectors are sampled each generation
+        """
+        self.num_dimensions = len(mean)
+        self.num_samples = num_samples
+
+        self.mean = numpy.array(mean, dtype=float)
+        self.sigma = sigma
+        self.covariance = numpy.eye(self.num_dimensions)
+        self.sigma_path = numpy.zeros(self.num_dimensions)
+        self.covariance_path = numpy.zeros(self.num_dimensions)
+        self.num_updates = 0
+
+        # The eigenvectors and the square roots of the eigenvalues of the covariance matrix
+        self.eigenvectors = numpy.eye(self.num_dimensions)
+        self.scales = numpy.ones(self.num_dimensions)
+
+        n = self.num_dimensions
+
+        # Only the fittest half of the samples move the distribution, the fittest most
+        self.num_selected = max(1, num_samples // 2)
+        recombination_weights = math.log(self.num_selected + 0.5) - numpy.log(numpy.arange(1, self.num_selected + 1))
+        self.recombination_weights = recombination_weights / recombination_weights.sum()
+        self.effective_selected = 1 / numpy.sum(self.recombination_weights ** 2)
+
+        mu_eff = self.effective_selected
+        self.covariance_path_rate = (4 + mu_eff / n) / (n + 4 + 2 * mu_eff / n)
+        self.sigma_path_rate = (mu_eff + 2) / (n + mu_eff + 5)
+        self.rank_one_rate = 2 / ((n + 1.3) ** 2 + mu_eff)
+        self.rank_mu_rate = min(1 - self.rank_one_rate, 2 * (mu_eff - 2 + 1 / mu_eff) / ((n + 2) ** 2 + mu_eff))
+        self.sigma_damping = 1 + 2 * max(0.0, math.sqrt((mu_eff - 1) / (n + 1)) - 1) + self.sigma_path_rate
+        # The expected length of a vector sampled from a standard normal distribution
+        self.expected_length = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+    def sample(self, numpy_random: numpy.random.Generator) -> numpy.ndarray:
+        """
+        :param numpy_random: The random number generator of the run
+        :return: The sampled vectors, with the shape (samples, dimensions)
+        """
+        standard_samples = numpy_random.standard_normal((self.num_samples, self.num_dimensions))
+
+        return self.mean + self.sigma * (standard_samples * self.scales) @ self.eigenvectors.T
+
+    def update(self, samples: numpy.ndarray, fitness: numpy.ndarray):
+        """
+        Moves the distribution toward the fittest samples and adapts its shape and step size
+        :param samples: The vectors that were evaluated, with the shape (samples, dimensions).
+            They can differ from the sampled vectors, such as after clipping
+        :param fitness: The fitness of each vector
+        """
+        fittest_indices = numpy.argsort(-fitness, kind="stable")[:self.num_selected]
+        steps = (samples[fittest_indices] - self.mean) / self.sigma
+        mean_step = self.recombination_weights @ steps
+
+        self.mean = self.mean + self.sigma * mean_step
+        self.num_updates += 1
+
+        mu_eff = self.effective_selected
+        inverse_sqrt_covariance = (self.eigenvectors / self.scales) @ self.eigenvectors.T
+
+        self.sigma_path = (1 - self.sigma_path_rate) * self.sigma_path \
+            + math.sqrt(self.sigma_path_rate * (2 - self.sigma_path_rate) * mu_eff) \
+            * (inverse_sqrt_covariance @ mean_step)
+
+        sigma_path_length = numpy.linalg.norm(self.sigma_path)
+        # Stops the covariance path from growing while the step size is increasing quickly
+        path_is_short = sigma_path_length / math.sqrt(1 - (1 - self.sigma_path_rate) ** (2 * self.num_updates)) \
+            / self.expected_length < 1.4 + 2 / (self.num_dimensions + 1)
+
+        self.covariance_path = (1 - self.covariance_path_rate) * self.covariance_path
+        if path_is_short:
+            self.covariance_path += math.sqrt(self.covariance_path_rate * (2 - self.covariance_path_rate) * mu_eff) \
+                * mean_step
+
+        rank_one = numpy.outer(self.covariance_path, self.covariance_path)
+        if not path_is_short:
+            rank_one += self.covariance_path_rate * (2 - self.covariance_path_rate) * self.covariance
+        rank_mu = (steps.T * self.recombination_weights) @ steps
+
+        self.covariance = (1 - self.rank_one_rate - self.rank_mu_rate) * self.covariance \
+            + self.rank_one_rate * rank_one + self.rank_mu_rate * rank_mu
+
+        self.sigma *= math.exp((self.sigma_path_rate / self.sigma_damping)
+                               * (sigma_path_length / self.expected_length - 1))
+
+        self.decompose_covariance()
+
+    def decompose_covariance(self):
+        """
+        Updates the eigenvectors and scales used for sampling from the covariance matrix
+        """
+        # Removes the asymmetry left by rounding errors
+        self.covariance = (self.covariance + self.covariance.T) / 2
+
+        eigenvalues, self.eigenvectors = numpy.linalg.eigh(self.covariance)
+        self.scales = numpy.sqrt(numpy.maximum(eigenvalues, 1e-20))
+
+    def get_state(self) -> Dict:
+        """
+        :return: Everything needed to continue the distribution's updates
+        """
+        return {"mean": self.mean.copy(),
+                "sigma": self.sigma,
+                "covariance": self.covariance.copy(),
+                "sigma_path": self.sigma_path.copy(),
+                "covariance_path": self.covariance_path.copy(),
+                "num_updates": self.num_updates}
+
+    def set_state(self, state: Dict):
+        """
+        :param state: The state created by `get_state`
+        """
+        self.mean = state["mean"].copy()
+        self.sigma = state["sigma"]
+        self.covariance = state["covariance"].copy()
+        self.sigma_path = state["sigma_path"].copy()
+        self.covariance_path = state["covariance_path"].copy()
+        self.num_updates = state["num_updates"]
+
+        self.decompose_covariance()
+
+
+class CMAES(Hillclimber):
+    """
+    Simulates and evolves a set of robots by sampling every child of a generation from one adapted distribution.
+        Child `i` replaces parent `i` if it is fitter, so the parents are the fittest solution found in each slot
+        and the outputs have the same format as the hill climber's
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the same arguments as `Hillclimber`
+        """
+        self.distribution: Optional[CovarianceMatrixAdaptation] = None
+        # The distribution's state loaded from the checkpoint, used once the distribution is created
+        self.resumed_distribution_state: Optional[Dict] = None
+        # The genome vectors of the current children, with the shape (children, dimensions)
+        self.samples: Optional[numpy.ndarray] = None
+
+        super().__init__(*args, **kwargs)
+
+    def create_distribution(self):
+        """
+        Creates the search distribution, centered on the recombination of the fittest parents
+        """
+        parent_list = [self.parents[i] for i in range(0, len(self.parents))]
+
+        self.distribution = CovarianceMatrixAdaptation(parent_list[0].get_genome_vector(),
+                                                       sc.EVOLUTION_CONTROLS["cma_initial_sigma"],
+                                                       num_samples=self.population_size)
+
+        if self.resumed_distribution_state is not None:
+            self.distribution.set_state(self.resumed_distribution_state)
+            self.resumed_distribution_state = None
+        else:
+            genomes = numpy.array([parent.get_genome_vector() for parent in parent_list])
+            fittest_indices = numpy.argsort(-numpy.array([parent.fitness for parent in parent_list]),
+                                            kind="stable")[:self.distribution.num_selected]
+
+            self.distribution.mean = self.distribution.recombination_weights @ genomes[fittest_indices]
+
+    def mutate_child_solutions(self):
+        """
+        Replaces the genome of every child with a vector sampled from the distribution
+        """
+        if self.distribution is None:
+            self.create_distribution()
+
+        samples = self.distribution.sample(self.numpy_random)
+
+        for child, genome in zip(self.get_child_list(), samples):
+            child.set_genome_vector(genome)
+
+        self.samples = samples
+
+    def select(self):
+        """
+        Updates the distribution with the fitness of the children, then keeps each child that is fitter than its parent
+        """
+        fitness = numpy.array([child.fitness for child in self.get_child_list()])
+        self.distribution.update(self.samples, fitness)
+
+        super().select()
+
+    def get_checkpoint_state(self) -> Dict:
+        """
+        Copies everything needed to resume the run, including the distribution
+        :return: The state of the run
+        """
+        state = super().get_checkpoint_state()
+
+        if self.distribution is not None:
+            state["distribution_state"] = self.distribution.get_state()
+        else:
+            state["distribution_state"] = None
+
+        return state
+
+    def restore_checkpoint_state(self, state: Dict):
+        """
+        Sets the population, generation, random number generators, and distribution to the values saved in a checkpoint
+        :param state: The state loaded from the checkpoint
+        """
+        super().restore_checkpoint_state(state)
+
+        self.resumed_distribution_state = state.get("distribution_state")
@@ -1,11 +1,21 @@
+import os
+
 # Folder Naming #
-DATA_FOLDER_NAME = "data\\"
-SOLUTIONS_FOLDER_NAME = "solutions\\"
-FITNESS_FOLDER_NAME = "fitness\\"
-OBJECTS_FOLDER_NAME = "objects\\"
+DATA_FOLDER_NAME = "data"
+SOLUTIONS_FOLDER_NAME = "solutions"
+FITNESS_FOLDER_NAME = "fitness"
+OBJECTS_FOLDER_NAME = "objects"
+LINEAGE_FOLDER_NAME = "lineage"
+CHECKPOINTS_FOLDER_NAME = "checkpoints"
+CACHE_FOLDER_NAME = "cache"
+SWEEPS_FOLDER_NAME = "sweeps"
+ISLANDS_FOLDER_NAME = "islands"
+ELITES_FOLDER_NAME = "elites"
+TUNING_FOLDER_NAME = "tuning"
+LANDSCAPES_FOLDER_NAME = "landscapes"
 
-WORLD_FILENAME = OBJECTS_FOLDER_NAME + "world.sdf"
-ROBOT_FILENAME = OBJECTS_FOLDER_NAME + "body.urdf"
+EVALUATION_CACHE_FILENAME = os.path.join(CACHE_FOLDER_NAME, "evaluations.sqlite")
+COST_MODEL_FILENAME = os.path.join(CACHE_FOLDER_NAME, "cost_model.json")
 
 
 # Robot Controls #
@@ -13,12 +23,21 @@ ROBOT_FILENAME = OBJECTS_FOLDER_NAME + "body.urdf"
 UPPER_LEG_MOTOR_JOINT_RANGE = 0.2
 # How much the joints connecting to the lower legs can rotate
 LOWER_LEG_MOTOR_JOINT_RANGE = 0.5
+# The maximum force each motor can apply
+MOTOR_MAX_FORCE = 40
+# The force of the velocity motor pybullet gives each joint when a body is loaded
+DEFAULT_JOINT_MOTOR_FORCE = 10
 # The smallest the CPG rate can get
 MIN_CPG_RATE = 1
 # The highest the CPG rate can be initialized to
 MAX_INITIAL_CPG_RATE = 100
 # The most the CPG can change in a given generation
 MAX_CPG_CHANGE = 20
+# The range of the synapse weights of optimizers that change every weight at once, matching random weights
+MIN_WEIGHT = -1.0
+MAX_WEIGHT = 1.0
+# The cpg rate is divided by this value in genome vectors, so that it varies on the same scale as the weights
+GENOME_CPG_RATE_SCALE = MAX_INITIAL_CPG_RATE / 2
 
 # Other Constants #
 # The gravity of the simulation
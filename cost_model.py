@@ -0,0 +1,97 @@
+"""
+Predicts how long a simulation takes from its robot's configuration, learned from the simulations that have been run
+"""
+import json
+import os
+import statistics
+import threading
+from typing import Dict, Tuple
+
+
+# The seconds per leg per frame assumed before any simulation has been timed. Only the order of predictions matters
+#   until then, since every configuration is scaled from it
+DEFAULT_SECONDS_PER_LEG_FRAME = 0.00005
+
+
+class CostModel:
+    """
+    The smoothed wall time of the simulations of each configuration of number of legs and number of frames.
+        Configurations that have not been timed are estimated from those that have,
+        assuming the time grows with the number of legs and the number of frames
+    """
+    def __init__(self, smoothing: float, filename: str = None):
+        """
+        :param smoothing: How much each new timing moves the prediction of its configuration, from `0` to `1`
+        :param filename: The file the model is loaded from and saved to, so it is not relearned by every run.
+            If `None`, the model is not saved
+        """
+        self.smoothing = smoothing
+        self.filename = filename
+        self.lock = threading.Lock()
+
+        self.seconds: Dict[Tuple[int, int], float] = {}
+
+        if self.filename is not None and os.path.exists(self.filename):
+            with open(self.filename, "r") as filein:
+                for num_legs, num_frames, seconds in json.load(filein):
+                    self.seconds[(num_legs, num_frames)] = seconds
+
+    def has_timings(self, num_legs: int, num_frames: int) -> bool:
+        """
+        :return: Whether any simulation of the configuration has been timed
+        """
+        with self.lock:
+            return (num_legs, num_frames) in self.seconds
+
+    def predict(self, num_legs: int, num_frames: int) -> float:
+        """
+        Predicts the wall time of a simulation
+        :param num_legs: The number of legs of the robot
+        :param num_frames: The number of frames it is simulated for
+        :return: The predicted number of seconds
+        """
+        with self.lock:
+            if (num_legs, num_frames) in self.seconds:
+                return self.seconds[(num_legs, num_frames)]
+
+            if len(self.seconds) > 0:
+                return statistics.median([seconds * (num_legs * num_frames) / (legs * frames)
+                                          for (legs, frames), seconds in self.seconds.items()])
+
+            return DEFAULT_SECONDS_PER_LEG_FRAME * num_legs * num_frames
+
+    def observe(self, num_legs: int, num_frames: int, seconds: float):
+        """
+        Updates the prediction of a configuration with the time a simulation took
+        :param num_legs: The number of legs of the robot
+        :param num_frames: The number of frames it was simulated for
+        :param seconds: The wall time of the simulation
+        """
+        with self.lock:
+            configuration = (num_legs, num_frames)
+
+            if configuration in self.seconds:
+                self.seconds[configuration] += self.smoothing * (seconds - self.seconds[configuration])
+            else:
+                self.seconds[configuration] = seconds
+
+    def save(self):
+        """
+        Writes the model to a temporary file that then replaces its file, so it is never left partially written
+        """
+        if self.filename is None:
+            return
+
+        folder = os.path.dirname(self.filename)
+        if folder != "":
+            os.makedirs(folder, exist_ok=True)
+
+        with self.lock:
+            timings = [[num_legs, num_frames, seconds] for (num_legs, num_frames), seconds in self.seconds.items()]
+
+        # Each process has its own temporary file, since separate runs may save at the same time
+        tmp_filename = self.filename + "." + str(os.getpid()) + ".tmp"
+        with open(tmp_filename, "w") as fileout:
+            json.dump(timings, fileout)
+
+        os.replace(tmp_filename, self.filename)
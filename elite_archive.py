@@ -0,0 +1,224 @@
+"""
+Keeps the fittest solutions of every run of each robot, so that later runs of the same robot can start from them.
+    The archive of each number of legs and cpg mode is a `.npz` file in the `elites` folder shared by every run
+"""
+import contextlib
+import glob
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Iterator, List, Tuple
+
+import numpy
+
+import constants as c
+
+
+# Matches the weights files saved by `Solution.save_weights`, capturing the solution index, number of legs,
+#   and cpg mode
+WEIGHTS_FILENAME_PATTERN = re.compile(r"weights(\d+)\((\d+)_legs, (active|inactive)_cpg\)\.npy$")
+
+# Serializes the updates of archives by the runs of one process, such as the jobs of a sweep
+ARCHIVE_LOCK = threading.Lock()
+# How long to wait between attempts to take an archive's lock file, which is held by another process
+LOCK_RETRY_SECONDS = 0.05
+# A lock file older than this is left behind by a process that stopped while holding it, and is removed
+STALE_LOCK_SECONDS = 60
+
+
+def create_elite_archive_filename(num_legs: int, cpg_active: bool) -> str:
+    """
+    Creates the filename of a robot's elite archive in the format
+        `elites/elites(<number of legs>_legs, <active/inactive>_cpg).npz`
+    :param num_legs: The number of legs of the robot
+    :param cpg_active: Whether the robot has a cpg
+    :return: A string filename
+    """
+    if cpg_active:
+        cpg_mode = "active"
+    else:
+        cpg_mode = "inactive"
+
+    return os.path.join(c.ELITES_FOLDER_NAME, "elites(" + str(num_legs) + "_legs, " + cpg_mode + "_cpg).npz")
+
+
+def is_compatible(weights: numpy.ndarray, num_legs: int) -> bool:
+    """
+    :param weights: A weight matrix
+    :param num_legs: The number of legs of the robot
+    :return: Whether the weight matrix has the shape of the robot's brain
+    """
+    return weights.shape == (2 * num_legs + 1, 2 * num_legs)
+
+
+def load_elites(num_legs: int, cpg_active: bool) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """
+    Reads a robot's elite archive. Elites whose weights do not fit the robot, or that were saved with a different
+        cpg mode, are left out
+    :param num_legs: The number of legs of the robot
+    :param cpg_active: Whether the robot has a cpg
+    :return: The weights of each elite, with the shape (elites, rows, columns), the cpg rate of each elite,
+        or `-1` if the cpg is not active, and the fitness of each elite, fittest first
+    """
+    num_rows = 2 * num_legs + 1
+    num_cols = 2 * num_legs
+    filename = create_elite_archive_filename(num_legs, cpg_active)
+
+    if not os.path.exists(filename):
+        return numpy.empty((0, num_rows, num_cols)), numpy.empty(0, dtype=int), numpy.empty(0)
+
+    with numpy.load(filename) as archive:
+        weights = archive["weights"]
+        cpg_rates = archive["cpg_rates"]
+        fitness = archive["fitness"]
+
+        compatible = bool(archive["cpg_active"]) == cpg_active \
+            and (len(weights) == 0 or is_compatible(weights[0], num_legs))
+
+        if not compatible:
+            print("*** The elite archive " + filename + " does not match the robot and was ignored ***")
+            return numpy.empty((0, num_rows, num_cols)), numpy.empty(0, dtype=int), numpy.empty(0)
+
+    order = numpy.argsort(-fitness, kind="stable")
+
+    return weights[order], cpg_rates[order], fitness[order]
+
+
+def find_elite_archive_leg_nums(cpg_active: bool) -> List[int]:
+    """
+    :param cpg_active: Whether the robots have a cpg
+    :return: The numbers of legs of the robots with the cpg mode that have an elite archive, in increasing order
+    """
+    if cpg_active:
+        cpg_mode = "active"
+    else:
+        cpg_mode = "inactive"
+
+    leg_nums = []
+    for filename in glob.glob(os.path.join(c.ELITES_FOLDER_NAME, "elites(*_legs, " + cpg_mode + "_cpg).npz")):
+        match = re.search(r"elites\((\d+)_legs, ", os.path.basename(filename))
+        if match is not None:
+            leg_nums.append(int(match.group(1)))
+
+    return sorted(leg_nums)
+
+
+@contextlib.contextmanager
+def lock_elite_archive(filename: str) -> Iterator[None]:
+    """
+    Holds an archive's lock while an update reads and replaces it. Runs of the same process wait on `ARCHIVE_LOCK`,
+        and runs of other processes, such as islands, wait until they can create the archive's lock file
+    :param filename: The archive file
+    """
+    lock_filename = filename + ".lock"
+
+    with ARCHIVE_LOCK:
+        while True:
+            try:
+                lock_file = os.open(lock_filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_filename) > STALE_LOCK_SECONDS:
+                        os.remove(lock_filename)
+                        continue
+                except FileNotFoundError:
+                    continue
+
+                time.sleep(LOCK_RETRY_SECONDS)
+
+        try:
+            yield
+        finally:
+            os.close(lock_file)
+            os.remove(lock_filename)
+
+
+def add_elites(num_legs: int, cpg_active: bool, weights: numpy.ndarray, cpg_rates: numpy.ndarray,
+               fitness: numpy.ndarray, max_elites: int):
+    """
+    Adds solutions to a robot's elite archive, keeping only the fittest `max_elites` different solutions.
+        The archive is locked while it is updated, so updates of runs that finish at the same time are all kept.
+        It is written to a temporary file that then replaces it, so it is never left partially written
+    :param num_legs: The number of legs of the robot
+    :param cpg_active: Whether the robot has a cpg
+    :param weights: The weights of each solution, with the shape (solutions, rows, columns)
+    :param cpg_rates: The cpg rate of each solution, or `-1` if the cpg is not active
+    :param fitness: The fitness of each solution
+    :param max_elites: The most solutions the archive keeps
+    """
+    filename = create_elite_archive_filename(num_legs, cpg_active)
+    os.makedirs(c.ELITES_FOLDER_NAME, exist_ok=True)
+
+    with lock_elite_archive(filename):
+        archived_weights, archived_cpg_rates, archived_fitness = load_elites(num_legs, cpg_active)
+
+        all_weights = numpy.concatenate((archived_weights, numpy.asarray(weights, dtype=float)))
+        all_cpg_rates = numpy.concatenate((archived_cpg_rates, numpy.asarray(cpg_rates, dtype=int)))
+        all_fitness = numpy.concatenate((archived_fitness, numpy.asarray(fitness, dtype=float)))
+
+        # A solution kept by several runs, such as a resumed run, is only archived once
+        kept_indices: List[int] = []
+        seen_solutions = set()
+        for index in numpy.argsort(-all_fitness, kind="stable"):
+            solution_key = (all_weights[index].tobytes(), int(all_cpg_rates[index]))
+
+            if solution_key not in seen_solutions:
+                seen_solutions.add(solution_key)
+                kept_indices.append(index)
+
+        kept_indices = kept_indices[:max_elites]
+
+        tmp_file, tmp_filename = tempfile.mkstemp(suffix=".tmp.npz", dir=c.ELITES_FOLDER_NAME)
+        with os.fdopen(tmp_file, "wb") as fileout:
+            numpy.savez(fileout, weights=all_weights[kept_indices], cpg_rates=all_cpg_rates[kept_indices],
+                        fitness=all_fitness[kept_indices], cpg_active=cpg_active)
+
+        os.replace(tmp_filename, filename)
+
+
+def find_saved_solutions(output_folder: str, num_legs: int,
+                         cpg_active: bool) -> List[Tuple[numpy.ndarray, int]]:
+    """
+    Finds the solutions of a robot saved in the `solutions` folder by earlier runs. Their fitness is not saved
+    :param output_folder: The folder that holds the `solutions` folder
+    :param num_legs: The number of legs of the robot
+    :param cpg_active: Whether the robot has a cpg
+    :return: The weights and cpg rate of each solution, or `-1` as the rate if the cpg is not active,
+        ordered by run folder and solution index
+    """
+    if cpg_active:
+        cpg_mode = "active"
+    else:
+        cpg_mode = "inactive"
+
+    solutions = []
+    for run_folder in sorted(glob.glob(os.path.join(output_folder, c.SOLUTIONS_FOLDER_NAME, "run*"))):
+        saved_solutions = []
+
+        for weights_filename in glob.glob(os.path.join(run_folder, "weights*.npy")):
+            match = WEIGHTS_FILENAME_PATTERN.search(os.path.basename(weights_filename))
+            if match is None or int(match.group(2)) != num_legs or match.group(3) != cpg_mode:
+                continue
+
+            weights = numpy.load(weights_filename)
+            if not is_compatible(weights, num_legs):
+                continue
+
+            cpg_rate = -1
+            if cpg_active:
+                cpg_rate_filename = os.path.join(run_folder, "cpg_rate" + match.group(1) + "(" + str(num_legs)
+                                                 + "_legs).txt")
+                if not os.path.exists(cpg_rate_filename):
+                    continue
+
+                with open(cpg_rate_filename) as filein:
+                    cpg_rate = int(filein.read().strip())
+
+            saved_solutions.append((int(match.group(1)), weights, cpg_rate))
+
+        solutions += [(weights, cpg_rate) for _, weights, cpg_rate in sorted(saved_solutions, key=lambda s: s[0])]
+
+    return solutions
@@ -0,0 +1,201 @@
+"""
+Evolves robots with a natural evolution strategy that estimates the gradient of fitness from antithetic samples.
+    Each pair of children adds and subtracts the same row of a shared noise table to the generation's mean genome,
+    so shared memory workers are only sent the row's offset and sign instead of a genome
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from hillclimber import Hillclimber
+from shared_memory_backend import GenerationBuffer, NoiseTable, PerturbationBuffer, create_perturbed_genome
+from solution import Solution
+import constants as c
+import sim_controls as sc
+
+
+# The decay rates of the averages of the gradient and the squared gradient used to scale each step (Adam)
+FIRST_MOMENT_DECAY = 0.9
+SECOND_MOMENT_DECAY = 0.999
+# Prevents division by zero when the squared gradient of a value is zero
+MOMENT_EPSILON = 1e-8
+
+
+def create_centered_ranks(fitness: numpy.ndarray) -> numpy.ndarray:
+    """
+    Replaces fitness values with their ranks, scaled to the range [-0.5, 0.5], so that the size of each step does not
+        depend on the scale of the fitness
+    :param fitness: The fitness of each sample
+    :return: The centered rank of each sample
+    """
+    if len(fitness) < 2:
+        return numpy.zeros(len(fitness))
+
+    ranks = numpy.empty(len(fitness))
+    ranks[numpy.argsort(fitness, kind="stable")] = numpy.arange(len(fitness))
+
+    return ranks / (len(fitness) - 1) - 0.5
+
+
+class EvolutionStrategy(Hillclimber):
+    """
+    Simulates and evolves a set of robots by moving a mean genome along the estimated gradient of fitness.
+        Child `i` replaces parent `i` if it is fitter, so the parents are the fittest solution found in each slot
+        and the outputs have the same format as the hill climber's
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the same arguments as `Hillclimber`
+        """
+        self.sigma = sc.EVOLUTION_CONTROLS["es_sigma"]
+        self.learning_rate = sc.EVOLUTION_CONTROLS["es_learning_rate"]
+
+        # The genome the children are sampled around, set once the first generation has been evaluated
+        self.mean: Optional[numpy.ndarray] = None
+        # The running averages of the gradient and the squared gradient, and the number of steps taken
+        self.first_moment: Optional[numpy.ndarray] = None
+        self.second_moment: Optional[numpy.ndarray] = None
+        self.num_steps = 0
+
+        self.noise_table: Optional[NoiseTable] = None
+        # The noise offset and sign of each current child, in the order they were spawned
+        self.offsets: Optional[numpy.ndarray] = None
+        self.signs: Optional[numpy.ndarray] = None
+        # The noise offset and sign of each current child by its solution id
+        self.perturbations: Dict[int, Tuple[int, int]] = {}
+
+        super().__init__(*args, **kwargs)
+
+    def get_noise_table(self) -> NoiseTable:
+        """
+        :return: The run's noise table, which is created the first time it is needed
+        """
+        if self.noise_table is None:
+            self.noise_table = NoiseTable(sc.EVOLUTION_CONTROLS["es_noise_table_size"])
+
+        return self.noise_table
+
+    def create_mean(self):
+        """
+        Starts the mean genome at the fittest parent
+        """
+        fittest_parent = max(self.parents.values(), key=lambda parent: parent.fitness)
+
+        self.mean = fittest_parent.get_genome_vector()
+        self.first_moment = numpy.zeros(len(self.mean))
+        self.second_moment = numpy.zeros(len(self.mean))
+        self.num_steps = 0
+
+    def mutate_child_solutions(self):
+        """
+        Replaces the genome of every child with the mean genome plus or minus a row of the noise table.
+            Consecutive children share a row with opposite signs
+        """
+        if self.mean is None:
+            self.create_mean()
+
+        noise_table = self.get_noise_table()
+        child_list = self.get_child_list()
+        num_pairs = math.ceil(len(child_list) / 2)
+
+        pair_offsets = self.numpy_random.integers(0, noise_table.size - len(self.mean) + 1, size=num_pairs)
+        self.offsets = numpy.repeat(pair_offsets, 2)[:len(child_list)]
+        self.signs = numpy.tile([1, -1], num_pairs)[:len(child_list)]
+
+        genomes = create_perturbed_genome(self.mean, noise_table.get_rows(self.offsets, len(self.mean)),
+                                          self.signs, self.sigma)
+
+        self.perturbations = {}
+        for child, genome, offset, sign in zip(child_list, genomes, self.offsets, self.signs):
+            child.set_genome_vector(genome)
+            self.perturbations[child.solution_id] = (int(offset), int(sign))
+
+    def create_generation_buffer(self, capacity: int, num_rows: int, num_cols: int) -> GenerationBuffer:
+        """
+        :param capacity: The most solutions the buffer can hold
+        :param num_rows: The number of rows of each weight matrix
+        :param num_cols: The number of columns of each weight matrix
+        :return: A new buffer that only holds the mean genome and the fitness of the children
+        """
+        return PerturbationBuffer(capacity, num_rows, num_cols, self.get_noise_table(), self.sigma,
+                                  self.parents[0].encoding)
+
+    def publish_solutions(self, solutions: List[Solution]):
+        """
+        Publishes the mean genome and the noise offset and sign of each solution,
+            or the full genome of each solution if any was not sampled from the mean
+        :param solutions: The solutions about to be evaluated
+        """
+        if all(solution.solution_id in self.perturbations for solution in solutions):
+            self.generation_buffer.publish_perturbations(self.mean, len(solutions[0].genome),
+                                                         [self.perturbations[solution.solution_id]
+                                                          for solution in solutions])
+        else:
+            self.generation_buffer.publish(solutions)
+
+    def select(self):
+        """
+        Moves the mean genome along the gradient estimated from the children's fitness,
+            then keeps each child that is fitter than its parent
+        """
+        fitness = numpy.array([child.fitness for child in self.get_child_list()])
+
+        noise = self.get_noise_table().get_rows(self.offsets, len(self.mean)).astype(numpy.float64)
+        gradient = (create_centered_ranks(fitness) * self.signs) @ noise / len(fitness)
+
+        self.num_steps += 1
+        self.first_moment = FIRST_MOMENT_DECAY * self.first_moment + (1 - FIRST_MOMENT_DECAY) * gradient
+        self.second_moment = SECOND_MOMENT_DECAY * self.second_moment + (1 - SECOND_MOMENT_DECAY) * gradient ** 2
+
+        step_size = self.learning_rate * math.sqrt(1 - SECOND_MOMENT_DECAY ** self.num_steps) \
+            / (1 - FIRST_MOMENT_DECAY ** self.num_steps)
+        self.mean = self.mean + step_size * self.first_moment / (numpy.sqrt(self.second_moment) + MOMENT_EPSILON)
+
+        # The cpg rate is left unrounded, so that it can change by less than one over several steps
+        num_weights = len(self.parents[0].genome)
+        numpy.clip(self.mean[:num_weights], c.MIN_WEIGHT, c.MAX_WEIGHT, out=self.mean[:num_weights])
+
+        super().select()
+
+    def close_shared_memory(self):
+        """
+        Stops the run's own shared memory workers and deletes its generation buffer and noise table
+        """
+        super().close_shared_memory()
+
+        if self.noise_table is not None:
+            self.noise_table.close()
+            self.noise_table = None
+
+    def get_checkpoint_state(self) -> Dict:
+        """
+        Copies everything needed to resume the run, including the mean genome and step averages
+        :return: The state of the run
+        """
+        state = super().get_checkpoint_state()
+
+        if self.mean is not None:
+            state["es_state"] = {"mean": self.mean.copy(),
+                                 "first_moment": self.first_moment.copy(),
+                                 "second_moment": self.second_moment.copy(),
+                                 "num_steps": self.num_steps}
+        else:
+            state["es_state"] = None
+
+        return state
+
+    def restore_checkpoint_state(self, state: Dict):
+        """
+        Sets the population, generation, random number generators, mean genome, and step averages to the values
+            saved in a checkpoint
+        :param state: The state loaded from the checkpoint
+        """
+        super().restore_checkpoint_state(state)
+
+        es_state = state.get("es_state")
+        if es_state is not None:
+            self.mean = es_state["mean"].copy()
+            self.first_moment = es_state["first_moment"].copy()
+            self.second_moment = es_state["second_moment"].copy()
+            self.num_steps = es_state["num_steps"]
@@ -0,0 +1,178 @@
+"""
+Remembers the fitness of every simulated genome so that identical genomes are never simulated twice, even across runs
+"""
+import collections
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+import numpy
+
+from trials import get_num_trials
+import constants as c
+import sim_controls as sc
+
+
+# Change this whenever the simulation changes in a way that is not captured by the evaluation key
+EVALUATION_KEY_VERSION = 1
+
+
+def create_evaluation_key(solution) -> str:
+    """
+    Creates a key that identifies the outcome of simulating a solution. Two solutions have the same key only if
+        they have the same weights, cpg, morphology, and simulation and physics settings
+    :param solution: The solution to be simulated
+    :return: The key as a hexadecimal string
+    """
+    if solution.cpg_active:
+        cpg_rate = solution.cpg_rate
+    else:
+        cpg_rate = None
+
+    parameters = (EVALUATION_KEY_VERSION, solution.num_legs, solution.cpg_active, cpg_rate, solution.num_frames,
+                  sc.SIMULATION_CONTROLS["simulate"], c.gravity["x"], c.gravity["y"], c.gravity["z"],
+                  c.UPPER_LEG_MOTOR_JOINT_RANGE, c.LOWER_LEG_MOTOR_JOINT_RANGE, c.MOTOR_MAX_FORCE)
+
+    # Added only when set so that the keys of earlier simulations stay the same
+    if sc.SIMULATION_CONTROLS["deterministic_contacts"]:
+        parameters += ("deterministic_contacts",)
+    if get_num_trials(sc.ROBUSTNESS_CONTROLS) > 1:
+        parameters += ("trials", tuple(sorted(sc.ROBUSTNESS_CONTROLS.items())))
+
+    weights = numpy.ascontiguousarray(solution.weights, dtype=numpy.float64)
+
+    key = hashlib.sha256(repr(parameters).encode("utf-8"))
+    key.update(repr(weights.shape).encode("utf-8"))
+    key.update(weights.tobytes())
+
+    return key.hexdigest()
+
+
+class EvaluationCache:
+    """
+    A fitness cache with a small in-memory front that is backed by a database on disk shared by every run
+    """
+    def __init__(self, filename: str, memory_entries: int, max_disk_entries: int):
+        """
+        :param filename: The database file
+        :param memory_entries: The most fitness values kept in memory. The least recently used are removed first
+        :param max_disk_entries: The most fitness values kept on disk. The least recently used are removed first
+        """
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        folder = os.path.dirname(filename)
+        if folder != "":
+            os.makedirs(folder, exist_ok=True)
+
+        # The cache may be used from a different thread than the one that created it, but never by two at once
+        self.connection = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS evaluations "
+                                "(key TEXT PRIMARY KEY, fitness REAL NOT NULL, last_used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS evaluations_last_used ON evaluations (last_used)")
+        self.connection.commit()
+
+        self.num_disk_entries = self.connection.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+        self.memory: collections.OrderedDict = collections.OrderedDict()
+        # Keys found on disk since the last `store_many`, whose last use time should be updated
+        self.used_disk_keys = []
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str) -> Optional[float]:
+        """
+        Gets the cached fitness of an evaluation
+        :param key: The key created by `create_evaluation_key`
+        :return: The fitness, or `None` if the evaluation is not cached
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return self.memory[key]
+
+        row = self.connection.execute("SELECT fitness FROM evaluations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self.used_disk_keys.append(key)
+        self.add_to_memory(key, row[0])
+
+        return row[0]
+
+    def store_many(self, fitness_values: Dict[str, float]):
+        """
+        Adds the results of new evaluations to the cache in a single database transaction
+        :param fitness_values: A dictionary matching each evaluation key to its fitness
+        """
+        now = time.time()
+
+        with self.connection:
+            self.connection.executemany("UPDATE evaluations SET last_used = ? WHERE key = ?",
+                                        [(now, key) for key in self.used_disk_keys])
+
+            for key, fitness in fitness_values.items():
+                cursor = self.connection.execute("INSERT OR IGNORE INTO evaluations VALUES (?, ?, ?)",
+                                                 (key, fitness, now))
+                if cursor.rowcount > 0:
+                    self.num_disk_entries += 1
+                else:
+                    self.connection.execute("UPDATE evaluations SET fitness = ?, last_used = ? WHERE key = ?",
+                                            (fitness, now, key))
+
+                self.add_to_memory(key, fitness)
+
+            if self.num_disk_entries > self.max_disk_entries:
+                self.evict(self.num_disk_entries - self.max_disk_entries)
+
+        self.used_disk_keys = []
+
+    def add_to_memory(self, key: str, fitness: float):
+        """
+        Adds a fitness value to the in-memory cache, removing the least recently used value if it is full
+        :param key: The evaluation key
+        :param fitness: The fitness
+        """
+        self.memory[key] = fitness
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def evict(self, num_entries: int):
+        """
+        Deletes the least recently used fitness values from the disk
+        :param num_entries: How many values to delete
+        """
+        self.connection.execute("DELETE FROM evaluations WHERE key IN "
+                                "(SELECT key FROM evaluations ORDER BY last_used LIMIT ?)", (num_entries,))
+
+        self.num_disk_entries = self.connection.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Gets how often evaluations were found in the cache
+        :return: A dictionary containing the number of memory hits, disk hits, and misses, and the hit rate
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        if lookups > 0:
+            hit_rate = (self.memory_hits + self.disk_hits) / lookups
+        else:
+            hit_rate = 0.0
+
+        return {"memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hit_rate}
+
+    def close(self):
+        """
+        Closes the database
+        """
+        self.connection.close()
@@ -0,0 +1,363 @@
+"""
+A bounded set of evaluation workers shared by several evolutionary runs
+"""
+import collections
+import threading
+import time
+from typing import Dict, List
+
+from cost_model import CostModel
+from shared_memory_backend import GenerationBuffer, SharedMemoryWorker
+import constants as c
+import sim_controls as sc
+
+
+class EvaluationBatch:
+    """
+    Tracks when every evaluation submitted together has finished
+    """
+    def __init__(self, num_tasks: int):
+        self.remaining_tasks = num_tasks
+        self.errors: List[BaseException] = []
+        self.done = threading.Event()
+
+        if self.remaining_tasks == 0:
+            self.done.set()
+
+    def task_done(self, error: BaseException = None):
+        """
+        Marks one evaluation as finished. Must be called while holding the pool's lock
+        :param error: The error raised by the evaluation, if any
+        """
+        if error is not None:
+            self.errors.append(error)
+
+        self.remaining_tasks -= 1
+        if self.remaining_tasks == 0:
+            self.done.set()
+
+
+class EvaluationTask:
+    """
+    A single evaluation waiting for or running on a worker
+    """
+    def __init__(self, solution, batch: EvaluationBatch, generation_buffer: GenerationBuffer, index: int,
+                 predicted_seconds: float, has_timings: bool):
+        """
+        :param solution: The solution to evaluate
+        :param batch: The batch the evaluation belongs to
+        :param generation_buffer: The buffer the solution was published to, or `None`
+        :param index: The index of the solution in its batch and buffer
+        :param predicted_seconds: How long the evaluation is predicted to take
+        :param has_timings: Whether the prediction was learned from timed simulations of the same configuration
+        """
+        self.solution = solution
+        self.batch = batch
+        self.generation_buffer = generation_buffer
+        self.index = index
+        self.predicted_seconds = predicted_seconds
+        self.has_timings = has_timings
+
+
+class EvaluationPool:
+    """
+    Runs evaluations from any number of experiments on at most `max_workers` workers at once.
+        Each experiment has its own queue. Workers take evaluations from the queues in turn so that every experiment
+        gets a fair share of the workers or, if `largest_first` is set in `SCHEDULER_CONTROLS`, take the evaluation
+        predicted to take longest, so that short evaluations fill in at the end of each generation instead of
+        long ones running alone.
+        If `warm_workers` is set, shared memory workers keep their robot's body loaded, and each worker is given
+        evaluations of the robot it already has loaded until the queues of other robots become uneven
+    """
+    def __init__(self, max_workers: int, parallel: bool):
+        """
+        :param max_workers: The most evaluations that can run at once
+        :param parallel: Whether each evaluation should run as a separate process.
+            If `False`, only one evaluation is run at a time
+        """
+        self.parallel = parallel
+        if self.parallel:
+            self.max_workers = max_workers
+        else:
+            self.max_workers = 1
+
+        scheduler_controls = sc.SCHEDULER_CONTROLS
+        self.largest_first = scheduler_controls["largest_first"]
+        self.warm_workers = scheduler_controls["warm_workers"]
+        self.rebalance_threshold = scheduler_controls["rebalance_threshold"]
+        if scheduler_controls["save_cost_model"]:
+            cost_model_filename = c.COST_MODEL_FILENAME
+        else:
+            cost_model_filename = None
+        self.cost_model = CostModel(scheduler_controls["cost_smoothing"], cost_model_filename)
+
+        self.condition = threading.Condition()
+        self.queues: Dict[str, collections.deque] = collections.OrderedDict()
+        # The index in `self.queues` of the experiment that should be checked first for the next evaluation
+        self.next_queue_index = 0
+        self.closing = False
+
+        # How the workers have been used, updated whenever an evaluation is queued, started, or finished
+        self.start_time = time.perf_counter()
+        self.last_usage_time = self.start_time
+        self.num_queued_tasks = 0
+        self.num_busy_workers = 0
+        self.busy_seconds = 0.0
+        # Seconds workers spent idle while nothing was queued but other evaluations were still running,
+        #   which happens at the end of each generation
+        self.tail_idle_seconds = 0.0
+        self.num_evaluations = 0
+        # The relative errors of predictions learned from timed simulations
+        self.num_predictions = 0
+        self.total_prediction_error = 0.0
+        # How many shared memory evaluations were given to a worker that already had their robot loaded
+        self.num_shared_memory_placements = 0
+        self.num_warm_placements = 0
+
+        self.workers = []
+        for _ in range(self.max_workers):
+            worker = threading.Thread(target=self.run_worker, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def evaluate(self, experiment_name: str, solutions: List, generation_buffer: GenerationBuffer = None):
+        """
+        Evaluates a set of solutions and waits until every evaluation has finished
+        :param experiment_name: The name of the experiment the solutions belong to
+        :param solutions: The solutions to evaluate
+        :param generation_buffer: The buffer the solutions were published to, in order, if they should be simulated
+            by shared memory workers. Their results are written to the buffer instead of the solutions
+        """
+        batch = EvaluationBatch(len(solutions))
+
+        tasks = []
+        for index, solution in enumerate(solutions):
+            tasks.append(EvaluationTask(solution, batch, generation_buffer, index,
+                                        self.cost_model.predict(solution.num_legs, solution.num_frames),
+                                        self.cost_model.has_timings(solution.num_legs, solution.num_frames)))
+
+        if self.largest_first:
+            tasks.sort(key=lambda task: task.predicted_seconds, reverse=True)
+
+        with self.condition:
+            if experiment_name not in self.queues:
+                self.queues[experiment_name] = collections.deque()
+
+            self.record_usage()
+            self.queues[experiment_name].extend(tasks)
+            self.num_queued_tasks += len(tasks)
+
+            self.condition.notify_all()
+
+        batch.done.wait()
+
+        if len(batch.errors) > 0:
+            raise batch.errors[0]
+
+    def get_next_task(self, warm_num_legs: int = None) -> EvaluationTask:
+        """
+        Takes the next evaluation from the experiment queues. Must be called while holding the lock
+        :param warm_num_legs: The number of legs of the robot the worker has loaded, if any
+        :return: The evaluation, or `None` if no evaluations are waiting
+        """
+        experiment_names = list(self.queues.keys())
+
+        # Every experiment evolves one robot, so the first evaluation of a queue shows the robot of the whole queue
+        queue_indices = []
+        for offset in range(len(experiment_names)):
+            queue_index = (self.next_queue_index + offset) % len(experiment_names)
+
+            if len(self.queues[experiment_names[queue_index]]) > 0:
+                queue_indices.append(queue_index)
+
+        if len(queue_indices) == 0:
+            return None
+
+        if self.warm_workers and warm_num_legs is not None:
+            warm_queue_indices = [queue_index for queue_index in queue_indices
+                                  if self.is_warm_for(self.queues[experiment_names[queue_index]][0], warm_num_legs)]
+
+            if len(warm_queue_indices) > 0 and not self.are_queues_uneven(warm_num_legs):
+                queue_indices = warm_queue_indices
+
+        next_queue_index = queue_indices[0]
+        if self.largest_first:
+            # Each queue is sorted longest first, so only the first evaluation of each queue needs to be compared.
+            #   Ties go to the queues in turn
+            for queue_index in queue_indices:
+                if self.queues[experiment_names[queue_index]][0].predicted_seconds > \
+                        self.queues[experiment_names[next_queue_index]][0].predicted_seconds:
+                    next_queue_index = queue_index
+
+        self.next_queue_index = (next_queue_index + 1) % len(experiment_names)
+        return self.queues[experiment_names[next_queue_index]].popleft()
+
+    @staticmethod
+    def is_warm_for(task: EvaluationTask, warm_num_legs: int) -> bool:
+        """
+        :return: Whether a worker with the given robot loaded can run the evaluation without loading a new one
+        """
+        return task.generation_buffer is not None and task.solution.num_legs == warm_num_legs
+
+    def are_queues_uneven(self, warm_num_legs: int) -> bool:
+        """
+        Checks whether a worker should load a new robot even though evaluations of its own robot are waiting.
+            Must be called while holding the lock
+        :param warm_num_legs: The number of legs of the robot the worker has loaded
+        :return: Whether more than `rebalance_threshold` more evaluations of another robot are waiting
+        """
+        queued_evaluations: Dict[int, int] = collections.defaultdict(int)
+        for queue in self.queues.values():
+            if len(queue) > 0:
+                queued_evaluations[queue[0].solution.num_legs] += len(queue)
+
+        return max(queued_evaluations.values()) - queued_evaluations[warm_num_legs] > self.rebalance_threshold
+
+    def record_usage(self):
+        """
+        Adds the time since the last change in the number of busy workers to the usage totals.
+            Must be called while holding the lock, before the number of queued evaluations or busy workers changes
+        """
+        current_time = time.perf_counter()
+        elapsed_seconds = current_time - self.last_usage_time
+        self.last_usage_time = current_time
+
+        self.busy_seconds += self.num_busy_workers * elapsed_seconds
+
+        if self.num_queued_tasks == 0 and self.num_busy_workers > 0:
+            self.tail_idle_seconds += (self.max_workers - self.num_busy_workers) * elapsed_seconds
+
+    def run_worker(self):
+        """
+        Runs on each worker thread. Repeatedly takes the next evaluation and runs it.
+            Each thread starts its own shared memory worker the first time it is given a published solution
+        """
+        shared_memory_worker = None
+        # The number of legs of the robot the shared memory worker has loaded
+        warm_num_legs = None
+
+        while True:
+            with self.condition:
+                task = self.get_next_task(warm_num_legs)
+                while task is None:
+                    if self.closing:
+                        if shared_memory_worker is not None:
+                            shared_memory_worker.close()
+                        return
+
+                    self.condition.wait()
+                    task = self.get_next_task(warm_num_legs)
+
+                self.record_usage()
+                self.num_queued_tasks -= 1
+                self.num_busy_workers += 1
+
+                if task.generation_buffer is not None:
+                    self.num_shared_memory_placements += 1
+                    if self.warm_workers and self.is_warm_for(task, warm_num_legs):
+                        self.num_warm_placements += 1
+
+            solution = task.solution
+            start_time = time.perf_counter()
+
+            error = None
+            try:
+                if task.generation_buffer is None:
+                    solution.start_simulation(parallel=self.parallel)
+                    solution.wait_for_sim_to_end()
+                else:
+                    if shared_memory_worker is None:
+                        shared_memory_worker = SharedMemoryWorker()
+
+                    shared_memory_worker.evaluate(task.generation_buffer, task.index, solution,
+                                                  keep_warm=self.warm_workers)
+                    warm_num_legs = solution.num_legs
+            except BaseException as raised_error:
+                error = raised_error
+                warm_num_legs = None
+
+            seconds = time.perf_counter() - start_time
+            if error is None:
+                self.cost_model.observe(solution.num_legs, solution.num_frames, seconds)
+
+            with self.condition:
+                self.record_usage()
+                self.num_busy_workers -= 1
+                self.num_evaluations += 1
+
+                if error is None and task.has_timings:
+                    self.num_predictions += 1
+                    self.total_prediction_error += abs(task.predicted_seconds - seconds) / seconds
+
+                task.batch.task_done(error)
+
+    def get_stats(self) -> Dict:
+        """
+        :return: How well the workers have been used and how accurate the predicted evaluation times have been
+        """
+        with self.condition:
+            self.record_usage()
+
+            elapsed_seconds = self.last_usage_time - self.start_time
+            if elapsed_seconds > 0:
+                utilization = self.busy_seconds / (self.max_workers * elapsed_seconds)
+            else:
+                utilization = 0.0
+
+            if self.num_predictions > 0:
+                mean_prediction_error = self.total_prediction_error / self.num_predictions
+            else:
+                mean_prediction_error = None
+
+            if self.warm_workers and self.num_shared_memory_placements > 0:
+                warm_hit_rate = self.num_warm_placements / self.num_shared_memory_placements
+            else:
+                warm_hit_rate = None
+
+            return {"largest_first": self.largest_first,
+                    "max_workers": self.max_workers,
+                    "evaluations": self.num_evaluations,
+                    "wall_seconds": elapsed_seconds,
+                    "busy_seconds": self.busy_seconds,
+                    "utilization": utilization,
+                    "tail_idle_seconds": self.tail_idle_seconds,
+                    "mean_prediction_error": mean_prediction_error,
+                    "warm_hit_rate": warm_hit_rate,
+                    "predicted_seconds": {str(num_legs) + "_legs_" + str(num_frames) + "_frames":
+                                          self.cost_model.predict(num_legs, num_frames)
+                                          for num_legs, num_frames in list(self.cost_model.seconds.keys())}}
+
+    def print_stats(self):
+        """
+        Prints how well the workers have been used and how accurate the predicted evaluation times have been
+        """
+        stats = self.get_stats()
+
+        if stats["mean_prediction_error"] is None:
+            prediction_error = "no learned predictions"
+        else:
+            prediction_error = str(round(stats["mean_prediction_error"] * 100, 1)) + "% mean prediction error"
+
+        if stats["warm_hit_rate"] is None:
+            warm_placements = ""
+        else:
+            warm_placements = ", " + str(round(stats["warm_hit_rate"] * 100, 1)) + "% warm worker hit rate"
+
+        print("*** Evaluation pool: " + str(stats["evaluations"]) + " evaluations, "
+              + str(round(stats["utilization"] * 100, 1)) + "% worker utilization, "
+              + str(round(stats["tail_idle_seconds"], 1)) + " worker-seconds idle at generation ends, "
+              + prediction_error + warm_placements + " ***")
+
+    def close(self):
+        """
+        Stops the workers once every waiting evaluation has finished, prints their usage, and saves the cost model
+        """
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+
+        for worker in self.workers:
+            worker.join()
+
+        self.print_stats()
+        self.cost_model.save()
@@ -0,0 +1,133 @@
+"""
+Stores the fitness of every generation of a run in a compact binary log and converts it to csv on demand
+"""
+import sys
+from typing import Dict
+
+import numpy
+
+from record_log import RecordLog, read_record_log
+
+
+# One record per lineage per generation
+#   `generation`:     The generation number, starting at 1
+#   `lineage`:        The index of the parent-child pair within the population
+#   `solution_id`:    The id of the solution that was kept as the parent
+#   `parent_fitness`: The fitness of the parent before selection
+#   `child_fitness`:  The fitness of the fittest child
+#   `child_index`:    The index of the child that was kept among the parent's children, or `-1` if the parent was kept
+#   `cpg_rate`:       The cpg rate of the solution that was kept, or `-1` if the cpg is not active
+FITNESS_RECORD_DTYPE = numpy.dtype([("generation", "<i4"),
+                                    ("lineage", "<i4"),
+                                    ("solution_id", "<i8"),
+                                    ("parent_fitness", "<f8"),
+                                    ("child_fitness", "<f8"),
+                                    ("child_index", "<i4"),
+                                    ("cpg_rate", "<i4")])
+
+
+class FitnessHistory:
+    """
+    Writes the fitness of each generation of a run to a binary record log
+    """
+    def __init__(self, filename: str, overwrite: bool):
+        """
+        :param filename: The file that stores the fitness history
+        :param overwrite: Whether an existing history in the file should be deleted
+        """
+        self.log = RecordLog(filename, FITNESS_RECORD_DTYPE, overwrite=overwrite)
+
+    def create_generation_records(self, generation: int, solution_ids, parent_fitness, child_fitness, child_indices,
+                                  cpg_rates) -> numpy.ndarray:
+        """
+        Creates the records for one generation. Every argument other than `generation` has one entry per lineage
+        :param generation: The generation number, starting at 1
+        :param solution_ids: The ids of the solutions kept as parents
+        :param parent_fitness: The fitness of each parent before selection
+        :param child_fitness: The fitness of each fittest child
+        :param child_indices: The index of each kept child among its parent's children, or `-1` if the parent was kept
+        :param cpg_rates: The cpg rate of each kept solution, or `-1` if the cpg is not active
+        :return: The records for the generation
+        """
+        num_lineages = len(solution_ids)
+
+        records = numpy.empty(num_lineages, dtype=FITNESS_RECORD_DTYPE)
+        records["generation"] = generation
+        records["lineage"] = numpy.arange(num_lineages)
+        records["solution_id"] = solution_ids
+        records["parent_fitness"] = parent_fitness
+        records["child_fitness"] = child_fitness
+        records["child_index"] = child_indices
+        records["cpg_rate"] = cpg_rates
+
+        return records
+
+    def append(self, records: numpy.ndarray):
+        """
+        Adds a generation's records to the history
+        :param records: The records created by `create_generation_records`
+        """
+        self.log.append(records)
+
+    def flush(self):
+        """
+        Writes any buffered records to the file
+        """
+        self.log.flush()
+
+    def close(self):
+        """
+        Writes any buffered records and closes the file
+        """
+        self.log.close()
+
+
+def read_fitness_history(filename: str) -> Dict[str, numpy.ndarray]:
+    """
+    Reads a fitness history
+    :param filename: The file that stores the fitness history
+    :return: A dictionary matching each field of `FITNESS_RECORD_DTYPE` to an array of its values,
+        plus `fitness`, the fitness of the solution that was kept
+    """
+    records = read_record_log(filename, FITNESS_RECORD_DTYPE)
+
+    history = {name: records[name] for name in FITNESS_RECORD_DTYPE.names}
+
+    # The fittest child is only kept if it is strictly better than the parent, so the kept fitness is the larger one
+    history["fitness"] = numpy.maximum(records["parent_fitness"], records["child_fitness"])
+
+    return history
+
+
+def export_fitness_history_to_csv(history_filename: str, csv_filename: str, solution_index_offset: int = 0):
+    """
+    Converts a fitness history to a csv file with the columns `generation,solution,child_index,fitness,cpg_rate`.
+        `child_index` is the index of the kept child among its parent's children, or `-1` if the parent was kept
+    :param history_filename: The file that stores the fitness history
+    :param csv_filename: The csv file to write
+    :param solution_index_offset: The value added to each lineage index to get the `solution` column
+    """
+    history = read_fitness_history(history_filename)
+
+    columns = [history["generation"],
+               history["lineage"] + solution_index_offset,
+               history["child_index"],
+               history["fitness"],
+               history["cpg_rate"]]
+
+    with open(csv_filename, "w") as fileout:
+        fileout.write("generation,solution,child_index,fitness,cpg_rate\n")
+
+        for generation, solution, child_index, fitness, cpg_rate in zip(*[column.tolist() for column in columns]):
+            fileout.write(str(generation) + "," + str(solution) + "," + str(child_index) + "," + str(fitness) + ","
+                          + str(cpg_rate) + "\n")
+
+
+# Converts a fitness history to csv: `python fitness_history.py <history file> <csv file> [solution index offset]`
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        offset = int(sys.argv[3])
+    else:
+        offset = 0
+
+    export_fitness_history_to_csv(sys.argv[1], sys.argv[2], solution_index_offset=offset)
@@ -0,0 +1,142 @@
+"""
+Generates a robot's full weight matrix from a smaller genome, so that evolution searches fewer values.
+    Each encoding maps every weight to the index of the genome value it is copied from.
+    The rows of the weight matrix are the sensor neurons of the legs, left side first, followed by one extra row.
+    The columns are the motor neurons of the joints, in the same order
+"""
+from typing import Dict, Hashable, Tuple
+
+import numpy
+
+
+# Every weight is its own genome value
+ENCODING_FULL = "full"
+# Each weight of the right legs is the same as the matching weight of the left legs
+ENCODING_MIRRORED = "mirrored"
+# The weights within each leg are shared by the legs at the same position on both sides, and the weights between legs
+#   only depend on how the legs are placed relative to each other
+ENCODING_LEG_TEMPLATE = "leg_template"
+
+ENCODINGS = [ENCODING_FULL, ENCODING_MIRRORED, ENCODING_LEG_TEMPLATE]
+
+# The weight maps that have been created, by encoding and number of legs
+weight_maps: Dict[Tuple[str, int], numpy.ndarray] = {}
+
+
+def get_neuron_leg(neuron_index: int, num_legs: int) -> Tuple[int, int, int]:
+    """
+    Finds the leg a sensor or motor neuron belongs to
+    :param neuron_index: The row of a sensor neuron or column of a motor neuron, other than the extra row
+    :param num_legs: The number of legs of the robot
+    :return: The side (`0` for left and `1` for right), the position of the leg along the side,
+        and the part (`0` for the upper leg or hip and `1` for the lower leg or knee)
+    """
+    side, index_on_side = divmod(neuron_index, num_legs)
+    position, part = divmod(index_on_side, 2)
+
+    return side, position, part
+
+
+def mirror_neuron(neuron_index: int, num_legs: int) -> int:
+    """
+    :param neuron_index: The row of a sensor neuron or column of a motor neuron
+    :param num_legs: The number of legs of the robot
+    :return: The index of the matching neuron on the other side. The extra row matches itself
+    """
+    if neuron_index >= 2 * num_legs:
+        return neuron_index
+
+    return (neuron_index + num_legs) % (2 * num_legs)
+
+
+def get_weight_key(encoding: str, row: int, col: int, num_legs: int) -> Hashable:
+    """
+    Describes which weights share a genome value. Weights with the same key copy the same value
+    :param encoding: The name of the encoding
+    :param row: The row of the weight
+    :param col: The column of the weight
+    :param num_legs: The number of legs of the robot
+    :return: The key of the weight
+    """
+    if encoding == ENCODING_FULL:
+        return row, col
+
+    if encoding == ENCODING_MIRRORED:
+        return min((row, col), (mirror_neuron(row, num_legs), mirror_neuron(col, num_legs)))
+
+    motor_side, motor_position, motor_part = get_neuron_leg(col, num_legs)
+
+    if row >= 2 * num_legs:
+        return "extra", motor_position, motor_part
+
+    sensor_side, sensor_position, sensor_part = get_neuron_leg(row, num_legs)
+
+    if sensor_position == motor_position and sensor_side == motor_side:
+        return "leg", motor_position, sensor_part, motor_part
+    elif sensor_position == motor_position:
+        relation = "opposite_leg"
+    elif sensor_side == motor_side:
+        relation = "same_side"
+    else:
+        relation = "opposite_side"
+
+    return "between_legs", relation, sensor_part, motor_part
+
+
+def get_weight_map(encoding: str, num_legs: int) -> numpy.ndarray:
+    """
+    Gets the genome index of every weight. Genome values are numbered in the order their first weight appears
+    :param encoding: The name of the encoding
+    :param num_legs: The number of legs of the robot
+    :return: An array of genome indices with the shape of the weight matrix. It must not be changed
+    """
+    if (encoding, num_legs) not in weight_maps:
+        num_rows = 2 * num_legs + 1
+        num_cols = 2 * num_legs
+
+        genome_indices: Dict[Hashable, int] = {}
+        weight_map = numpy.empty((num_rows, num_cols), dtype=int)
+
+        for row in range(num_rows):
+            for col in range(num_cols):
+                key = get_weight_key(encoding, row, col, num_legs)
+
+                if key not in genome_indices:
+                    genome_indices[key] = len(genome_indices)
+                weight_map[row][col] = genome_indices[key]
+
+        weight_map.flags.writeable = False
+        weight_maps[(encoding, num_legs)] = weight_map
+
+    return weight_maps[(encoding, num_legs)]
+
+
+def get_genome_length(weight_map: numpy.ndarray) -> int:
+    """
+    :param weight_map: The map created by `get_weight_map`
+    :return: The number of values in a genome of the encoding
+    """
+    return int(weight_map.max()) + 1
+
+
+def decode_weights(genome: numpy.ndarray, weight_map: numpy.ndarray) -> numpy.ndarray:
+    """
+    :param genome: The genome values
+    :param weight_map: The map created by `get_weight_map`
+    :return: The full weight matrix
+    """
+    return genome[weight_map]
+
+
+def encode_weights(weights: numpy.ndarray, weight_map: numpy.ndarray) -> numpy.ndarray:
+    """
+    Finds the genome of a weight matrix. The matrix must have been created by the same encoding,
+        otherwise only the last weight copied from each genome value is kept
+    :param weights: The full weight matrix
+    :param weight_map: The map created by `get_weight_map`
+    :return: The genome values
+    """
+    genome = numpy.empty(get_genome_length(weight_map))
+    genome[weight_map.ravel()] = numpy.asarray(weights, dtype=float).ravel()
+
+    return genome
@@ -1,30 +1,31 @@
 import copy
+import json
 import os
-from typing import Dict
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
+import numpy
+
+from background_writer import BackgroundWriter
+from checkpoint import create_checkpoint_filename, load_checkpoint, save_checkpoint, truncate_output_file
+from evaluation_cache import EvaluationCache, create_evaluation_key
+from elite_archive import add_elites, find_elite_archive_leg_nums, find_saved_solutions, load_elites
+from evaluation_pool import EvaluationPool
+from fitness_history import FitnessHistory, export_fitness_history_to_csv
+from horizon import HorizonSchedule
+from lineage_archive import LineageArchive, create_lineage_prefix, create_snapshot_filename, \
+    find_snapshot_generations
+from shared_memory_backend import BACKEND_SHARED_MEMORY, GenerationBuffer
 from solution import Solution
+from stopping import STOP_GENERATIONS, SharedBudget, StoppingCriteria
+from surrogate import SKIPPED_FITNESS, SurrogateLog, SurrogateScreen, export_surrogate_log_to_csv, \
+    get_rank_correlation
+from trials import get_num_trials
+from weight_transfer import transfer_weights
+from workspace import Workspace
 import constants as c
 import sim_controls as sc
-import system_info as si
-
-
-def delete_leftover_files():
-    """
-    Deletes any fitness, tmp_fitness, or brain files that may have been left behind by the previous run
-    (leftover files will only exist if previous run glitched or was aborted)
-    """
-
-    if si.WINDOWS:
-        system_call = "del "
-    else:
-        system_call = "rm "
-
-    system_calls = [system_call + "\"" + si.PROJECT_FILEPATH + c.FITNESS_FOLDER_NAME + "fitness*.txt\"",
-                    system_call + "\"" + si.PROJECT_FILEPATH + c.FITNESS_FOLDER_NAME + "tmp*.txt\"",
-                    system_call + "\"" + si.PROJECT_FILEPATH + c.OBJECTS_FOLDER_NAME + "brain*.nndf\""]
-
-    for system_call in system_calls:
-        os.system(system_call)
 
 
 class Hillclimber:
@@ -32,41 +33,353 @@ class Hillclimber:
     Simulates and evolves a set of quadruped robots
     """
     def __init__(self, num_generations: int, population_size: int, num_legs: int, cpg_active: bool, parallel: bool,
-                 run_index: int):
+                 run_index: int, resume: bool = False, num_frames: int = None, output_folder: str = "",
+                 hyperparameters: Dict[str, int] = None):
         """
         Creates a new Hillclimber object and generates a random set of parent solutions
+        :param resume: Whether the run should continue from its checkpoint, if one exists
+        :param num_frames: The number of frames each robot is simulated for. Defaults to `SIMULATION_CONTROLS`.
+            If `HORIZON_CONTROLS` is active, robots are only simulated for this many frames after its stages
+        :param output_folder: The folder that holds the run's output folders. Defaults to the project folder
+        :param hyperparameters: How the run's solutions are initialized and mutated. Settings that are left out have
+            the values from `get_default_hyperparameters`
         """
-
-        delete_leftover_files()
-
         self.num_generations = num_generations
         self.population_size = population_size
         self.num_legs = num_legs
         self.cpg_active = cpg_active
         self.parallel = parallel
         self.run_index = run_index
+        self.children_per_parent = sc.EVOLUTION_CONTROLS["children_per_parent"]
+        self.hyperparameters = hyperparameters
+
+        # The run's own random number generators. Runs that evolve on threads of one process each draw from their own,
+        #   so each run's checkpoint can restore exactly the numbers it would have drawn next
+        self.python_random = random.Random()
+        self.numpy_random = numpy.random.default_rng()
+
+        if num_frames is None:
+            num_frames = sc.SIMULATION_CONTROLS["num_frames"]
+        self.num_frames = num_frames
+
+        # Lengthens the number of frames robots are simulated for, set when `HORIZON_CONTROLS` is active
+        self.horizon: Optional[HorizonSchedule] = None
+        if sc.HORIZON_CONTROLS["active"]:
+            self.horizon = HorizonSchedule(sc.HORIZON_CONTROLS, self.num_frames)
+        self.horizon_stage = 0
+        # The generation after which each stage of the horizon ended, and the number of frames of the next stage
+        self.horizon_changes: List[Tuple[int, int]] = []
+
+        # Every intermediate file of the run is kept in its own workspace, so solution ids only need to be unique
+        #   within the run
+        self.workspace = Workspace(self.get_workspace_name_prefix(), self.run_index, output_folder)
 
         self.next_available_id = 0
         self.generation = 0
+        self.completed_generations = 0
+        # The number of simulations that have been run, not counting fitness values found in the evaluation cache
+        self.num_evaluations = 0
+        # The number of frames and cpu seconds used by those simulations
+        self.num_simulated_frames = 0
+        self.cpu_seconds = 0.0
+        # The number of seconds spent evolving before the current call to `evolve`, if the run was resumed
+        self.previous_wall_seconds = 0.0
+        self.evolve_start_time = time.time()
 
         self.parents:  Dict[int, Solution] = {}
+        # The children of parent `i` have the indices `i * children_per_parent` to `(i + 1) * children_per_parent - 1`
         self.children: Dict[int: Solution] = {}
 
+        self.fitness_history: FitnessHistory
+        self.lineage_archive: LineageArchive
+        self.writer: BackgroundWriter
+        self.evaluation_cache: Optional[EvaluationCache] = None
+        # Chooses which children are simulated, set when `SURROGATE_CONTROLS` is active
+        self.surrogate: Optional[SurrogateScreen] = None
+        self.surrogate_log: Optional[SurrogateLog] = None
+        # The shared evaluation workers, set when several runs evolve at the same time
+        self.pool: Optional[EvaluationPool] = None
+        # The run's own evaluation workers and the buffer its solutions are published to,
+        #   created when simulations use the shared memory backend
+        self.own_pool: Optional[EvaluationPool] = None
+        self.generation_buffer: Optional[GenerationBuffer] = None
+
+        self.stopping = StoppingCriteria(sc.STOPPING_CONTROLS)
+        # The simulations shared with the other runs of a sweep, set when the sweep shares its budget
+        self.shared_budget: Optional[SharedBudget] = None
+        # Why the run stopped, set once it has
+        self.stop_reason: Optional[str] = None
+        # Called with the run after the selection of each generation, such as by an island exchanging genomes
+        #   with other islands
+        self.after_generation: Optional[Callable[["Hillclimber"], None]] = None
+
+        self.checkpoint_filename = create_checkpoint_filename(self.workspace.checkpoints_folder, self.run_index,
+                                                              self.num_legs, self.cpg_active, self.num_frames)
+        self.last_checkpoint_generation = 0
+        self.last_checkpoint_time = time.time()
+        # The state loaded from the checkpoint if the run is being resumed, otherwise `None`
+        self.resumed_state = None
+
         # Create initial population
         for i in range(self.population_size):
-            self.parents[i] = Solution(self.get_next_available_id(), self.num_legs, cpg_active)
+            self.parents[i] = Solution(self.get_next_available_id(), self.num_legs, cpg_active, self.workspace,
+                                       self.get_current_num_frames(), self.hyperparameters,
+                                       python_random=self.python_random, numpy_random=self.numpy_random)
+
+        if resume:
+            self.resumed_state = load_checkpoint(self.checkpoint_filename)
+
+            if self.resumed_state is not None:
+                self.restore_checkpoint_state(self.resumed_state)
+
+        if self.resumed_state is None and sc.WARM_START_CONTROLS["active"]:
+            self.seed_from_elites(output_folder)
+
+    def seed_from_elites(self, output_folder: str):
+        """
+        Replaces `fraction` of the parents in `WARM_START_CONTROLS` with archived elites of the same robot, fittest
+            first, each with Gaussian noise added to its genome vector. They are followed by the saved solutions and
+            transferred elites of other robots, if enabled. If there are fewer elites than parents to replace,
+            the elites are used again in the same order
+        :param output_folder: The folder that holds the run's output folders, whose `solutions` folder is also searched
+            if `include_solutions` is enabled
+        """
+        controls = sc.WARM_START_CONTROLS
+
+        weights, cpg_rates, _ = load_elites(self.num_legs, self.cpg_active)
+        elites = list(zip(weights, cpg_rates))
+
+        if controls["include_solutions"]:
+            archived_solutions = {(elite_weights.tobytes(), int(elite_cpg_rate))
+                                  for elite_weights, elite_cpg_rate in elites}
+            elites += [(saved_weights, saved_cpg_rate) for saved_weights, saved_cpg_rate
+                       in find_saved_solutions(output_folder, self.num_legs, self.cpg_active)
+                       if (saved_weights.tobytes(), saved_cpg_rate) not in archived_solutions]
+
+        if controls["transfer"]:
+            elites += self.get_transferred_elites()
+
+        num_seeded = round(controls["fraction"] * self.population_size)
+        if len(elites) == 0 or num_seeded == 0:
+            print("*** No archived elites were found to seed the population with ***")
+            return
+
+        for i in range(num_seeded):
+            elite_weights, elite_cpg_rate = elites[i % len(elites)]
+
+            parent = self.parents[i]
+            parent.set_weights(numpy.array(elite_weights, dtype=float))
+            if self.cpg_active:
+                parent.cpg_rate = int(elite_cpg_rate)
+
+            genome = parent.get_genome_vector()
+            parent.set_genome_vector(genome + self.numpy_random.normal(0.0, controls["noise"], len(genome)))
+
+        print("*** Seeded " + str(num_seeded) + "/" + str(self.population_size) + " parents from "
+              + str(len(elites)) + " archived elites ***")
+
+    def get_transferred_elites(self) -> List[Tuple[numpy.ndarray, int]]:
+        """
+        Transfers the archived elites of the robot with the closest number of legs and the same cpg mode to this robot.
+            Robots with fewer legs are preferred, so that evolving increasing numbers of legs forms a curriculum
+        :return: The transferred weights and cpg rate of each elite, fittest first
+        """
+        leg_nums = [num_legs for num_legs in find_elite_archive_leg_nums(self.cpg_active) if num_legs != self.num_legs]
+        if len(leg_nums) == 0:
+            return []
+
+        source_num_legs = min(leg_nums, key=lambda num_legs: (num_legs > self.num_legs,
+                                                              abs(num_legs - self.num_legs)))
+        weights, cpg_rates, _ = load_elites(source_num_legs, self.cpg_active)
+
+        print("*** Transferring " + str(len(weights)) + " archived elites from " + str(source_num_legs) + " to "
+              + str(self.num_legs) + " legs ***")
+
+        return [(transfer_weights(elite_weights, self.num_legs), int(elite_cpg_rate))
+                for elite_weights, elite_cpg_rate in zip(weights, cpg_rates)]
+
+    def save_elites(self):
+        """
+        Adds the final parents to the elite archive of the robot
+        """
+        weights, cpg_rates, fitness = self.get_population_arrays()
+
+        add_elites(self.num_legs, self.cpg_active, weights, cpg_rates, fitness,
+                   max_elites=sc.WARM_START_CONTROLS["archive_size"])
 
     def evolve(self):
         """
-        Evolves the set of robots
+        Evolves the set of robots until the number of generations or a limit in `STOPPING_CONTROLS` is reached
+        """
+        self.evolve_start_time = time.time()
+
+        writer_controls = sc.OUTPUT_WRITER_CONTROLS
+        self.writer = BackgroundWriter(background=writer_controls["background"],
+                                       queue_size=writer_controls["queue_size"],
+                                       console_interval=writer_controls["console_interval"])
+
+        resuming = self.resumed_state is not None
+        if resuming:
+            self.truncate_outputs_to_checkpoint(self.resumed_state)
+
+        self.fitness_history = FitnessHistory(self.create_generation_fitness_filename(".bin"), overwrite=not resuming)
+        self.writer.register_log(self.fitness_history)
+
+        self.lineage_archive = LineageArchive(self.create_lineage_prefix(), overwrite=not resuming)
+        self.writer.register_log(self.lineage_archive)
+
+        cache_controls = sc.EVALUATION_CACHE_CONTROLS
+        if cache_controls["active"]:
+            self.evaluation_cache = EvaluationCache(c.EVALUATION_CACHE_FILENAME,
+                                                    memory_entries=cache_controls["memory_entries"],
+                                                    max_disk_entries=cache_controls["max_disk_entries"])
+
+        if sc.SURROGATE_CONTROLS["active"]:
+            self.surrogate = SurrogateScreen(sc.SURROGATE_CONTROLS)
+            self.surrogate_log = SurrogateLog(self.create_surrogate_log_filename(".bin"), overwrite=not resuming)
+            self.writer.register_log(self.surrogate_log)
+
+        try:
+            if not resuming:
+                # Evaluate each first generation robot
+                self.evaluate(self.parents)
+                self.write_lineage_snapshot(generation=0)
+                self.stopping.update_plateau(self.get_parent_fitness_values())
+
+            if self.surrogate is not None:
+                # A resumed run's surrogate only starts with the parents
+                self.surrogate.model.observe([parent.get_genome_vector() for parent in self.parents.values()],
+                                             self.get_parent_fitness_values())
+
+            # Evolve the robots
+            self.stop_reason = None
+            for current_generation in range(self.completed_generations, self.num_generations):
+                self.stop_reason = self.get_stop_reason()
+                if self.stop_reason is not None:
+                    break
+
+                self.generation = current_generation
+                if self.horizon is not None:
+                    self.update_horizon()
+
+                self.evolve_for_one_generation()
+
+                self.completed_generations = current_generation + 1
+                if self.after_generation is not None:
+                    self.after_generation(self)
+
+                self.stopping.update_plateau(self.get_parent_fitness_values())
+                self.checkpoint_if_due()
+
+            if self.stop_reason is None:
+                self.stop_reason = STOP_GENERATIONS
+
+            if self.shared_budget is not None:
+                self.stopping.return_unused_evaluations(self.num_evaluations, self.shared_budget)
+
+            self.writer.print("*** Run stopped after " + str(self.completed_generations) + " generations ("
+                              + self.stop_reason + ") ***")
+
+            if self.completed_generations % sc.LINEAGE_ARCHIVE_CONTROLS["snapshot_interval"] != 0:
+                self.write_lineage_snapshot(generation=self.completed_generations)
+
+            for i in range(0, len(self.parents)):
+                self.writer.submit(self.parents[i].save_weights, i)
+
+            if sc.WARM_START_CONTROLS["save_elites"]:
+                self.writer.submit(self.save_elites)
+
+            if sc.CHECKPOINT_CONTROLS["active"]:
+                self.write_checkpoint()
+        finally:
+            # Guarantees that all queued output is written, even if evolution is interrupted
+            self.writer.close()
+            self.fitness_history.close()
+            self.lineage_archive.close()
+
+            if self.surrogate is not None:
+                self.surrogate_log.close()
+                self.print_surrogate_stats()
+
+            if self.evaluation_cache is not None:
+                self.print_evaluation_cache_stats()
+                self.evaluation_cache.close()
+                self.evaluation_cache = None
+
+            self.close_shared_memory()
+            self.workspace.remove_intermediate_folders()
+
+        self.write_run_summary()
+
+        if sc.FITNESS_OUTPUT_CONTROLS["export_csv"]:
+            self.export_generation_fitness_to_csv()
+
+            if self.surrogate is not None:
+                export_surrogate_log_to_csv(self.create_surrogate_log_filename(".bin"),
+                                            self.create_surrogate_log_filename(".csv"))
+
+    def get_current_num_frames(self) -> int:
+        """
+        :return: The number of frames robots are currently simulated for
         """
-        # Evaluate each first generation robot
+        if self.horizon is None:
+            return self.num_frames
+
+        return self.horizon.get_num_frames(self.horizon_stage)
+
+    def update_horizon(self):
+        """
+        Moves to the next stage of the horizon if the current stage has ended. The parents are then simulated again
+            for the new number of frames, and every fitness recorded at the old number of frames is forgotten
+        """
+        next_stage = self.horizon.get_next_stage(self.horizon_stage, self.completed_generations,
+                                                 max(self.get_parent_fitness_values()))
+        if next_stage == self.horizon_stage:
+            return
+
+        self.horizon_stage = next_stage
+        num_frames = self.get_current_num_frames()
+        self.horizon_changes.append((self.completed_generations, num_frames))
+
+        for parent in self.parents.values():
+            parent.num_frames = num_frames
+
         self.evaluate(self.parents)
 
-        # Evolve the robots
-        for current_generation in range(self.num_generations):
-            self.generation = current_generation
-            self.evolve_for_one_generation()
+        self.stopping.reset_plateau()
+        self.stopping.update_plateau(self.get_parent_fitness_values())
+
+        if self.surrogate is not None:
+            self.surrogate.model.reset()
+            self.surrogate.model.observe([parent.get_genome_vector() for parent in self.parents.values()],
+                                         self.get_parent_fitness_values())
+
+        self.writer.print("*** Horizon increased to " + str(num_frames) + " frames after generation "
+                          + str(self.completed_generations) + " ***")
+
+    def get_stop_reason(self) -> Optional[str]:
+        """
+        Checks the run's progress against its stopping criteria
+        :return: The reason the run should stop, or `None` if it should continue
+        """
+        return self.stopping.get_stop_reason(num_evaluations=self.num_evaluations,
+                                             num_frames=self.num_simulated_frames,
+                                             wall_seconds=self.get_wall_seconds(),
+                                             cpu_seconds=self.cpu_seconds,
+                                             population_size=self.get_num_children(),
+                                             shared_budget=self.shared_budget)
+
+    def get_wall_seconds(self) -> float:
+        """
+        :return: The number of seconds the run has spent evolving, including before it was resumed
+        """
+        return self.previous_wall_seconds + time.time() - self.evolve_start_time
+
+    def get_parent_fitness_values(self) -> List[float]:
+        """
+        :return: The fitness of each parent
+        """
+        return [self.parents[i].fitness for i in range(0, len(self.parents))]
 
     def evolve_for_one_generation(self):
         """
@@ -74,35 +387,152 @@ class Hillclimber:
         """
         self.spawn()
         self.mutate_child_solutions()
-        self.evaluate(self.children)
+        self.evaluate_children()
 
         self.output_generation_fitness()
 
         self.select()
 
-        self.write_generation_fitness_to_csv()
+    def get_child_list(self) -> List[Solution]:
+        """
+        :return: The children in the order they were spawned
+        """
+        return [self.children[i] for i in range(0, len(self.children))]
+
+    def get_num_children(self) -> int:
+        """
+        :return: The number of children evaluated each generation
+        """
+        return self.population_size * self.children_per_parent
 
     def spawn(self):
         """
-        Creates a copy of every parent solution
+        Creates `children_per_parent` copies of every parent solution
         """
         for index, parent in self.parents.items():
-            self.children[index] = copy.deepcopy(parent)
-            self.children[index].set_id(self.get_next_available_id())
+            for child_index in range(self.children_per_parent):
+                child_key = index * self.children_per_parent + child_index
+
+                self.children[child_key] = copy.deepcopy(parent)
+                self.children[child_key].set_id(self.get_next_available_id())
 
     def mutate_child_solutions(self):
         """
         Mutate every child solution
         """
         for child in self.children.values():
-            child.mutate()
+            child.mutate(self.python_random)
 
     def evaluate(self, solutions: Dict[int, Solution]):
         """
-        Runs a set of solutions to evaluate their fitness
+        Evaluates the fitness of a set of solutions. If the evaluation cache is active, solutions that have been
+            simulated before get their cached fitness and only the rest are simulated
         :param solutions: The solutions to be evaluated
         """
-        if self.parallel:
+        if self.evaluation_cache is None:
+            self.run_simulations(solutions)
+            self.count_simulations(solutions)
+            return
+
+        evaluation_keys = {index: create_evaluation_key(solution) for index, solution in solutions.items()}
+
+        uncached_solutions = {}
+        for index, solution in solutions.items():
+            fitness = self.evaluation_cache.lookup(evaluation_keys[index])
+
+            if fitness is None:
+                uncached_solutions[index] = solution
+            else:
+                solution.fitness = fitness
+
+        self.run_simulations(uncached_solutions)
+        self.count_simulations(uncached_solutions)
+
+        self.evaluation_cache.store_many({evaluation_keys[index]: solution.fitness
+                                          for index, solution in uncached_solutions.items()})
+
+    def evaluate_children(self):
+        """
+        Evaluates the fitness of the current children. If the surrogate is active and has seen enough simulations,
+            only the children it chooses are simulated. The rest get `SKIPPED_FITNESS`, so they never replace a parent
+        """
+        if self.surrogate is None:
+            self.evaluate(self.children)
+            return
+
+        start_time = time.time()
+
+        child_list = self.get_child_list()
+        child_genomes = numpy.array([child.get_genome_vector() for child in child_list])
+        parent_genomes = numpy.array([self.parents[key // self.children_per_parent].get_genome_vector()
+                                      for key in range(0, len(child_list))])
+
+        if self.surrogate.is_ready():
+            predicted_improvements = self.surrogate.predict_improvements(child_genomes, parent_genomes)
+            chosen_indices, random_indices = self.surrogate.choose_children(predicted_improvements,
+                                                                                     self.numpy_random)
+        else:
+            predicted_improvements = None
+            chosen_indices, random_indices = numpy.arange(len(child_list)), numpy.array([], dtype=int)
+
+        surrogate_seconds = time.time() - start_time
+
+        self.evaluate({int(key): child_list[key] for key in chosen_indices})
+
+        start_time = time.time()
+
+        for key in range(0, len(child_list)):
+            if key not in chosen_indices:
+                child_list[key].fitness = SKIPPED_FITNESS
+
+        chosen_fitness = [child_list[key].fitness for key in chosen_indices]
+        self.surrogate.model.observe(child_genomes[chosen_indices], chosen_fitness)
+
+        if predicted_improvements is not None:
+            improvements = numpy.array(chosen_fitness) \
+                - numpy.array([self.parents[key // self.children_per_parent].fitness for key in chosen_indices])
+            rank_correlation = get_rank_correlation(predicted_improvements[chosen_indices], improvements)
+            sign_accuracy = float(numpy.mean((predicted_improvements[chosen_indices] > 0) == (improvements > 0)))
+        else:
+            rank_correlation = sign_accuracy = float("nan")
+
+        surrogate_seconds += time.time() - start_time
+
+        num_skipped = len(child_list) - len(chosen_indices)
+        if self.num_evaluations > 0:
+            seconds_saved = num_skipped * self.cpu_seconds / self.num_evaluations
+        else:
+            seconds_saved = 0.0
+
+        self.surrogate.add_generation(len(child_list), num_skipped, seconds_saved, surrogate_seconds)
+
+        record = self.surrogate_log.create_generation_record(self.generation + 1, len(child_list), len(chosen_indices),
+                                                             len(random_indices), rank_correlation, sign_accuracy,
+                                                             seconds_saved, surrogate_seconds)
+        self.writer.submit(self.surrogate_log.append, record)
+
+    def count_simulations(self, solutions: Dict[int, Solution]):
+        """
+        Adds the simulations that were just run to the run's totals
+        :param solutions: The solutions that were simulated
+        """
+        self.num_evaluations += len(solutions)
+
+        num_trials = get_num_trials(sc.ROBUSTNESS_CONTROLS)
+        for solution in solutions.values():
+            self.num_simulated_frames += solution.num_frames * num_trials
+            self.cpu_seconds += solution.cpu_seconds
+
+    def run_simulations(self, solutions: Dict[int, Solution]):
+        """
+        Runs a set of solutions to evaluate their fitness
+        :param solutions: The solutions to be simulated
+        """
+        if self.uses_shared_memory():
+            self.run_shared_memory_simulations(solutions)
+        elif self.pool is not None:
+            self.pool.evaluate(self.workspace.name, list(solutions.values()))
+        elif self.parallel:
             for solution in solutions.values():
                 solution.start_simulation()
 
@@ -114,14 +544,333 @@ class Hillclimber:
                 solution.start_simulation(parallel=False)
                 solution.wait_for_sim_to_end()
 
+    def uses_shared_memory(self) -> bool:
+        """
+        :return: Whether the run's simulations use the shared memory backend, which is only used in parallel mode
+        """
+        return self.parallel and sc.SIMULATION_CONTROLS["backend"] == BACKEND_SHARED_MEMORY
+
+    def run_shared_memory_simulations(self, solutions: Dict[int, Solution]):
+        """
+        Publishes a set of solutions to the run's generation buffer and simulates them on shared memory workers
+        :param solutions: The solutions to be simulated
+        """
+        solution_list = list(solutions.values())
+        if len(solution_list) == 0:
+            return
+
+        num_rows, num_cols = solution_list[0].weights.shape
+        if self.generation_buffer is None or not self.generation_buffer.fits(len(solution_list), num_rows, num_cols):
+            if self.generation_buffer is not None:
+                self.generation_buffer.close()
+
+            self.generation_buffer = self.create_generation_buffer(max(len(solution_list), self.get_num_children()),
+                                                                   num_rows, num_cols)
+
+        pool = self.pool
+        if pool is None:
+            if self.own_pool is None:
+                self.own_pool = EvaluationPool(max_workers=min(self.get_num_children(), os.cpu_count()),
+                                               parallel=True)
+            pool = self.own_pool
+
+        self.publish_solutions(solution_list)
+        pool.evaluate(self.workspace.name, solution_list, self.generation_buffer)
+        self.generation_buffer.collect(solution_list)
+
+    def create_generation_buffer(self, capacity: int, num_rows: int, num_cols: int) -> GenerationBuffer:
+        """
+        :param capacity: The most solutions the buffer can hold
+        :param num_rows: The number of rows of each weight matrix
+        :param num_cols: The number of columns of each weight matrix
+        :return: A new buffer for publishing the run's solutions
+        """
+        return GenerationBuffer(capacity, num_rows, num_cols)
+
+    def publish_solutions(self, solutions: List[Solution]):
+        """
+        Publishes solutions to the run's generation buffer so that shared memory workers can evaluate them
+        :param solutions: The solutions about to be evaluated
+        """
+        self.generation_buffer.publish(solutions)
+
+    def close_shared_memory(self):
+        """
+        Stops the run's own shared memory workers and deletes its generation buffer
+        """
+        if self.own_pool is not None:
+            self.own_pool.close()
+            self.own_pool = None
+
+        if self.generation_buffer is not None:
+            self.generation_buffer.close()
+            self.generation_buffer = None
+
     def select(self):
         """
-        For each parent-child pair, determine which is the fittest and store that as the parent
+        For each parent, determine whether its fittest child is fitter and if so, store that child as the parent.
+            Accepted mutations are added to the lineage archive
         """
         for i in range(0, len(self.parents)):
-            if self.children[i].fitness > self.parents[i].fitness:
-                self.parents[i] = self.children[i]
-            self.parents[i].save_weights(index=i)
+            if self.is_child_selected(i):
+                self.parents[i] = self.get_best_child(i)
+
+                records = self.lineage_archive.create_delta_records(self.generation + 1, i,
+                                                                    self.parents[i].mutations,
+                                                                    self.get_archived_cpg_rate(self.parents[i]))
+                self.writer.submit(self.lineage_archive.append, records)
+
+        if (self.generation + 1) % sc.LINEAGE_ARCHIVE_CONTROLS["snapshot_interval"] == 0:
+            self.write_lineage_snapshot(generation=(self.generation + 1))
+
+    def get_best_child_index(self, index: int) -> int:
+        """
+        Finds the fittest child of a parent. Ties go to the child spawned first
+        :param index: The index of the parent
+        :return: The index of the child among the parent's children, from `0` to `children_per_parent - 1`
+        """
+        first_child_key = index * self.children_per_parent
+
+        best_child_index = 0
+        for child_index in range(1, self.children_per_parent):
+            if self.children[first_child_key + child_index].fitness > \
+                    self.children[first_child_key + best_child_index].fitness:
+                best_child_index = child_index
+
+        return best_child_index
+
+    def get_best_child(self, index: int) -> Solution:
+        """
+        :param index: The index of the parent
+        :return: The fittest child of the parent
+        """
+        return self.children[index * self.children_per_parent + self.get_best_child_index(index)]
+
+    def is_child_selected(self, index: int) -> bool:
+        """
+        Determines whether the fittest child of a parent should replace it
+        :param index: The index of the parent
+        :return: Whether the fittest child is fitter than its parent
+        """
+        return self.get_best_child(index).fitness > self.parents[index].fitness
+
+    def get_archived_cpg_rate(self, solution: Solution) -> int:
+        """
+        Gets the cpg rate of a solution in the form stored by the output files
+        :param solution: The solution
+        :return: The cpg rate of the solution, or `-1` if the cpg is not active
+        """
+        if self.cpg_active:
+            return solution.cpg_rate
+        else:
+            return -1
+
+    def get_emigrants(self, num_emigrants: int) -> List[Tuple[numpy.ndarray, int, float]]:
+        """
+        Copies the fittest parents so they can be sent to another population
+        :param num_emigrants: How many parents to copy
+        :return: The weights, cpg rate in the form stored by the output files, and fitness of each copied parent,
+            fittest first
+        """
+        fittest_indices = sorted(range(len(self.parents)), key=lambda i: self.parents[i].fitness, reverse=True)
+
+        return [(self.parents[i].weights.copy(), self.get_archived_cpg_rate(self.parents[i]), self.parents[i].fitness)
+                for i in fittest_indices[:num_emigrants]]
+
+    def receive_migrants(self, migrants: List[Tuple[numpy.ndarray, int, float]]) -> int:
+        """
+        Replaces the least fit parents with fitter genomes from another population of the same robot.
+            Each replacement is added to the lineage archive as a change to every weight
+        :param migrants: The genomes created by `get_emigrants`, fittest first
+        :return: How many migrants replaced a parent
+        """
+        least_fit_indices = sorted(range(len(self.parents)), key=lambda i: self.parents[i].fitness)
+
+        num_accepted = 0
+        for index, (weights, cpg_rate, fitness) in zip(least_fit_indices, migrants):
+            parent = self.parents[index]
+            if fitness <= parent.fitness:
+                continue
+
+            parent.set_weights(numpy.array(weights, dtype=float))
+            if self.cpg_active:
+                parent.cpg_rate = int(cpg_rate)
+            parent.fitness = fitness
+
+            parent.mutations = [(row, col, parent.weights[row][col])
+                                for row in range(len(parent.weights)) for col in range(len(parent.weights[0]))]
+
+            records = self.lineage_archive.create_delta_records(self.completed_generations, index, parent.mutations,
+                                                                self.get_archived_cpg_rate(parent))
+            self.writer.submit(self.lineage_archive.append, records)
+
+            num_accepted += 1
+
+        # A snapshot saved for this generation during selection would not include the migrants
+        if num_accepted > 0 and self.completed_generations % sc.LINEAGE_ARCHIVE_CONTROLS["snapshot_interval"] == 0:
+            self.write_lineage_snapshot(generation=self.completed_generations)
+
+        return num_accepted
+
+    def get_population_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Copies the state of every parent into arrays
+        :return: A tuple containing the weights of each parent, with the shape (parents, rows, columns),
+            the cpg rate of each parent, or `-1` if the cpg is not active, and the fitness of each parent
+        """
+        parents = [self.parents[i] for i in range(0, len(self.parents))]
+
+        weights = numpy.array([parent.weights for parent in parents], dtype=float)
+        cpg_rates = numpy.array([self.get_archived_cpg_rate(parent) for parent in parents], dtype=int)
+        fitness = numpy.array([parent.fitness for parent in parents], dtype=float)
+
+        return weights, cpg_rates, fitness
+
+    def write_lineage_snapshot(self, generation: int):
+        """
+        Saves the full state of the population to the lineage archive
+        :param generation: The number of generations that have been completed
+        """
+        self.writer.submit(self.lineage_archive.write_snapshot, generation, *self.get_population_arrays())
+
+    def print_evaluation_cache_stats(self):
+        """
+        Prints how many evaluations were found in the evaluation cache
+        """
+        stats = self.evaluation_cache.get_stats()
+
+        print("*** Evaluation cache: " + str(stats["memory_hits"] + stats["disk_hits"]) + " hits ("
+              + str(stats["memory_hits"]) + " memory, " + str(stats["disk_hits"]) + " disk), "
+              + str(stats["misses"]) + " misses, " + str(round(stats["hit_rate"] * 100, 1)) + "% hit rate ***")
+
+    def print_surrogate_stats(self):
+        """
+        Prints how many children the surrogate skipped and how much simulation time that saved
+        """
+        surrogate = self.surrogate
+        if surrogate.num_children > 0:
+            skipped_share = surrogate.num_skipped / surrogate.num_children
+        else:
+            skipped_share = 0.0
+
+        print("*** Surrogate: " + str(surrogate.num_skipped) + "/" + str(surrogate.num_children)
+              + " children skipped (" + str(round(skipped_share * 100, 1)) + "%), "
+              + str(round(surrogate.seconds_saved, 1)) + " simulation seconds saved, "
+              + str(round(surrogate.surrogate_seconds, 1)) + " seconds spent on the surrogate ***")
+
+    def checkpoint_if_due(self):
+        """
+        Saves a checkpoint if enough generations or seconds have passed since the last one
+        """
+        controls = sc.CHECKPOINT_CONTROLS
+        if not controls["active"]:
+            return
+
+        generations_since_checkpoint = self.completed_generations - self.last_checkpoint_generation
+        seconds_since_checkpoint = time.time() - self.last_checkpoint_time
+
+        if (0 < controls["generation_interval"] <= generations_since_checkpoint) \
+                or (0 < controls["seconds_interval"] <= seconds_since_checkpoint):
+            self.write_checkpoint()
+
+    def write_checkpoint(self):
+        """
+        Saves the state of the run. The state is copied immediately and written by the output writer
+            after all previously submitted output
+        """
+        self.last_checkpoint_generation = self.completed_generations
+        self.last_checkpoint_time = time.time()
+
+        self.writer.submit(self.save_checkpoint_state, self.get_checkpoint_state())
+
+    def get_checkpoint_state(self) -> Dict:
+        """
+        Copies everything needed to resume the run after the most recently completed generation
+        :return: The state of the run
+        """
+        weights, cpg_rates, fitness = self.get_population_arrays()
+
+        return {"completed_generations": self.completed_generations,
+                "next_available_id": self.next_available_id,
+                "num_evaluations": self.num_evaluations,
+                "num_simulated_frames": self.num_simulated_frames,
+                "cpu_seconds": self.cpu_seconds,
+                "wall_seconds": self.get_wall_seconds(),
+                "stopping_state": self.stopping.get_state(),
+                "stop_reason": self.stop_reason,
+                "horizon_stage": self.horizon_stage,
+                "horizon_changes": list(self.horizon_changes),
+                "weights": weights,
+                "cpg_rates": cpg_rates,
+                "fitness": fitness,
+                "solution_ids": [self.parents[i].solution_id for i in range(0, len(self.parents))],
+                "python_random_state": self.python_random.getstate(),
+                "numpy_generator_state": self.numpy_random.bit_generator.state}
+
+    def save_checkpoint_state(self, state: Dict):
+        """
+        Writes a checkpoint. Runs as a task of the output writer, so every earlier output has already been submitted
+        :param state: The state created by `get_checkpoint_state`
+        """
+        self.fitness_history.flush()
+        self.lineage_archive.flush()
+
+        state["fitness_history_offset"] = self.fitness_history.log.get_offset()
+        state["lineage_offset"] = self.lineage_archive.deltas.get_offset()
+
+        if self.surrogate_log is not None:
+            self.surrogate_log.flush()
+            state["surrogate_log_offset"] = self.surrogate_log.log.get_offset()
+
+        save_checkpoint(self.checkpoint_filename, state)
+
+    def restore_checkpoint_state(self, state: Dict):
+        """
+        Sets the population, generation, and random number generators to the values saved in a checkpoint
+        :param state: The state loaded from the checkpoint
+        """
+        self.completed_generations = state["completed_generations"]
+        self.last_checkpoint_generation = self.completed_generations
+        self.next_available_id = state["next_available_id"]
+        self.num_evaluations = state["num_evaluations"]
+        self.num_simulated_frames = state["num_simulated_frames"]
+        self.cpu_seconds = state["cpu_seconds"]
+        self.previous_wall_seconds = state["wall_seconds"]
+        self.stopping.set_state(state["stopping_state"])
+
+        if self.horizon is not None:
+            # The stages may have changed since the checkpoint was saved
+            self.horizon_stage = min(state.get("horizon_stage", 0), self.horizon.get_num_stages() - 1)
+            self.horizon_changes = list(state.get("horizon_changes", []))
+
+        for i in range(0, len(self.parents)):
+            self.parents[i].num_frames = self.get_current_num_frames()
+            self.parents[i].set_weights(state["weights"][i].copy())
+            if self.cpg_active:
+                self.parents[i].cpg_rate = int(state["cpg_rates"][i])
+            self.parents[i].fitness = float(state["fitness"][i])
+            self.parents[i].set_id(state["solution_ids"][i])
+
+        self.python_random.setstate(state["python_random_state"])
+        # Checkpoints saved before each run had its own numpy generator only have the global generator's state
+        if "numpy_generator_state" in state:
+            self.numpy_random.bit_generator.state = state["numpy_generator_state"]
+
+    def truncate_outputs_to_checkpoint(self, state: Dict):
+        """
+        Removes any output written after the checkpoint was saved, so that resumed output continues seamlessly
+        :param state: The state loaded from the checkpoint
+        """
+        lineage_prefix = self.create_lineage_prefix()
+
+        truncate_output_file(self.create_generation_fitness_filename(".bin"), state["fitness_history_offset"])
+        truncate_output_file(lineage_prefix + "_deltas.bin", state["lineage_offset"])
+        if "surrogate_log_offset" in state:
+            truncate_output_file(self.create_surrogate_log_filename(".bin"), state["surrogate_log_offset"])
+
+        for snapshot_generation in find_snapshot_generations(lineage_prefix):
+            if snapshot_generation > self.completed_generations:
+                os.remove(create_snapshot_filename(lineage_prefix, snapshot_generation))
 
     def show_best(self):
         """
@@ -145,10 +894,30 @@ class Hillclimber:
         self.next_available_id += 1
         return output
 
-    def get_generation_fitness(self) -> str:
+    def get_solution_sets(self) -> List[Tuple[float, float, int]]:
+        """
+        Gets the values needed to output the current generation's fitness, so that they can be output after the
+            parents and children have changed
+        :return: A list containing the parent fitness, fittest child's fitness, and parent cpg rate of each parent.
+            If the cpg is not active, the rate is `None`
+        """
+        solution_sets = []
+        for i in range(0, len(self.parents)):
+            if self.cpg_active:
+                cpg_rate = self.parents[i].cpg_rate
+            else:
+                cpg_rate = None
+
+            solution_sets.append((self.parents[i].fitness, self.get_best_child(i).fitness, cpg_rate))
+
+        return solution_sets
+
+    def get_generation_fitness(self, generation: int, solution_sets: List[Tuple[float, float, int]]) -> str:
         """
-        Creates a string representation of the current generation's fitness
-        :return: A string representation of the current generation's fitness
+        Creates a string representation of a generation's fitness
+        :param generation: The index of the generation
+        :param solution_sets: The values created by `get_solution_sets` for the generation
+        :return: A string representation of the generation's fitness
         """
         def get_generation_header() -> str:
             """
@@ -160,117 +929,203 @@ class Hillclimber:
             else:
                 cpg_mode = ""
 
-            return "*** Generation " + str(self.generation + 1) + "/" + str(self.num_generations) \
+            return "*** Generation " + str(generation + 1) + "/" + str(self.num_generations) \
                 + " (" + str(self.num_legs) + " legs)" + cpg_mode + " ***"
 
-        def get_single_solution_set_fitness(parent: Solution, child: Solution, round_results: bool) -> str:
+        def get_single_solution_set_fitness(parent_fitness: float, child_fitness: float, cpg_rate: int,
+                                            round_results: bool) -> str:
             """
             Creates the string representation of a single parent-child solution pair
             :return: The string representation of a parent-child solution pair
             """
             if round_results:
-                parent_fitness = str(round(parent.fitness, sc.FITNESS_OUTPUT_CONTROLS["round_length"]))
-                child_fitness = str(round(child.fitness, sc.FITNESS_OUTPUT_CONTROLS["round_length"]))
+                parent_fitness = str(round(parent_fitness, sc.FITNESS_OUTPUT_CONTROLS["round_length"]))
+                child_fitness = str(round(child_fitness, sc.FITNESS_OUTPUT_CONTROLS["round_length"]))
             else:
-                parent_fitness = str(parent.fitness)
-                child_fitness = str(child.fitness)
+                parent_fitness = str(parent_fitness)
+                child_fitness = str(child_fitness)
 
             if self.cpg_active:
-                cpg_mode = " (CPG: " + str(parent.cpg_rate) + ")"
+                cpg_mode = " (CPG: " + str(cpg_rate) + ")"
             else:
                 cpg_mode = ""
 
+            if self.children_per_parent > 1:
+                child_label = "Best child: "
+            else:
+                child_label = "Child: "
+
             set_output  = "Parent: " + parent_fitness + cpg_mode + ", "
-            set_output += "Child: "  + child_fitness  + cpg_mode
+            set_output += child_label + child_fitness + cpg_mode
 
             return set_output
 
         output = get_generation_header()
-        for i in range(0, len(self.parents)):
+        for i, solution_set in enumerate(solution_sets):
             output += "\nSolution " + str(i) + "\n"
-            output += get_single_solution_set_fitness(self.parents[i], self.children[i],
+            output += get_single_solution_set_fitness(*solution_set,
                                                       round_results=sc.FITNESS_OUTPUT_CONTROLS["round_length"])
 
         return output
 
-    def create_generation_fitness_filename(self, file_extension: str) -> str:
+    def get_run_mode(self) -> str:
         """
-        Creates the filename for outputting the current generation's fitness in the format
-            `<data folder>\\fitness<index><number of legs>_legs, <active/inactive cpg>.<file_extension>`
-        :param file_extension: The file extension that the filename should have
-        :return: A string filename
+        Creates the description of the run's settings used in its names, in the format
+            `<active/inactive>_cpg`, followed by `, <frames>_frames` if the number of frames is not the default
+        :return: The description of the run's settings
         """
         if self.cpg_active:
             cpg_mode = "active_cpg"
         else:
             cpg_mode = "inactive_cpg"
 
+        if self.num_frames != sc.SIMULATION_CONTROLS["num_frames"]:
+            cpg_mode += ", " + str(self.num_frames) + "_frames"
+
+        return cpg_mode
+
+    def get_workspace_name_prefix(self) -> str:
+        """
+        Creates the start of the name of the run's workspace in the format
+            `run<index>_<number of legs>_legs_<active/inactive>_cpg`
+        :return: The start of the workspace name
+        """
+        if self.cpg_active:
+            cpg_mode = "active_cpg"
+        else:
+            cpg_mode = "inactive_cpg"
+
+        return "run" + str(self.run_index) + "_" + str(self.num_legs) + "_legs_" + cpg_mode
+
+    def create_lineage_prefix(self) -> str:
+        """
+        Creates the start of the filenames of the run's lineage archive
+        :return: The filename prefix
+        """
+        return create_lineage_prefix(self.workspace.lineage_folder, self.run_index, self.num_legs, self.cpg_active,
+                                     self.num_frames)
+
+    def create_generation_fitness_filename(self, file_extension: str) -> str:
+        """
+        Creates the filename for outputting the current generation's fitness in the format
+            `<data folder>/fitness<index>(<number of legs>_legs, <active/inactive>_cpg).<file_extension>`
+        :param file_extension: The file extension that the filename should have
+        :return: A string filename
+        """
+        cpg_mode = self.get_run_mode()
+
         assert(file_extension[0] == ".")
 
-        return c.DATA_FOLDER_NAME + "fitness" + str(self.run_index) + "(" + str(self.num_legs) + "_legs, " \
-            + cpg_mode + ")" + file_extension
+        return os.path.join(self.workspace.data_folder, "fitness" + str(self.run_index) + "(" + str(self.num_legs)
+                            + "_legs, " + cpg_mode + ")" + file_extension)
 
-    def print_generation_fitness(self):
+    def create_surrogate_log_filename(self, file_extension: str) -> str:
         """
-        Prints the current generation's fitness to the console
+        Creates the filename of the run's surrogate log in the format
+            `<data folder>/surrogate<index>(<number of legs>_legs, <active/inactive>_cpg).<file_extension>`
+        :param file_extension: The file extension that the filename should have
+        :return: A string filename
+        """
+        return os.path.join(self.workspace.data_folder, "surrogate" + str(self.run_index) + "(" + str(self.num_legs)
+                            + "_legs, " + self.get_run_mode() + ")" + file_extension)
+
+    def print_generation_fitness(self, generation: int, solution_sets: List[Tuple[float, float, int]]):
+        """
+        Prints a generation's fitness to the console. Runs as a task of the output writer
+        :param generation: The index of the generation
+        :param solution_sets: The values created by `get_solution_sets` for the generation
         """
         output = "\n\n******************************\n"
-        output += self.get_generation_fitness()
+        output += self.get_generation_fitness(generation, solution_sets)
         output += "\n******************************\n\n"
 
-        print(output)
+        self.writer.add_console_output(output)
 
-    def write_generation_fitness_to_file(self):
+    def write_generation_fitness_to_history(self):
         """
-        Writes the current generation's fitness in a readable format to a file
+        Adds the current generation's fitness values, solution id's, kept children, and cpg rates to the history.
+            Must be called before selection. If the cpg is not active, rate is stored as `-1`.
+            If the parent is kept, the child index is stored as `-1`
         """
-        filename = self.create_generation_fitness_filename(file_extension=".txt")
+        solution_ids = []
+        parent_fitness = []
+        child_fitness = []
+        child_indices = []
+        cpg_rates = []
 
-        output = "******************************\n"
-        output += self.get_generation_fitness() + "\n"
+        for i in range(0, len(self.parents)):
+            best_child_index = self.get_best_child_index(i)
+            best_child = self.children[i * self.children_per_parent + best_child_index]
 
-        if self.generation == 0:
-            with open(filename, "w") as fileout:
-                fileout.write(output)
-        else:
-            with open(filename, "a") as fileout:
-                fileout.write(output)
+            if self.is_child_selected(i):
+                kept_solution = best_child
+                child_indices.append(best_child_index)
+            else:
+                kept_solution = self.parents[i]
+                child_indices.append(-1)
 
-    def write_generation_fitness_to_csv(self):
+            solution_ids.append(kept_solution.solution_id)
+            parent_fitness.append(self.parents[i].fitness)
+            child_fitness.append(best_child.fitness)
+
+            cpg_rates.append(self.get_archived_cpg_rate(kept_solution))
+
+        records = self.fitness_history.create_generation_records(self.generation + 1, solution_ids,
+                                                                  parent_fitness, child_fitness, child_indices,
+                                                                  cpg_rates)
+        self.writer.submit(self.fitness_history.append, records)
+
+    def create_run_summary_filename(self) -> str:
         """
-        Writes the current generation's fitness values, solution id's, and cpg rates to a file.
-            If the cpg is not active, rate is printed as `-1`
+        Creates the filename of the run's summary in the format
+            `<data folder>/summary<index>(<number of legs>_legs, <active/inactive>_cpg).json`
+        :return: A string filename
         """
-        filename = self.create_generation_fitness_filename(".csv")
+        return os.path.join(self.workspace.data_folder, "summary" + str(self.run_index) + "(" + str(self.num_legs)
+                            + "_legs, " + self.get_run_mode() + ").json")
 
-        # CSV Header
-        if self.generation == 0:
-            output = "generation,solution,fitness,cpg_rate\n"
-            with open(filename, "w") as fileout:
-                fileout.write(output)
+    def get_run_summary(self) -> Dict:
+        """
+        :return: Why the run stopped, how much compute it used, the fitness of its best solution, and, if the horizon
+            is lengthened in stages, when each stage ended
+        """
+        summary = {"stop_reason": self.stop_reason,
+                   "completed_generations": self.completed_generations,
+                   "num_generations": self.num_generations,
+                   "evaluations": self.num_evaluations,
+                   "simulated_frames": self.num_simulated_frames,
+                   "wall_seconds": self.get_wall_seconds(),
+                   "cpu_seconds": self.cpu_seconds,
+                   "best_fitness": max(self.get_parent_fitness_values())}
 
-        # CSV Body
-        output = ""
-        for sol_index, solution in enumerate(self.parents.values()):
-            output += str(self.generation + 1) + ","
+        if self.horizon is not None:
+            summary["num_frames"] = self.get_current_num_frames()
+            summary["horizon_changes"] = [{"generation": generation, "num_frames": num_frames}
+                                          for generation, num_frames in self.horizon_changes]
 
-            sol_index = sol_index + ((self.run_index - 1) * self.population_size)
+        return summary
 
-            output += str(sol_index) + ","
-            output += str(solution.fitness) + ","
-            if self.cpg_active:
-                output += str(solution.cpg_rate) + "\n"
-            else:
-                output += str(-1) + "\n"
+    def write_run_summary(self):
+        """
+        Saves why the run stopped and how much compute it used
+        """
+        with open(self.create_run_summary_filename(), "w") as fileout:
+            json.dump(self.get_run_summary(), fileout, indent=2)
 
-        with open(filename, "a") as fileout:
-            fileout.write(output)
+    def export_generation_fitness_to_csv(self):
+        """
+        Converts the fitness history of the run to a csv file with the columns
+            `generation,solution,child_index,fitness,cpg_rate`
+        """
+        export_fitness_history_to_csv(self.create_generation_fitness_filename(".bin"),
+                                      self.create_generation_fitness_filename(".csv"),
+                                      solution_index_offset=((self.run_index - 1) * self.population_size))
 
     def output_generation_fitness(self):
         """
-        Outputs the current generation's fitness to a file and, if enabled, to the console
+        Outputs the current generation's fitness to the fitness history and, if enabled, to the console
         """
         if sc.FITNESS_OUTPUT_CONTROLS["print_results"]:
-            self.print_generation_fitness()
+            self.writer.submit(self.print_generation_fitness, self.generation, self.get_solution_sets())
 
-        self.write_generation_fitness_to_file()
+        self.write_generation_fitness_to_history()
@@ -0,0 +1,55 @@
+"""
+Lengthens the number of frames each robot is simulated for as a run evolves. Early generations only need to tell
+    robots that move forward from robots that fall over, so they can be simulated for fewer frames
+"""
+from typing import List
+
+
+class HorizonSchedule:
+    """
+    The stages of a run's horizon. Each stage listed in `HORIZON_CONTROLS` simulates a set number of frames,
+        and the run moves to the next stage once it completes the stage's last generation or its best fitness reaches
+        the stage's threshold. After the listed stages, robots are simulated for the run's full number of frames
+    """
+    def __init__(self, controls: dict, full_num_frames: int):
+        """
+        :param controls: The horizon controls
+        :param full_num_frames: The number of frames robots are simulated for after the listed stages
+        """
+        # Stages are never longer than the full horizon
+        self.stage_frames: List[int] = [min(num_frames, full_num_frames) for num_frames in controls["num_frames"]] \
+            + [full_num_frames]
+        self.end_generations: List[int] = list(controls["end_generations"])
+        self.fitness_thresholds: List[float] = list(controls["fitness_thresholds"])
+
+    def get_num_stages(self) -> int:
+        """
+        :return: The number of stages, including the final stage at the full number of frames
+        """
+        return len(self.stage_frames)
+
+    def get_num_frames(self, stage: int) -> int:
+        """
+        :param stage: The index of the stage
+        :return: The number of frames robots are simulated for during the stage
+        """
+        return self.stage_frames[stage]
+
+    def get_next_stage(self, stage: int, completed_generations: int, best_fitness: float) -> int:
+        """
+        Finds the stage the run should be in before its next generation. Several stages can end at once
+        :param stage: The index of the run's current stage
+        :param completed_generations: The number of generations the run has completed
+        :param best_fitness: The best fitness of the run's parents, simulated for the current stage's number of frames
+        :return: The index of the stage the run should move to, which is `stage` if it should stay
+        """
+        while stage < self.get_num_stages() - 1:
+            threshold = self.fitness_thresholds[stage]
+            reached_threshold = threshold != 0 and best_fitness >= threshold
+
+            if completed_generations < self.end_generations[stage] and not reached_threshold:
+                break
+
+            stage += 1
+
+        return stage
@@ -0,0 +1,176 @@
+"""
+Evolves several populations of the same robot at once, each as a separate process with its own evaluation workers.
+Every few generations, each island sends its fittest genomes to the next island in a ring and replaces its least fit
+    parents with fitter genomes from the previous island. Islands only wait for each other when they exchange genomes
+"""
+import json
+import multiprocessing
+import os
+import queue
+from typing import Dict, List
+
+from hillclimber import Hillclimber
+from optimizers import create_optimizer
+from search import verify_controls
+import constants as c
+import sim_controls as sc
+
+
+class RingMigration:
+    """
+    Exchanges genomes between an island and its neighbours. Called by the island's run after each generation
+    """
+    def __init__(self, island_index: int, interval: int, num_migrants: int, send_queue: multiprocessing.Queue,
+                 receive_queue: multiprocessing.Queue, next_island_stopped):
+        """
+        :param island_index: The index of the island
+        :param interval: How many generations apart genomes are exchanged. `0` means never
+        :param num_migrants: How many genomes are sent each time
+        :param send_queue: The queue the next island receives from
+        :param receive_queue: The queue the previous island sends to
+        :param next_island_stopped: An event set once the next island has stopped evolving
+        """
+        self.island_index = island_index
+        self.interval = interval
+        self.num_migrants = num_migrants
+        self.send_queue = send_queue
+        self.receive_queue = receive_queue
+        self.next_island_stopped = next_island_stopped
+
+        # Once the previous island has stopped, no more genomes will arrive
+        self.previous_island_stopped = False
+
+    def __call__(self, experiment: Hillclimber):
+        """
+        Sends the island's fittest genomes and waits for the previous island's, if an exchange is due
+        :param experiment: The island's run
+        """
+        if self.interval <= 0 or experiment.completed_generations % self.interval != 0:
+            return
+
+        # Genomes sent to a stopped island would never be read
+        if not self.next_island_stopped.is_set():
+            self.send_queue.put(experiment.get_emigrants(self.num_migrants))
+
+        if self.previous_island_stopped:
+            return
+
+        migrants = self.receive_queue.get()
+        if migrants is None:
+            self.previous_island_stopped = True
+            return
+
+        num_accepted = experiment.receive_migrants(migrants)
+
+        experiment.writer.print("*** Island " + str(self.island_index) + " accepted " + str(num_accepted) + "/"
+                                + str(len(migrants)) + " migrants after generation "
+                                + str(experiment.completed_generations) + " ***")
+
+    def stop(self):
+        """
+        Tells the next island that no more genomes will be sent
+        """
+        self.send_queue.put(None)
+
+
+def create_island_folder(islands_folder: str, island_index: int) -> str:
+    """
+    :param islands_folder: The folder of the island runs
+    :param island_index: The index of the island
+    :return: The folder of the island's outputs
+    """
+    return os.path.join(islands_folder, "island" + str(island_index))
+
+
+def run_island(controls: Dict, island_index: int, islands_folder: str, send_queue: multiprocessing.Queue,
+               receive_queue: multiprocessing.Queue, stopped_events: List, results_queue: multiprocessing.Queue):
+    """
+    Runs in each island's process. Evolves the island's population
+    :param controls: The island controls
+    :param island_index: The index of the island
+    :param islands_folder: The folder of the island runs
+    :param send_queue: The queue the next island receives from
+    :param receive_queue: The queue the previous island sends to
+    :param stopped_events: An event for each island, set once it has stopped evolving
+    :param results_queue: The queue the island's run summary is sent to
+    """
+    num_islands = controls["num_islands"]
+    migration = RingMigration(island_index, controls["migration_interval"], controls["num_migrants"],
+                              send_queue, receive_queue, stopped_events[(island_index + 1) % num_islands])
+
+    try:
+        experiment = create_optimizer(num_generations=controls["generations"], population_size=controls["pop_size"],
+                                      num_legs=controls["num_legs"], cpg_active=controls["cpg"],
+                                      parallel=sc.SIMULATION_CONTROLS["parallel_mode"], run_index=controls["run_index"],
+                                      resume=sc.CHECKPOINT_CONTROLS["resume"],
+                                      output_folder=create_island_folder(islands_folder, island_index))
+        experiment.after_generation = migration
+
+        experiment.evolve()
+
+        results_queue.put((island_index, experiment.get_run_summary()))
+    finally:
+        stopped_events[island_index].set()
+        migration.stop()
+
+
+def run_islands(controls: Dict):
+    """
+    Evolves every island at the same time and saves the summary of each island's run
+    :param controls: The island controls
+    """
+    islands_folder = os.path.join(c.ISLANDS_FOLDER_NAME, controls["islands_name"])
+    os.makedirs(islands_folder, exist_ok=True)
+
+    num_islands = controls["num_islands"]
+
+    # Islands start fresh instead of copying the threads and open files of this process
+    context = multiprocessing.get_context("spawn")
+
+    # Island `i` receives from queue `i` and sends to the queue of the next island
+    queues = [context.Queue() for _ in range(num_islands)]
+    stopped_events = [context.Event() for _ in range(num_islands)]
+    results_queue = context.Queue()
+
+    islands = []
+    for island_index in range(num_islands):
+        island = context.Process(target=run_island,
+                                 args=(controls, island_index, islands_folder, queues[(island_index + 1) % num_islands],
+                                       queues[island_index], stopped_events, results_queue))
+        island.start()
+        islands.append(island)
+
+    # Summaries are read while the islands run, since an island cannot exit until its summary has been sent
+    summaries = {}
+    while len(summaries) < num_islands:
+        try:
+            island_index, summary = results_queue.get(timeout=1)
+            summaries[island_index] = summary
+        except queue.Empty:
+            if not any(island.is_alive() for island in islands):
+                break
+
+    for island in islands:
+        island.join()
+
+    for island_index in range(num_islands):
+        if island_index in summaries:
+            print("*** Island " + str(island_index) + ": best fitness " + str(summaries[island_index]["best_fitness"])
+                  + " after " + str(summaries[island_index]["completed_generations"]) + " generations ***")
+        else:
+            print("*** Island " + str(island_index) + " failed ***")
+
+    if len(summaries) > 0:
+        best_island = max(summaries, key=lambda index: summaries[index]["best_fitness"])
+        print("*** Best fitness across islands: " + str(summaries[best_island]["best_fitness"])
+              + " (island " + str(best_island) + ") ***")
+
+    with open(os.path.join(islands_folder, "islands.json"), "w") as fileout:
+        json.dump({str(island_index): summary for island_index, summary in sorted(summaries.items())},
+                  fileout, indent=2)
+
+
+if __name__ == "__main__":
+    verify_controls()
+
+    run_islands(sc.ISLAND_CONTROLS)
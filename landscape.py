@@ -0,0 +1,313 @@
+"""
+Evaluates large numbers of sampled genomes of one robot to build datasets of its fitness landscape.
+Genomes are either sampled at random, like the first generation of a run, or perturbed from the robot's archived
+    elites. They are simulated in batches on one set of evaluation workers, with the backend in `SIMULATION_CONTROLS`,
+    and saved in chunks of `chunk_size` samples, so memory use does not grow with the size of the dataset.
+Each chunk is sampled from its own seed, so an interrupted dataset continues from its last saved chunk with the same
+    samples it would have had
+"""
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, Tuple
+
+import numpy
+
+from elite_archive import load_elites
+from evaluation_pool import EvaluationPool
+from hillclimber import Hillclimber
+from search import verify_controls
+from trials import get_num_trials
+import constants as c
+import sim_controls as sc
+
+
+# How genomes are sampled
+SAMPLING_RANDOM = "random"
+# Each genome is an archived elite, or a random genome if there are none, plus normally distributed noise
+SAMPLING_PERTURBED = "perturbed"
+
+SAMPLINGS = [SAMPLING_RANDOM, SAMPLING_PERTURBED]
+
+# Matches the chunk files of a dataset, capturing the chunk index
+CHUNK_FILENAME_PATTERN = re.compile(r"chunk(\d+)\.npz$")
+
+
+def create_chunk_filename(dataset_folder: str, chunk_index: int) -> str:
+    """
+    Creates the filename of a chunk of a dataset in the format `<dataset folder>/chunk<index>.npz`
+    :param dataset_folder: The folder of the dataset
+    :param chunk_index: The index of the chunk
+    :return: A string filename
+    """
+    return os.path.join(dataset_folder, "chunk" + str(chunk_index) + ".npz")
+
+
+def count_saved_chunks(dataset_folder: str) -> int:
+    """
+    :param dataset_folder: The folder of the dataset
+    :return: The number of chunks saved without a gap from the first chunk
+    """
+    chunk_indices = set()
+    for filename in glob.glob(os.path.join(dataset_folder, "chunk*.npz")):
+        match = CHUNK_FILENAME_PATTERN.search(os.path.basename(filename))
+        if match is not None:
+            chunk_indices.add(int(match.group(1)))
+
+    num_chunks = 0
+    while num_chunks in chunk_indices:
+        num_chunks += 1
+
+    return num_chunks
+
+
+def iterate_chunks(dataset_folder: str) -> Iterator[Tuple[numpy.ndarray, numpy.ndarray]]:
+    """
+    Reads a dataset one chunk at a time
+    :param dataset_folder: The folder of the dataset
+    :return: An iterator over the genome vectors, with the shape (samples, genome length), and the fitness of each chunk
+    """
+    for chunk_index in range(count_saved_chunks(dataset_folder)):
+        with numpy.load(create_chunk_filename(dataset_folder, chunk_index)) as chunk:
+            yield chunk["genomes"], chunk["fitness"]
+
+
+class LandscapeSampler:
+    """
+    Samples genomes of one robot, simulates them, and saves the dataset's chunks
+    """
+    def __init__(self, controls: Dict, parallel: bool):
+        """
+        :param controls: The landscape controls
+        :param parallel: Whether each evaluation should run as a separate process
+        """
+        self.controls = controls
+        self.dataset_folder = os.path.join(c.LANDSCAPES_FOLDER_NAME, controls["dataset_name"])
+        os.makedirs(self.dataset_folder, exist_ok=True)
+
+        core_budget = controls["core_budget"]
+        if core_budget <= 0:
+            core_budget = os.cpu_count()
+
+        # Each batch is simulated by an evaluator's population, which is never evolved. The evaluator saves no outputs,
+        #   so its output folders are kept with the intermediate files and deleted with them instead of in the dataset
+        os.makedirs(c.OBJECTS_FOLDER_NAME, exist_ok=True)
+        self.evaluator_folder = tempfile.mkdtemp(prefix="landscape_", dir=c.OBJECTS_FOLDER_NAME)
+        self.evaluator = Hillclimber(num_generations=0, population_size=controls["batch_size"],
+                                     num_legs=controls["num_legs"], cpg_active=controls["cpg"], parallel=parallel,
+                                     run_index=controls["run_index"], num_frames=controls["num_frames"],
+                                     output_folder=self.evaluator_folder)
+        self.evaluator.pool = EvaluationPool(max_workers=core_budget, parallel=parallel)
+
+        for solution in self.evaluator.parents.values():
+            solution.num_frames = self.evaluator.num_frames
+
+        self.num_weights = len(self.evaluator.parents[0].genome)
+        self.genome_length = len(self.evaluator.parents[0].get_genome_vector())
+
+        # The genomes perturbed samples are created from, set when the sampling is perturbed
+        self.centers = numpy.empty((0, self.genome_length))
+        if controls["sampling"] == SAMPLING_PERTURBED:
+            # A continued dataset keeps its centers, even if more elites have been archived since
+            centers_filename = os.path.join(self.dataset_folder, "centers.npy")
+            if os.path.exists(centers_filename):
+                self.centers = numpy.load(centers_filename)
+            else:
+                self.centers = self.create_centers()
+
+    def create_centers(self) -> numpy.ndarray:
+        """
+        Finds the genomes perturbed samples are created from. These are the robot's archived elites or, if it has none,
+            `batch_size` random genomes sampled from the dataset's seed
+        :return: The genome vector of each center, with the shape (centers, genome length)
+        """
+        weights, cpg_rates, _ = load_elites(self.controls["num_legs"], self.controls["cpg"])
+
+        if len(weights) == 0:
+            print("*** No elites archived for the robot; samples are perturbed from random genomes ***")
+            generator = numpy.random.default_rng(self.controls["seed"])
+            return self.sample_random_genomes(generator, self.controls["batch_size"])
+
+        solution = self.evaluator.parents[0]
+        centers = numpy.empty((len(weights), self.genome_length))
+        for index in range(len(weights)):
+            solution.set_weights(weights[index].copy())
+            if self.controls["cpg"]:
+                solution.cpg_rate = int(cpg_rates[index])
+            centers[index] = solution.get_genome_vector()
+
+        return centers
+
+    def get_metadata(self) -> Dict:
+        """
+        :return: Everything that changes the samples or their fitness. A dataset is only continued with the same values
+        """
+        controls = self.controls
+        return {"num_legs": controls["num_legs"],
+                "cpg": controls["cpg"],
+                "num_frames": self.evaluator.num_frames,
+                "num_trials": get_num_trials(sc.ROBUSTNESS_CONTROLS),
+                "genome_encoding": sc.EVOLUTION_CONTROLS["genome_encoding"],
+                "genome_length": self.genome_length,
+                "sampling": controls["sampling"],
+                "perturbation_sigma": controls["perturbation_sigma"],
+                "num_centers": len(self.centers),
+                "chunk_size": controls["chunk_size"],
+                "seed": controls["seed"]}
+
+    def verify_metadata(self):
+        """
+        Saves the dataset's metadata, or checks that it matches the saved metadata if the dataset is being continued.
+            If it does not match, prints an error message and exits
+        """
+        metadata = self.get_metadata()
+        metadata_filename = os.path.join(self.dataset_folder, "metadata.json")
+
+        if os.path.exists(metadata_filename):
+            with open(metadata_filename, "r") as filein:
+                saved_metadata = json.load(filein)
+
+            if saved_metadata != metadata:
+                print("*** The dataset " + self.dataset_folder + " was sampled with different settings. "
+                      "Change dataset_name to start a new dataset. ***")
+                sys.exit(-1)
+        else:
+            with open(metadata_filename, "w") as fileout:
+                json.dump(metadata, fileout, indent=2)
+
+            if len(self.centers) > 0:
+                numpy.save(os.path.join(self.dataset_folder, "centers.npy"), self.centers)
+
+    def sample_random_genomes(self, generator: numpy.random.Generator, num_samples: int) -> numpy.ndarray:
+        """
+        Samples genomes the way the first generation of a run is created
+        :param generator: The random number generator
+        :param num_samples: The number of genomes
+        :return: The genome vectors, with the shape (samples, genome length)
+        """
+        genomes = numpy.empty((num_samples, self.genome_length))
+        genomes[:, :self.num_weights] = generator.uniform(-1, 1, size=(num_samples, self.num_weights))
+
+        if self.controls["cpg"]:
+            genomes[:, self.num_weights] = generator.integers(1, c.MAX_INITIAL_CPG_RATE, size=num_samples,
+                                                              endpoint=True) / c.GENOME_CPG_RATE_SCALE
+
+        return genomes
+
+    def sample_genomes(self, generator: numpy.random.Generator,
+                       num_samples: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        :param generator: The random number generator
+        :param num_samples: The number of genomes
+        :return: The genome vectors, with the shape (samples, genome length), and the index of the center each was
+            perturbed from, or `-1` if it was sampled at random
+        """
+        if self.controls["sampling"] == SAMPLING_RANDOM:
+            return self.sample_random_genomes(generator, num_samples), numpy.full(num_samples, -1)
+
+        center_indices = generator.integers(0, len(self.centers), size=num_samples)
+        noise = generator.normal(0, self.controls["perturbation_sigma"], size=(num_samples, self.genome_length))
+
+        return self.centers[center_indices] + noise, center_indices
+
+    def evaluate_genomes(self, genomes: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Simulates genomes in batches of the evaluator's population. Each genome is first repaired in place
+            to the closest genome a solution can have
+        :param genomes: The genome vectors, with the shape (samples, genome length)
+        :return: The fitness and the cpu seconds of each simulation
+        """
+        fitness = numpy.empty(len(genomes))
+        cpu_seconds = numpy.empty(len(genomes))
+
+        batch_size = self.controls["batch_size"]
+        for start in range(0, len(genomes), batch_size):
+            batch = {index: self.evaluator.parents[index] for index in range(min(batch_size, len(genomes) - start))}
+
+            for index, solution in batch.items():
+                solution.set_genome_vector(genomes[start + index])
+                genomes[start + index] = solution.get_genome_vector()
+
+            self.evaluator.run_simulations(batch)
+            self.evaluator.count_simulations(batch)
+
+            for index, solution in batch.items():
+                fitness[start + index] = solution.fitness
+                cpu_seconds[start + index] = solution.cpu_seconds
+
+        return fitness, cpu_seconds
+
+    def sample_chunk(self, chunk_index: int, num_samples: int):
+        """
+        Samples and simulates one chunk, then saves it. The chunk is written to a temporary file that then replaces
+            the chunk's file, so a saved chunk is never partially written
+        :param chunk_index: The index of the chunk, which seeds its samples
+        :param num_samples: The number of samples in the chunk
+        """
+        start_time = time.time()
+
+        generator = numpy.random.default_rng([self.controls["seed"], chunk_index])
+        genomes, center_indices = self.sample_genomes(generator, num_samples)
+        fitness, cpu_seconds = self.evaluate_genomes(genomes)
+
+        wall_seconds = time.time() - start_time
+
+        filename = create_chunk_filename(self.dataset_folder, chunk_index)
+        tmp_filename = filename + "." + str(os.getpid()) + ".tmp.npz"
+        numpy.savez(tmp_filename, genomes=genomes, fitness=fitness, cpu_seconds=cpu_seconds,
+                    center_indices=center_indices, wall_seconds=wall_seconds)
+        os.replace(tmp_filename, filename)
+
+        print("*** Chunk " + str(chunk_index) + ": " + str(num_samples) + " evaluations at "
+              + str(round(num_samples / wall_seconds, 1)) + " evaluations per second ***")
+
+    def run(self):
+        """
+        Samples every chunk of the dataset that has not been saved, then prints the throughput
+        """
+        self.verify_metadata()
+
+        num_samples = self.controls["num_samples"]
+        chunk_size = self.controls["chunk_size"]
+        num_chunks = (num_samples + chunk_size - 1) // chunk_size
+        first_chunk = count_saved_chunks(self.dataset_folder)
+
+        # The last chunk is sampled again if `num_samples` has grown since it was saved with fewer samples
+        if first_chunk > 0:
+            with numpy.load(create_chunk_filename(self.dataset_folder, first_chunk - 1)) as chunk:
+                last_chunk_size = len(chunk["fitness"])
+
+            if last_chunk_size < min(chunk_size, num_samples - (first_chunk - 1) * chunk_size):
+                first_chunk -= 1
+
+        print("*** " + str(min(first_chunk * chunk_size, num_samples)) + "/" + str(num_samples)
+              + " landscape samples already saved ***")
+
+        start_time = time.time()
+        try:
+            for chunk_index in range(first_chunk, num_chunks):
+                self.sample_chunk(chunk_index, min(chunk_size, num_samples - chunk_index * chunk_size))
+        finally:
+            self.evaluator.pool.close()
+            self.evaluator.close_shared_memory()
+            self.evaluator.workspace.remove_intermediate_folders()
+            shutil.rmtree(self.evaluator_folder, ignore_errors=True)
+
+        wall_seconds = time.time() - start_time
+        if self.evaluator.num_evaluations > 0:
+            print("*** " + str(self.evaluator.num_evaluations) + " evaluations in " + str(round(wall_seconds, 1))
+                  + " seconds: " + str(round(self.evaluator.num_evaluations / wall_seconds, 1))
+                  + " evaluations per second, " + str(round(self.evaluator.num_simulated_frames / wall_seconds))
+                  + " frames per second, " + str(round(self.evaluator.cpu_seconds / self.evaluator.num_evaluations, 3))
+                  + " cpu seconds per evaluation ***")
+
+
+if __name__ == "__main__":
+    verify_controls()
+
+    LandscapeSampler(sc.LANDSCAPE_CONTROLS, parallel=sc.SIMULATION_CONTROLS["parallel_mode"]).run()
@@ -0,0 +1,196 @@
+"""
+Stores the full history of every lineage of a run as full population snapshots plus the mutations accepted in between
+"""
+import glob
+import os
+from typing import List, Tuple
+
+import numpy
+
+from record_log import RecordLog, read_record_log
+import sim_controls as sc
+
+
+# One record per weight changed by an accepted child, or a single record with `row` and `col` set to `-1`
+#   if only the cpg rate was changed
+#   `generation`: The generation the child was accepted in, starting at 1
+#   `lineage`:    The index of the parent-child pair within the population
+#   `row`, `col`: The position of the changed weight in the weights matrix
+#   `weight`:     The new value of the weight
+#   `cpg_rate`:   The cpg rate of the accepted child, or `-1` if the cpg is not active
+LINEAGE_DELTA_DTYPE = numpy.dtype([("generation", "<i4"),
+                                   ("lineage", "<i4"),
+                                   ("row", "<i2"),
+                                   ("col", "<i2"),
+                                   ("weight", "<f8"),
+                                   ("cpg_rate", "<i4")])
+
+
+def create_lineage_prefix(lineage_folder: str, run_index: int, num_legs: int, cpg_active: bool,
+                          num_frames: int = None) -> str:
+    """
+    Creates the start of the filenames of a run's lineage archive in the format
+        `<lineage folder>/lineage<index>(<number of legs>_legs, <active/inactive>_cpg)`.
+        If the run uses a different number of frames than `SIMULATION_CONTROLS`, `, <frames>_frames` is added
+    :param lineage_folder: The folder the archive is saved in
+    :param run_index: The index of the evolutionary run
+    :param num_legs: The number of legs of the robots
+    :param cpg_active: Whether the robots have a cpg
+    :param num_frames: The number of frames each robot is simulated for
+    :return: The filename prefix
+    """
+    if cpg_active:
+        cpg_mode = "active_cpg"
+    else:
+        cpg_mode = "inactive_cpg"
+
+    if num_frames is not None and num_frames != sc.SIMULATION_CONTROLS["num_frames"]:
+        cpg_mode += ", " + str(num_frames) + "_frames"
+
+    return os.path.join(lineage_folder,
+                        "lineage" + str(run_index) + "(" + str(num_legs) + "_legs, " + cpg_mode + ")")
+
+
+def create_snapshot_filename(prefix: str, generation: int) -> str:
+    """
+    Creates the filename of the population snapshot of a generation
+    :param prefix: The lineage archive's filename prefix
+    :param generation: The generation of the snapshot
+    :return: The snapshot filename
+    """
+    return prefix + "_snapshot" + str(generation) + ".npz"
+
+
+def find_snapshot_generations(prefix: str) -> List[int]:
+    """
+    Finds every generation that has a population snapshot
+    :param prefix: The lineage archive's filename prefix
+    :return: The sorted snapshot generations
+    """
+    generations = []
+    for filename in glob.glob(glob.escape(prefix + "_snapshot") + "*.npz"):
+        generation = filename[len(prefix + "_snapshot"):-len(".npz")]
+        if generation.isdigit():
+            generations.append(int(generation))
+
+    return sorted(generations)
+
+
+class LineageArchive:
+    """
+    Writes a run's population snapshots and accepted mutations
+    """
+    def __init__(self, prefix: str, overwrite: bool):
+        """
+        :param prefix: The start of the archive's filenames, created by `create_lineage_prefix`
+        :param overwrite: Whether existing mutation records should be deleted
+        """
+        self.prefix = prefix
+
+        folder = os.path.dirname(self.prefix)
+        if folder != "":
+            os.makedirs(folder, exist_ok=True)
+
+        self.deltas = RecordLog(self.prefix + "_deltas.bin", LINEAGE_DELTA_DTYPE, overwrite=overwrite)
+
+    def create_delta_records(self, generation: int, lineage: int, mutations: List[Tuple[int, int, float]],
+                             cpg_rate: int) -> numpy.ndarray:
+        """
+        Creates the records for a single accepted child
+        :param generation: The generation the child was accepted in, starting at 1
+        :param lineage: The index of the parent-child pair
+        :param mutations: The row, column, and new value of each weight the child changed
+        :param cpg_rate: The cpg rate of the child, or `-1` if the cpg is not active
+        :return: The records for the child
+        """
+        if len(mutations) == 0:
+            mutations = [(-1, -1, 0.0)]
+
+        records = numpy.empty(len(mutations), dtype=LINEAGE_DELTA_DTYPE)
+        records["generation"] = generation
+        records["lineage"] = lineage
+        records["row"] = [mutation[0] for mutation in mutations]
+        records["col"] = [mutation[1] for mutation in mutations]
+        records["weight"] = [mutation[2] for mutation in mutations]
+        records["cpg_rate"] = cpg_rate
+
+        return records
+
+    def append(self, records: numpy.ndarray):
+        """
+        Adds mutation records to the archive
+        :param records: The records created by `create_delta_records`
+        """
+        self.deltas.append(records)
+
+    def write_snapshot(self, generation: int, weights: numpy.ndarray, cpg_rates: numpy.ndarray,
+                       fitness: numpy.ndarray):
+        """
+        Saves the full state of the population
+        :param generation: The generation of the population, where `0` is the initial population
+        :param weights: The weights matrix of each lineage, with the shape (lineages, rows, columns)
+        :param cpg_rates: The cpg rate of each lineage, or `-1` if the cpg is not active
+        :param fitness: The fitness of each lineage
+        """
+        numpy.savez(create_snapshot_filename(self.prefix, generation),
+                    weights=weights, cpg_rates=cpg_rates, fitness=fitness)
+
+    def flush(self):
+        """
+        Writes any buffered mutation records to the file
+        """
+        self.deltas.flush()
+
+    def close(self):
+        """
+        Writes any buffered mutation records and closes the file
+        """
+        self.deltas.close()
+
+
+def load_lineage_population(prefix: str, generation: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Reconstructs the population of any generation from the nearest earlier snapshot and the mutations accepted after it
+    :param prefix: The lineage archive's filename prefix
+    :param generation: The generation to reconstruct, where `0` is the initial population
+    :return: A tuple containing the weights of each lineage, with the shape (lineages, rows, columns),
+        and the cpg rate of each lineage
+    """
+    snapshot_generations = [snapshot for snapshot in find_snapshot_generations(prefix) if snapshot <= generation]
+    assert (len(snapshot_generations) > 0)
+    snapshot_generation = snapshot_generations[-1]
+
+    with numpy.load(create_snapshot_filename(prefix, snapshot_generation)) as snapshot:
+        weights = snapshot["weights"].copy()
+        cpg_rates = snapshot["cpg_rates"].copy()
+
+    if snapshot_generation == generation:
+        return weights, cpg_rates
+
+    deltas = read_record_log(prefix + "_deltas.bin", LINEAGE_DELTA_DTYPE)
+    deltas = deltas[(deltas["generation"] > snapshot_generation) & (deltas["generation"] <= generation)]
+
+    def get_last_occurrences(keys: numpy.ndarray) -> numpy.ndarray:
+        """
+        Finds the index of the last record with each key, since later records replace earlier ones
+        :param keys: The key of each record
+        :return: The indices of the last record with each key
+        """
+        reversed_first_indices = numpy.unique(keys[::-1], return_index=True)[1]
+        return len(keys) - 1 - reversed_first_indices
+
+    # Weights
+    weight_deltas = deltas[deltas["row"] >= 0]
+    num_rows, num_cols = weights.shape[1], weights.shape[2]
+    cell_keys = (weight_deltas["lineage"].astype(numpy.int64) * num_rows + weight_deltas["row"]) * num_cols \
+        + weight_deltas["col"]
+
+    last_weight_deltas = weight_deltas[get_last_occurrences(cell_keys)]
+    weights[last_weight_deltas["lineage"], last_weight_deltas["row"], last_weight_deltas["col"]] \
+        = last_weight_deltas["weight"]
+
+    # CPG Rates
+    last_rate_deltas = deltas[get_last_occurrences(deltas["lineage"])]
+    cpg_rates[last_rate_deltas["lineage"]] = last_rate_deltas["cpg_rate"]
+
+    return weights, cpg_rates
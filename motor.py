@@ -1,6 +1,7 @@
 import pybullet as p
 
 import pyrosim.pyrosim as pyrosim
+import constants as c
 
 
 class Motor:
@@ -20,4 +21,4 @@ class Motor:
                                     jointName=self.motor_name,
                                     controlMode=p.POSITION_CONTROL,
                                     targetPosition=desired_angle,
-                                    maxForce=40)
+                                    maxForce=c.MOTOR_MAX_FORCE)
@@ -0,0 +1,47 @@
+"""
+Runs several evolutionary runs at the same time on one shared set of evaluation workers
+"""
+import threading
+from typing import List
+
+from evaluation_pool import EvaluationPool
+from hillclimber import Hillclimber
+
+
+def run_experiments_concurrently(experiments: List[Hillclimber], max_workers: int, parallel: bool):
+    """
+    Evolves every experiment at the same time. Each experiment keeps its own outputs,
+        while their evaluations are interleaved on a single pool of workers
+    :param experiments: The Hillclimber objects to evolve
+    :param max_workers: The most evaluations that can run at once across all experiments
+    :param parallel: Whether each evaluation should run as a separate process
+    """
+    pool = EvaluationPool(max_workers=max_workers, parallel=parallel)
+
+    errors = []
+
+    def evolve_experiment(experiment: Hillclimber):
+        """
+        Runs on each experiment's thread
+        :param experiment: The experiment to evolve
+        """
+        try:
+            experiment.evolve()
+        except BaseException as error:
+            errors.append(error)
+
+    threads = []
+    for experiment in experiments:
+        experiment.pool = pool
+
+        thread = threading.Thread(target=evolve_experiment, args=(experiment,), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+    pool.close()
+
+    if len(errors) > 0:
+        raise errors[0]
@@ -0,0 +1,25 @@
+"""
+Creates the evolutionary run of the optimizer chosen in `EVOLUTION_CONTROLS`
+"""
+from hillclimber import Hillclimber
+from cma_es import CMAES
+from es import EvolutionStrategy
+import sim_controls as sc
+
+
+OPTIMIZER_HILLCLIMBER = "hillclimber"
+OPTIMIZER_CMA_ES = "cma_es"
+OPTIMIZER_ES = "es"
+
+OPTIMIZERS = {OPTIMIZER_HILLCLIMBER: Hillclimber,
+              OPTIMIZER_CMA_ES: CMAES,
+              OPTIMIZER_ES: EvolutionStrategy}
+
+
+def create_optimizer(**kwargs) -> Hillclimber:
+    """
+    Creates an evolutionary run with the optimizer chosen in `EVOLUTION_CONTROLS`
+    :param kwargs: The arguments of `Hillclimber`
+    :return: The run
+    """
+    return OPTIMIZERS[sc.EVOLUTION_CONTROLS["optimizer"]](**kwargs)
@@ -5,7 +5,7 @@ from pyrosim.synapse import SYNAPSE
 
 class NEURAL_NETWORK: 
 
-    def __init__(self,nndfFileName):
+    def __init__(self,nndfFileName=None,nndfLines=None):
 
         self.neurons = {}
 
@@ -13,13 +13,17 @@ class NEURAL_NETWORK:
 
         self.CPG_rate = None
 
-        f = open(nndfFileName,"r")
+        if nndfLines is None:
 
-        for line in f.readlines():
+            f = open(nndfFileName,"r")
 
-            self.Digest(line)
+            nndfLines = f.readlines()
+
+            f.close()
 
-        f.close()
+        for line in nndfLines:
+
+            self.Digest(line)
 
     def Print(self):
 
@@ -1,7 +1,5 @@
 import math
 
-import pybullet
-
 import pyrosim.pyrosim as pyrosim
 
 import pyrosim.constants as c
@@ -1,4 +1,4 @@
-import pybullet as p
+import io
 
 from pyrosim.nndf import NNDF
 
@@ -47,6 +47,8 @@ def Get_Touch_Sensor_Value_For_Link(linkName):
 
     touchValue = -1.0
 
+    import pybullet as p
+
     desiredLinkIndex = linkNamesToIndices[linkName]
 
     pts = p.getContactPoints()
@@ -63,6 +65,8 @@ def Get_Touch_Sensor_Value_For_Link(linkName):
 
 def Prepare_Link_Dictionary(bodyID):
 
+    import pybullet as p
+
     global linkNamesToIndices
 
     linkNamesToIndices = {}
@@ -89,6 +93,8 @@ def Prepare_Link_Dictionary(bodyID):
 
 def Prepare_Joint_Dictionary(bodyID):
 
+    import pybullet as p
+
     global jointNamesToIndices
 
     jointNamesToIndices = {}
@@ -166,6 +172,8 @@ def Send_Synapse( sourceNeuronName , targetNeuronName , weight ):
  
 def Set_Motor_For_Joint(bodyIndex,jointName,controlMode,targetPosition,maxForce):
 
+    import pybullet as p
+
     p.setJointMotorControl2(
 
         bodyIndex      = bodyIndex,
@@ -194,6 +202,32 @@ def Start_NeuralNetwork(filename):
 
     nndf.Save_Start_Tag(f)
 
+def Start_NeuralNetwork_In_Memory():
+
+    global filetype
+
+    filetype = NNDF_FILETYPE
+
+    global f
+
+    f = io.StringIO()
+
+    global nndf
+
+    nndf = NNDF()
+
+    nndf.Save_Start_Tag(f)
+
+def End_NeuralNetwork_In_Memory():
+
+    nndf.Save_End_Tag(f)
+
+    lines = f.getvalue().splitlines(keepends=True)
+
+    f.close()
+
+    return lines
+
 def Start_SDF(filename):
 
     global availableLinkIndex
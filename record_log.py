@@ -0,0 +1,84 @@
+"""
+Append-only logs of fixed-width binary records. Used for compact run outputs that can be read back quickly as numpy arrays
+"""
+import os
+from typing import List
+
+import numpy
+
+
+class RecordLog:
+    """
+    An append-only file of fixed-width records described by a numpy structured dtype
+    """
+    def __init__(self, filename: str, dtype: numpy.dtype, overwrite: bool):
+        """
+        Opens a record log for appending
+        :param filename: The file that stores the records
+        :param dtype: The numpy structured dtype of a single record
+        :param overwrite: Whether any records already in the file should be deleted
+        """
+        self.filename = filename
+        self.dtype = numpy.dtype(dtype)
+
+        if overwrite:
+            write_mode = "wb"
+        else:
+            write_mode = "ab"
+
+        self.fileout = open(self.filename, write_mode)
+        self.bytes_written = self.fileout.tell()
+
+        self.pending_records: List[numpy.ndarray] = []
+
+    def append(self, records: numpy.ndarray):
+        """
+        Adds records to the log. Records are buffered in memory until `flush` is called
+        :param records: An array of records with the log's dtype
+        """
+        assert (records.dtype == self.dtype)
+
+        self.pending_records.append(records)
+
+    def flush(self):
+        """
+        Writes all buffered records to the file in a single write
+        """
+        if len(self.pending_records) == 0:
+            return
+
+        data = numpy.concatenate(self.pending_records).tobytes()
+        self.pending_records = []
+
+        self.fileout.write(data)
+        self.fileout.flush()
+        self.bytes_written += len(data)
+
+    def get_offset(self) -> int:
+        """
+        Gets the size the file will have once all buffered records are written
+        :return: The offset in bytes
+        """
+        pending_bytes = sum(records.nbytes for records in self.pending_records)
+        return self.bytes_written + pending_bytes
+
+    def close(self):
+        """
+        Writes any buffered records and closes the file
+        """
+        self.flush()
+        self.fileout.close()
+
+
+def read_record_log(filename: str, dtype: numpy.dtype) -> numpy.ndarray:
+    """
+    Reads every complete record from a record log. A partially written final record is ignored
+    :param filename: The file that stores the records
+    :param dtype: The numpy structured dtype of a single record
+    :return: A structured array of the records
+    """
+    dtype = numpy.dtype(dtype)
+
+    num_records = os.path.getsize(filename) // dtype.itemsize
+
+    return numpy.fromfile(filename, dtype=dtype, count=num_records)
@@ -6,8 +6,9 @@ import pyrosim.pyrosim as pyrosim
 from pyrosim.neuralNetwork import NEURAL_NETWORK
 from motor import Motor
 from sensor import Sensor
+from workspace import create_body_filename, create_brain_filename, create_fitness_filename, \
+    create_tmp_fitness_filename
 import constants as c
-import system_info as si
 
 
 def get_joint_type(joint_name: str):
@@ -29,10 +30,16 @@ class Robot:
     """
     A class for controlling a simulated robot
     """
-    def __init__(self, solution_id):
+    def __init__(self, workspace_name, solution_id, num_legs, num_frames, brain_lines=None):
+        """
+        :param brain_lines: The lines of the robot's nndf file. If `None`, the brain is loaded from its file,
+            which is then deleted
+        """
+        self.workspace_name = workspace_name
         self.solution_id = solution_id
+        self.num_frames = num_frames
 
-        self.robotId = p.loadURDF(c.ROBOT_FILENAME)
+        self.robotId = p.loadURDF(create_body_filename(self.workspace_name, num_legs))
 
         pyrosim.Prepare_To_Simulate(self.robotId)
 
@@ -44,23 +51,46 @@ class Robot:
         self.prepare_to_act()
 
         # Neural Network #
-        brain_filename = c.OBJECTS_FOLDER_NAME + "brain" + str(self.solution_id) + ".nndf"
-        self.nn = NEURAL_NETWORK(brain_filename)
+        if brain_lines is None:
+            brain_filename = create_brain_filename(self.workspace_name, self.solution_id)
+            with open(brain_filename, "r") as filein:
+                brain_lines = filein.readlines()
+
+            os.remove(brain_filename)
+
+        # Kept so that the brain can be reset for each trial
+        self.brain_lines = brain_lines
+        self.nn = NEURAL_NETWORK(nndfLines=brain_lines)
 
-        if si.WINDOWS:
-            system_call = "del "
-        else:
-            system_call = "rm "
+    def restart(self, solution_id, num_frames, brain_lines):
+        """
+        Prepares the robot to be simulated again after the simulation's initial state has been restored
+        :param solution_id: The id of the solution being simulated
+        :param num_frames: How many frames the simulation should run for
+        :param brain_lines: The lines of the robot's nndf file
+        """
+        self.solution_id = solution_id
+        self.brain_lines = brain_lines
 
-        system_call += "\"" + si.PROJECT_FILEPATH + brain_filename + "\""
-        os.system(system_call)
+        if num_frames != self.num_frames:
+            self.num_frames = num_frames
+
+            self.sensors = {}
+            self.prepare_to_sense()
+
+        # Restoring a state keeps the motors' last targets, so they are returned to the motors of a newly loaded body
+        for joint_index in range(p.getNumJoints(self.robotId)):
+            p.setJointMotorControl2(bodyIndex=self.robotId, jointIndex=joint_index, controlMode=p.VELOCITY_CONTROL,
+                                    targetVelocity=0, force=c.DEFAULT_JOINT_MOTOR_FORCE)
+
+        self.nn = NEURAL_NETWORK(nndfLines=brain_lines)
 
     def prepare_to_sense(self):
         """
         Creates a list of all the robot's sensors
         """
         for link_name in pyrosim.linkNamesToIndices:
-            self.sensors[link_name] = Sensor(link_name)
+            self.sensors[link_name] = Sensor(link_name, self.num_frames)
 
     def sense(self, time_step):
         """
@@ -102,24 +132,30 @@ class Robot:
         """
         self.nn.Update(current_timestep)
 
-    def get_fitness(self):
+    def get_x_position(self) -> float:
+        """
+        :return: The distance the robot has moved along the x-axis, which is its fitness
+        """
+        return p.getBasePositionAndOrientation(self.robotId)[0][0]
+
+    def get_fitness(self, cpu_seconds: float, fitness: float = None):
         """
-        Calculates the robot's fitness and writes it to a file with protection to allow for parallel simulations
+        Calculates the robot's fitness and writes it to a file with protection to allow for parallel simulations.
+            The cpu time used by the simulation is written on the second line
+        :param cpu_seconds: The cpu time used by the simulation
+        :param fitness: The fitness combined from several trials. Defaults to the robot's current x-position
         """
-        x_position = p.getBasePositionAndOrientation(self.robotId)[0][0]
+        if fitness is None:
+            fitness = self.get_x_position()
 
-        tmp_fitness_filename = c.FITNESS_FOLDER_NAME + "tmp" + str(self.solution_id) + ".txt"
-        fitness_filename = c.FITNESS_FOLDER_NAME + "fitness" + str(self.solution_id) + ".txt"
+        tmp_fitness_filename = create_tmp_fitness_filename(self.workspace_name, self.solution_id)
+        fitness_filename = create_fitness_filename(self.workspace_name, self.solution_id)
         with open(tmp_fitness_filename, "w") as fileout:
-            fileout.write(str(x_position))
+            fileout.write(str(fitness) + "\n" + str(cpu_seconds))
 
         # Change the name of the file only after it has been written
         #   to prevent it being read early by the parallelized solution
-        if si.WINDOWS:
-            os.rename(tmp_fitness_filename, fitness_filename)
-        else:
-            system_call = "mv " + tmp_fitness_filename + " " + fitness_filename
-            os.system(system_call)
+        os.replace(tmp_fitness_filename, fitness_filename)
 
     def save_values(self):
         """
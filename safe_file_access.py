@@ -5,7 +5,6 @@ import time
 from typing import List
 
 import numpy
-import pybullet as p
 import pyrosim.pyrosim as pyrosim
 
 
@@ -93,6 +92,9 @@ def safe_load_sdf(filename: str):
     Safely load an sdf file. If start fails, wait, then try again
     :param filename: The sdf file
     """
+    # Imported here so that writing files does not load the physics engine
+    import pybullet as p
+
     try:
         p.loadSDF(filename)
     except PermissionError:
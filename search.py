@@ -1,16 +1,23 @@
 """
 Searches through a set of solutions to find the most fit
 """
+import glob
 import os
 import sys
 import time
 from typing import Dict, List
 
+from genome_encoding import ENCODINGS
 from hillclimber import Hillclimber
-from solution import Solution
+from multi_experiment import run_experiments_concurrently
+from optimizers import OPTIMIZER_CMA_ES, OPTIMIZER_ES, OPTIMIZERS, create_optimizer
+from lineage_archive import create_lineage_prefix, load_lineage_population
+from shared_memory_backend import BACKEND_FILES, BACKEND_SHARED_MEMORY
+from solution import Solution, get_default_hyperparameters
+from trials import AGGREGATES
+from workspace import Workspace, create_solutions_folder
 import constants as c
 import sim_controls as sc
-import system_info as si
 
 
 def verify_controls():
@@ -85,43 +92,225 @@ def verify_controls():
     verify_active_modes()
 
     verify_control_group_types(control_group=sc.SIMULATION_CONTROLS,
-                               control_names=["num_frames", "parallel_mode", "simulate"],
-                               desired_types=[int, bool, bool])
+                               control_names=["num_frames", "parallel_mode", "simulate", "backend",
+                                              "deterministic_contacts"],
+                               desired_types=[int, bool, bool, str, bool])
+
+    if sc.SIMULATION_CONTROLS["backend"] not in [BACKEND_FILES, BACKEND_SHARED_MEMORY]:
+        print("*** backend must be \"" + BACKEND_FILES + "\" or \"" + BACKEND_SHARED_MEMORY + "\". ***")
+        sys.exit(-1)
+
+    verify_control_group_types(control_group=sc.ROBUSTNESS_CONTROLS,
+                               control_names=["num_trials", "position_range", "yaw_range", "friction_range",
+                                              "aggregate", "seed"],
+                               desired_types=[int, float, float, float, str, int])
+
+    if sc.ROBUSTNESS_CONTROLS["num_trials"] < 1:
+        print("*** num_trials must be at least 1. ***")
+        sys.exit(-1)
+
+    if sc.ROBUSTNESS_CONTROLS["aggregate"] not in AGGREGATES:
+        print("*** aggregate must be one of " + ", ".join(AGGREGATES) + ". ***")
+        sys.exit(-1)
+
+    verify_control_group_types(control_group=sc.HORIZON_CONTROLS,
+                               control_names=["active", "num_frames", "end_generations", "fitness_thresholds"],
+                               desired_types=[bool, (list, int), (list, int), (list, float)])
+
+    horizon_num_frames = sc.HORIZON_CONTROLS["num_frames"]
+    if not len(horizon_num_frames) == len(sc.HORIZON_CONTROLS["end_generations"]) \
+            == len(sc.HORIZON_CONTROLS["fitness_thresholds"]):
+        print("*** num_frames, end_generations, and fitness_thresholds must have the same length. ***")
+        sys.exit(-1)
+
+    if any(num_frames < 1 for num_frames in horizon_num_frames):
+        print("*** Each item in num_frames must be at least 1. ***")
+        sys.exit(-1)
+
+    if horizon_num_frames != sorted(horizon_num_frames) \
+            or sc.HORIZON_CONTROLS["end_generations"] != sorted(sc.HORIZON_CONTROLS["end_generations"]):
+        print("*** num_frames and end_generations must be in increasing order. ***")
+        sys.exit(-1)
 
     verify_control_group_types(control_group=sc.FITNESS_OUTPUT_CONTROLS,
-                               control_names=["print_results", "round_results", "round_length", "run_index"],
-                               desired_types=[bool, bool, int, int])
+                               control_names=["print_results", "round_results", "round_length", "run_index",
+                                              "export_csv"],
+                               desired_types=[bool, bool, int, int, bool])
+
+    verify_control_group_types(control_group=sc.OUTPUT_WRITER_CONTROLS,
+                               control_names=["background", "queue_size", "console_interval"],
+                               desired_types=[bool, int, float])
+
+    verify_control_group_types(control_group=sc.LINEAGE_ARCHIVE_CONTROLS,
+                               control_names=["snapshot_interval"],
+                               desired_types=[int])
+
+    verify_control_group_types(control_group=sc.CHECKPOINT_CONTROLS,
+                               control_names=["active", "generation_interval", "seconds_interval", "resume"],
+                               desired_types=[bool, int, float, bool])
+
+    verify_control_group_types(control_group=sc.EVALUATION_CACHE_CONTROLS,
+                               control_names=["active", "memory_entries", "max_disk_entries"],
+                               desired_types=[bool, int, int])
+
+    verify_control_group_types(control_group=sc.SCHEDULER_CONTROLS,
+                               control_names=["largest_first", "cost_smoothing", "save_cost_model", "warm_workers",
+                                              "rebalance_threshold"],
+                               desired_types=[bool, float, bool, bool, int])
+
+    if sc.SCHEDULER_CONTROLS["warm_workers"] and not sc.SIMULATION_CONTROLS["deterministic_contacts"]:
+        print("*** warm_workers requires deterministic_contacts. ***")
+        sys.exit(-1)
+
+    verify_control_group_types(control_group=sc.EVOLUTION_CONTROLS,
+                               control_names=["optimizer", "children_per_parent", "cma_initial_sigma", "es_sigma",
+                                              "es_learning_rate", "es_noise_table_size", "genome_encoding"],
+                               desired_types=[str, int, float, float, float, int, str])
+
+    if sc.EVOLUTION_CONTROLS["optimizer"] not in OPTIMIZERS:
+        print("*** optimizer must be one of " + ", ".join(OPTIMIZERS) + ". ***")
+        sys.exit(-1)
+
+    if sc.EVOLUTION_CONTROLS["genome_encoding"] not in ENCODINGS:
+        print("*** genome_encoding must be one of " + ", ".join(ENCODINGS) + ". ***")
+        sys.exit(-1)
+
+    if sc.EVOLUTION_CONTROLS["children_per_parent"] < 1:
+        print("*** children_per_parent must be at least 1. ***")
+        sys.exit(-1)
+
+    if sc.EVOLUTION_CONTROLS["optimizer"] in [OPTIMIZER_CMA_ES, OPTIMIZER_ES] \
+            and sc.EVOLUTION_CONTROLS["children_per_parent"] != 1:
+        print("*** " + sc.EVOLUTION_CONTROLS["optimizer"] + " samples one child per parent, "
+              + "so children_per_parent must be 1. ***")
+        sys.exit(-1)
+
+    verify_control_group_types(control_group=sc.SURROGATE_CONTROLS,
+                               control_names=["active", "simulate_fraction", "random_fraction", "min_samples",
+                                              "max_samples", "regularization"],
+                               desired_types=[bool, float, float, int, int, float])
+
+    if not 0 < sc.SURROGATE_CONTROLS["simulate_fraction"] <= 1:
+        print("*** simulate_fraction must be greater than 0 and at most 1. ***")
+        sys.exit(-1)
+
+    if not 0 <= sc.SURROGATE_CONTROLS["random_fraction"] <= sc.SURROGATE_CONTROLS["simulate_fraction"]:
+        print("*** random_fraction must be between 0 and simulate_fraction. ***")
+        sys.exit(-1)
+
+    verify_control_group_types(control_group=sc.WARM_START_CONTROLS,
+                               control_names=["active", "fraction", "noise", "include_solutions", "transfer",
+                                              "save_elites", "archive_size"],
+                               desired_types=[bool, float, float, bool, bool, bool, int])
+
+    if not 0 <= sc.WARM_START_CONTROLS["fraction"] <= 1:
+        print("*** fraction must be between 0 and 1. ***")
+        sys.exit(-1)
+
+    if sc.WARM_START_CONTROLS["noise"] < 0:
+        print("*** noise cannot be negative. ***")
+        sys.exit(-1)
+
+    if sc.WARM_START_CONTROLS["archive_size"] < 1:
+        print("*** archive_size must be at least 1. ***")
+        sys.exit(-1)
+
+    verify_control_group_types(control_group=sc.STOPPING_CONTROLS,
+                               control_names=["max_evaluations", "max_frames", "max_wall_seconds", "max_cpu_seconds",
+                                              "plateau_generations", "plateau_tolerance"],
+                               desired_types=[int, int, float, float, int, float])
 
     verify_control_group_types(control_group=sc.STANDARD_OPERATING_MODE,
                                control_names=["generations", "pop_size", "num_legs", "cpg"],
                                desired_types=[int, int, int, bool])
 
     verify_control_group_types(control_group=sc.SIMULATE_MULTIPLE_ROBOTS_TYPES,
-                               control_names=["active", "generations", "pop_size", "leg_nums"],
-                               desired_types=[bool, int, int, (list, int)])
+                               control_names=["active", "generations", "pop_size", "leg_nums", "concurrent",
+                                              "max_workers"],
+                               desired_types=[bool, int, int, (list, int), bool, int])
+
+    verify_control_group_types(control_group=sc.SWEEP_CONTROLS,
+                               control_names=["replicates", "first_run_index", "leg_nums", "cpg_modes", "num_frames",
+                                              "generations", "pop_size", "core_budget", "max_concurrent_jobs",
+                                              "sweep_name", "share_budget", "curriculum"],
+                               desired_types=[int, int, (list, int), (list, bool), (list, int),
+                                              int, int, int, int, str, bool, bool])
+
+    verify_control_group_types(control_group=sc.ISLAND_CONTROLS,
+                               control_names=["num_islands", "migration_interval", "num_migrants", "run_index",
+                                              "generations", "pop_size", "num_legs", "cpg", "islands_name"],
+                               desired_types=[int, int, int, int, int, int, int, bool, str])
+
+    verify_control_group_types(control_group=sc.TUNER_CONTROLS,
+                               control_names=["num_configs", "include_defaults", "search_space", "min_generations",
+                                              "max_generations", "promote_fraction", "seed", "run_index", "num_legs",
+                                              "cpg", "pop_size", "num_frames", "core_budget", "max_concurrent_runs",
+                                              "tuning_name"],
+                               desired_types=[int, bool, dict, int, int, float, int, int, int, bool, int, int, int, int,
+                                              str])
+
+    for name, value_range in sc.TUNER_CONTROLS["search_space"].items():
+        if name not in get_default_hyperparameters():
+            print("*** " + name + " is not a setting that can be searched. ***")
+            sys.exit(-1)
+
+        verify_control_group_types(control_group=sc.TUNER_CONTROLS["search_space"], control_names=[name],
+                                   desired_types=[(list, int)])
+
+        if len(value_range) != 2 or not 1 <= value_range[0] <= value_range[1]:
+            print("*** The range of " + name + " must be a lowest and a highest value of at least 1. ***")
+            sys.exit(-1)
+
+    if sc.TUNER_CONTROLS["num_configs"] < 1:
+        print("*** num_configs must be at least 1. ***")
+        sys.exit(-1)
+
+    if not 1 <= sc.TUNER_CONTROLS["min_generations"] <= sc.TUNER_CONTROLS["max_generations"]:
+        print("*** min_generations must be at least 1 and at most max_generations. ***")
+        sys.exit(-1)
+
+    if not 0 < sc.TUNER_CONTROLS["promote_fraction"] < 1:
+        print("*** promote_fraction must be between 0 and 1. ***")
+        sys.exit(-1)
+
+    verify_control_group_types(control_group=sc.LANDSCAPE_CONTROLS,
+                               control_names=["num_samples", "chunk_size", "batch_size", "sampling",
+                                              "perturbation_sigma", "seed", "run_index", "num_legs", "cpg",
+                                              "num_frames", "core_budget", "dataset_name"],
+                               desired_types=[int, int, int, str, float, int, int, int, bool, int, int, str])
+
+    if sc.LANDSCAPE_CONTROLS["chunk_size"] < 1 or sc.LANDSCAPE_CONTROLS["batch_size"] < 1:
+        print("*** chunk_size and batch_size must be at least 1. ***")
+        sys.exit(-1)
+
+    if sc.LANDSCAPE_CONTROLS["sampling"] not in ["random", "perturbed"]:
+        print("*** sampling must be \"random\" or \"perturbed\". ***")
+        sys.exit(-1)
 
     verify_control_group_types(sc.SHOW_SPECIFIC_SOLUTION,
-                               control_names=["active", "sol_index", "num_legs", "cpg"],
-                               desired_types=[bool, int, int, bool])
+                               control_names=["active", "sol_index", "num_legs", "cpg", "generation"],
+                               desired_types=[bool, int, int, bool, int])
 
 
-def clear_old_data():
+def clear_old_data(run_index: int):
     """
-    Deletes files from the `solutions` and `data` folders.
+    Deletes the files of a run index from the `solutions`, `data`, `lineage`, and `checkpoints` folders.
+    Files of other run indices are kept, so runs with different indices can evolve at the same time.
     If you want to keep them, move them to a separate location before beginning further evolution.
+    :param run_index: The index of the evolutionary run
     """
-    if si.WINDOWS:
-        system_call = "del "
-    else:
-        system_call = "rm "
+    solutions_folder = glob.escape(create_solutions_folder("", run_index))
 
-    system_calls = [system_call + "\"" + si.PROJECT_FILEPATH + c.SOLUTIONS_FOLDER_NAME + "*.txt\"",
-                    system_call + "\"" + si.PROJECT_FILEPATH + c.SOLUTIONS_FOLDER_NAME + "*.npy\"",
-                    system_call + "\"" + si.PROJECT_FILEPATH + c.DATA_FOLDER_NAME + "*.txt\"",
-                    system_call + "\"" + si.PROJECT_FILEPATH + c.DATA_FOLDER_NAME + "*.csv\""]
+    patterns = [os.path.join(solutions_folder, "*.txt"),
+                os.path.join(solutions_folder, "*.npy"),
+                os.path.join(c.DATA_FOLDER_NAME, "fitness" + str(run_index) + "(*"),
+                os.path.join(c.DATA_FOLDER_NAME, "summary" + str(run_index) + "(*"),
+                os.path.join(c.LINEAGE_FOLDER_NAME, "lineage" + str(run_index) + "(*"),
+                os.path.join(c.CHECKPOINTS_FOLDER_NAME, "checkpoint" + str(run_index) + "(*")]
 
-    for system_call in system_calls:
-        os.system(system_call)
+    for pattern in patterns:
+        for filename in glob.glob(pattern):
+            os.remove(filename)
 
 
 def run_evolution(simulation: Hillclimber, show_best: bool):
@@ -140,19 +329,24 @@ def run_evolution(simulation: Hillclimber, show_best: bool):
 
 
 if __name__ == "__main__":
-    # Save start time
-    with open("time.txt", "w") as fileout:
-        start_time = time.time()
-        fileout.write(("Start: " + str(start_time) + "\n"))
-
     verify_controls()
 
     parallel_mode = sc.SIMULATION_CONTROLS["parallel_mode"]
 
     run_index = sc.FITNESS_OUTPUT_CONTROLS["run_index"]
 
+    # Save start time. Each run index has its own file so that runs started at the same time do not overwrite it
+    os.makedirs(c.DATA_FOLDER_NAME, exist_ok=True)
+    time_filename = os.path.join(c.DATA_FOLDER_NAME, "time" + str(run_index) + ".txt")
+    with open(time_filename, "w") as fileout:
+        start_time = time.time()
+        fileout.write(("Start: " + str(start_time) + "\n"))
+
+    resume = sc.CHECKPOINT_CONTROLS["resume"]
+
     if sc.STANDARD_OPERATING_MODE["active"]:
-        clear_old_data()
+        if not resume:
+            clear_old_data(run_index)
 
         controls = sc.STANDARD_OPERATING_MODE
 
@@ -161,13 +355,14 @@ if __name__ == "__main__":
         num_legs = controls["num_legs"]
         cpg_active = controls["cpg"]
 
-        sim = Hillclimber(num_generations=num_generations, population_size=pop_size, num_legs=num_legs,
-                          cpg_active=cpg_active, parallel=parallel_mode, run_index=run_index)
+        sim = create_optimizer(num_generations=num_generations, population_size=pop_size, num_legs=num_legs,
+                               cpg_active=cpg_active, parallel=parallel_mode, run_index=run_index, resume=resume)
 
         run_evolution(sim, show_best=True)
 
     elif sc.SIMULATE_MULTIPLE_ROBOTS_TYPES["active"]:
-        clear_old_data()
+        if not resume:
+            clear_old_data(run_index)
 
         controls = sc.SIMULATE_MULTIPLE_ROBOTS_TYPES
 
@@ -177,12 +372,27 @@ if __name__ == "__main__":
 
         cpg_modes = [False, True]
 
-        for cpg_mode in cpg_modes:
-            for num_legs in leg_nums:
-                sim = Hillclimber(num_generations=num_generations, population_size=pop_size, num_legs=num_legs,
-                                  cpg_active=cpg_mode, parallel=parallel_mode, run_index=run_index)
+        if controls["concurrent"]:
+            experiments = []
+            for cpg_mode in cpg_modes:
+                for num_legs in leg_nums:
+                    experiments.append(create_optimizer(num_generations=num_generations, population_size=pop_size,
+                                                        num_legs=num_legs, cpg_active=cpg_mode, parallel=parallel_mode,
+                                                        run_index=run_index, resume=resume))
+
+            max_workers = controls["max_workers"]
+            if max_workers <= 0:
+                max_workers = os.cpu_count()
 
-                run_evolution(sim, show_best=False)
+            run_experiments_concurrently(experiments, max_workers=max_workers, parallel=parallel_mode)
+        else:
+            for cpg_mode in cpg_modes:
+                for num_legs in leg_nums:
+                    sim = create_optimizer(num_generations=num_generations, population_size=pop_size,
+                                           num_legs=num_legs, cpg_active=cpg_mode, parallel=parallel_mode,
+                                           run_index=run_index, resume=resume)
+
+                    run_evolution(sim, show_best=False)
 
     elif sc.SHOW_SPECIFIC_SOLUTION["active"]:
         controls = sc.SHOW_SPECIFIC_SOLUTION
@@ -191,11 +401,22 @@ if __name__ == "__main__":
         sol_index = controls["sol_index"]
         cpg_active = controls["cpg"]
 
-        sol = Solution(solution_id=0, num_legs=num_legs, cpg_active=cpg_active)
-        sol.show_solution(sol_index)
+        sol = Solution(solution_id=0, num_legs=num_legs, cpg_active=cpg_active, workspace=Workspace("show", run_index))
+
+        if controls["generation"] < 0:
+            sol.show_solution(sol_index)
+        else:
+            lineage_prefix = create_lineage_prefix(c.LINEAGE_FOLDER_NAME, run_index, num_legs, cpg_active)
+            weights, cpg_rates = load_lineage_population(lineage_prefix, controls["generation"])
+
+            sol.weights = weights[sol_index]
+            if cpg_active:
+                sol.cpg_rate = int(cpg_rates[sol_index])
+
+            sol.replay()
 
     # Save end time and seconds elapsed
-    with open("time.txt", "a") as fileout:
+    with open(time_filename, "a") as fileout:
         end_time = time.time()
         fileout.write(("End: " + str(end_time) + "\n"))
         fileout.write(("Elapsed: " + str(end_time - start_time)))
@@ -1,16 +1,15 @@
 import numpy
 
 import pyrosim.pyrosim as pyrosim
-import sim_controls as sc
 
 
 class Sensor:
     """
     Controls a single sensor
     """
-    def __init__(self, link_name: str):
+    def __init__(self, link_name: str, num_frames: int):
         self.link_name = link_name
-        self.sensor_values = numpy.zeros(sc.SIMULATION_CONTROLS["num_frames"])
+        self.sensor_values = numpy.zeros(num_frames)
 
     def get_value(self, time_step: int):
         """
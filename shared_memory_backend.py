@@ -0,0 +1,400 @@
+"""
+Evaluates solutions without writing brain or fitness files.
+    The weights and cpg rate of every solution in a generation are published to one shared memory block.
+    Persistent worker processes read a solution's slice of the block by its index, simulate it, and write its fitness
+    and cpu time back to the block, so each evaluation only sends a small message to its worker.
+    Solutions sampled by the evolution strategy are sent as an offset into a table of noise shared by every worker,
+    which the worker adds to the generation's mean genome
+"""
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+
+BACKEND_FILES = "files"
+BACKEND_SHARED_MEMORY = "shared_memory"
+
+# The most generation buffers and noise tables a worker process keeps attached.
+#   Runs that have finished no longer send tasks
+MAX_ATTACHED_BUFFERS = 16
+
+# The seed of the values in every noise table, so that a resumed run samples from the same table
+NOISE_TABLE_SEED = 0
+
+
+def create_generation_arrays(buffer, capacity: int, num_rows: int, num_cols: int) -> Tuple[numpy.ndarray, ...]:
+    """
+    Creates arrays that view a generation buffer's memory without copying it
+    :param buffer: The memory of the shared memory block
+    :param capacity: The most solutions the block can hold
+    :param num_rows: The number of rows of each weight matrix
+    :param num_cols: The number of columns of each weight matrix
+    :return: The weights, cpg rates, fitness values, and cpu seconds of every solution in the block
+    """
+    weights_size = capacity * num_rows * num_cols
+    item_size = numpy.dtype(numpy.float64).itemsize
+
+    weights = numpy.ndarray((capacity, num_rows, num_cols), dtype=numpy.float64, buffer=buffer)
+    cpg_rates = numpy.ndarray((capacity,), dtype=numpy.float64, buffer=buffer,
+                              offset=(weights_size * item_size))
+    fitness = numpy.ndarray((capacity,), dtype=numpy.float64, buffer=buffer,
+                            offset=((weights_size + capacity) * item_size))
+    cpu_seconds = numpy.ndarray((capacity,), dtype=numpy.float64, buffer=buffer,
+                                offset=((weights_size + 2 * capacity) * item_size))
+
+    return weights, cpg_rates, fitness, cpu_seconds
+
+
+class GenerationBuffer:
+    """
+    A shared memory block holding the genomes of the solutions being evaluated and the results of their simulations.
+        Created by the run that owns it and reused for every generation
+    """
+    def __init__(self, capacity: int, num_rows: int, num_cols: int):
+        """
+        :param capacity: The most solutions the buffer can hold
+        :param num_rows: The number of rows of each weight matrix
+        :param num_cols: The number of columns of each weight matrix
+        """
+        self.capacity = capacity
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+
+        num_values = capacity * num_rows * num_cols + 3 * capacity
+        self.shared_memory = shared_memory.SharedMemory(create=True,
+                                                        size=(num_values * numpy.dtype(numpy.float64).itemsize))
+        self.name = self.shared_memory.name
+
+        self.weights, self.cpg_rates, self.fitness, self.cpu_seconds = \
+            create_generation_arrays(self.shared_memory.buf, self.capacity, self.num_rows, self.num_cols)
+
+    def fits(self, num_solutions: int, num_rows: int, num_cols: int) -> bool:
+        """
+        :return: Whether the buffer can hold the given number of solutions with weight matrices of the given shape
+        """
+        return num_solutions <= self.capacity and num_rows == self.num_rows and num_cols == self.num_cols
+
+    def publish(self, solutions: List):
+        """
+        Copies the weights and cpg rate of each solution into the buffer. A solution's index in the list is its
+            index in the buffer
+        :param solutions: The solutions about to be evaluated
+        """
+        for index, solution in enumerate(solutions):
+            self.weights[index] = solution.weights
+
+            if solution.cpg_active:
+                self.cpg_rates[index] = solution.cpg_rate
+            else:
+                self.cpg_rates[index] = 0
+
+    def create_task(self, index: int, solution, keep_warm: bool) -> Tuple:
+        """
+        Creates the message that tells a worker process to evaluate a published solution
+        :param index: The index of the solution in the buffer
+        :param solution: The solution
+        :param keep_warm: Whether the worker should keep the robot's body loaded for the next solution
+        :return: The message
+        """
+        return (self.name, self.capacity, self.num_rows, self.num_cols, index, solution.num_legs,
+                solution.cpg_active, solution.num_frames, solution.workspace.name, solution.solution_id, keep_warm,
+                None)
+
+    def collect(self, solutions: List):
+        """
+        Copies the fitness and cpu seconds written by the worker processes to each solution
+        :param solutions: The solutions in the order they were published
+        """
+        for index, solution in enumerate(solutions):
+            solution.fitness = float(self.fitness[index])
+            solution.cpu_seconds = float(self.cpu_seconds[index])
+
+    def close(self):
+        """
+        Releases and deletes the shared memory block
+        """
+        # The block cannot be closed while arrays still view it
+        self.weights = self.cpg_rates = self.fitness = self.cpu_seconds = None
+
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+class NoiseTable:
+    """
+    A shared memory block of normally distributed values. Created once by each run of the evolution strategy,
+        and read by its worker processes without being copied
+    """
+    def __init__(self, size: int):
+        """
+        :param size: The number of values in the table
+        """
+        self.size = size
+
+        self.shared_memory = shared_memory.SharedMemory(create=True,
+                                                        size=(size * numpy.dtype(numpy.float32).itemsize))
+        self.name = self.shared_memory.name
+
+        self.noise = numpy.ndarray((size,), dtype=numpy.float32, buffer=self.shared_memory.buf)
+        self.noise[:] = numpy.random.default_rng(NOISE_TABLE_SEED).standard_normal(size, dtype=numpy.float32)
+
+    def get_rows(self, offsets: numpy.ndarray, length: int) -> numpy.ndarray:
+        """
+        :param offsets: The index of the first value of each row
+        :param length: The number of values in each row
+        :return: A copy of the values of each row, with the shape (rows, length)
+        """
+        return self.noise[offsets[:, numpy.newaxis] + numpy.arange(length)]
+
+    def close(self):
+        """
+        Releases and deletes the shared memory block
+        """
+        # The block cannot be closed while arrays still view it
+        self.noise = None
+
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+def create_perturbed_genome(mean: numpy.ndarray, noise: numpy.ndarray, sign: int, sigma: float) -> numpy.ndarray:
+    """
+    Creates a genome sampled by the evolution strategy. The evolving process and the worker processes
+        both use this function, so that they create exactly the same genome
+    :param mean: The mean genome of the generation
+    :param noise: The noise values of the sample, or of several samples with the shape (samples, genome length)
+    :param sign: `1` or `-1`, or an array of the sign of each sample, since each noise row is both added to and
+        subtracted from the mean
+    :param sigma: The standard deviation of the samples
+    :return: The genome, or genomes, before they are repaired
+    """
+    return mean + (numpy.multiply(sign, sigma)[..., numpy.newaxis] * noise.astype(numpy.float64))
+
+
+class PerturbationBuffer(GenerationBuffer):
+    """
+    A generation buffer for the evolution strategy. Only the generation's mean genome is published, in the start of
+        the first weight matrix. Each task holds the offset of its noise in the noise table and its sign instead of
+        a genome.
+        Solutions that were not sampled from the mean, such as the first generation, are published in full
+    """
+    def __init__(self, capacity: int, num_rows: int, num_cols: int, noise_table: NoiseTable, sigma: float,
+                 encoding: str):
+        """
+        :param capacity: The most solutions the buffer can hold
+        :param num_rows: The number of rows of each weight matrix
+        :param num_cols: The number of columns of each weight matrix
+        :param noise_table: The noise table the samples are taken from
+        :param sigma: The standard deviation of the samples
+        :param encoding: The encoding that creates the weights from the genome
+        """
+        super().__init__(capacity, num_rows, num_cols)
+
+        self.noise_table = noise_table
+        self.sigma = sigma
+        self.encoding = encoding
+        # The number of genome values other than the cpg rate
+        self.genome_length = 0
+        # The noise offset and sign of each published solution, or `None` if the solutions were published in full
+        self.perturbations: Optional[List[Tuple[int, int]]] = None
+
+    def publish(self, solutions: List):
+        """
+        Copies the weights and cpg rate of each solution into the buffer
+        :param solutions: The solutions about to be evaluated
+        """
+        super().publish(solutions)
+
+        self.perturbations = None
+
+    def publish_perturbations(self, mean: numpy.ndarray, genome_length: int, perturbations: List[Tuple[int, int]]):
+        """
+        Copies the mean genome into the first slot of the buffer. Its scaled cpg rate, if any, is stored as the first
+            cpg rate
+        :param mean: The mean genome of the generation
+        :param genome_length: The number of genome values other than the cpg rate
+        :param perturbations: The noise offset and sign of each solution about to be evaluated
+        """
+        self.genome_length = genome_length
+
+        self.weights[0].reshape(-1)[:genome_length] = mean[:genome_length]
+        if len(mean) > genome_length:
+            self.cpg_rates[0] = mean[genome_length]
+        else:
+            self.cpg_rates[0] = 0
+
+        self.perturbations = perturbations
+
+    def create_task(self, index: int, solution, keep_warm: bool) -> Tuple:
+        """
+        Creates the message that tells a worker process to evaluate a sample of the published mean or a published
+            solution
+        :param index: The index of the solution's fitness in the buffer
+        :param solution: The solution
+        :param keep_warm: Whether the worker should keep the robot's body loaded for the next solution
+        :return: The message
+        """
+        if self.perturbations is None:
+            return super().create_task(index, solution, keep_warm)
+
+        offset, sign = self.perturbations[index]
+
+        return super().create_task(index, solution, keep_warm)[:-1] \
+            + ((self.noise_table.name, self.noise_table.size, offset, sign, self.sigma, self.encoding,
+                self.genome_length),)
+
+
+def run_worker_process(connection: Connection):
+    """
+    Runs in each worker process. Repeatedly receives a task, simulates the solution it points to, and replies with
+        `None` or a description of the error raised by the simulation. Stops when it receives `None`.
+        A task with a perturbation simulates the buffer's mean genome plus the task's noise instead of its own weights.
+        A worker told to keep warm keeps its last simulation connected, and restarts it from its saved initial state
+        instead of loading a new one when the next solution has the same number of legs
+    :param connection: The worker's end of the pipe to the evaluation pool
+    """
+    # Imported here so that the physics engine is only loaded by worker processes, once for all of their simulations
+    from simulation import Simulation
+    from genome_encoding import decode_weights, get_weight_map
+    from solution import create_brain_lines, create_link_and_joint_names, get_genome_cpg_rate, repair_genome_vector
+
+    attached_buffers: Dict[str, shared_memory.SharedMemory] = collections.OrderedDict()
+    link_and_joint_names: Dict[int, Tuple[List[str], List[str]]] = {}
+
+    warm_simulation = None
+    warm_num_legs = None
+
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+
+        buffer_name, capacity, num_rows, num_cols, index, num_legs, cpg_active, num_frames, workspace_name, \
+            solution_id, keep_warm, perturbation = task
+
+        error = None
+        try:
+            attach_buffer(attached_buffers, buffer_name)
+
+            if num_legs not in link_and_joint_names:
+                link_and_joint_names[num_legs] = create_link_and_joint_names(num_legs)
+            link_names, joint_names = link_and_joint_names[num_legs]
+
+            weights, cpg_rates, fitness, cpu_seconds = \
+                create_generation_arrays(attached_buffers[buffer_name].buf, capacity, num_rows, num_cols)
+
+            cpg_rate: Optional[int] = None
+
+            if perturbation is None:
+                solution_weights = weights[index]
+                if cpg_active:
+                    cpg_rate = int(cpg_rates[index])
+            else:
+                noise_name, noise_size, offset, sign, sigma, encoding, num_weights = perturbation
+                attach_buffer(attached_buffers, noise_name)
+
+                mean = weights[0].flatten()[:num_weights]
+                if cpg_active:
+                    mean = numpy.append(mean, cpg_rates[0])
+
+                noise = numpy.ndarray((noise_size,), dtype=numpy.float32, buffer=attached_buffers[noise_name].buf)
+                genome = create_perturbed_genome(mean, noise[offset:(offset + len(mean))], sign, sigma)
+                del noise
+
+                repair_genome_vector(genome, num_weights, cpg_active)
+
+                solution_weights = decode_weights(genome[:num_weights], get_weight_map(encoding, num_legs))
+                if cpg_active:
+                    cpg_rate = get_genome_cpg_rate(genome, num_weights)
+
+            brain_lines = create_brain_lines(link_names, joint_names, solution_weights, cpg_rate)
+
+            if keep_warm and warm_simulation is not None and warm_num_legs == num_legs:
+                warm_simulation.restart(solution_id, num_frames, brain_lines)
+                simulation = warm_simulation
+            else:
+                # Disconnects the physics engine before the next simulation connects to it
+                warm_simulation = None
+
+                simulation = Simulation(False, workspace_name, solution_id, num_legs, num_frames, brain_lines)
+
+                if keep_warm:
+                    simulation.save_initial_state()
+                    warm_simulation = simulation
+                    warm_num_legs = num_legs
+
+            fitness[index] = simulation.evaluate()
+            cpu_seconds[index] = simulation.get_cpu_seconds()
+
+            del simulation
+            del weights, cpg_rates, fitness, cpu_seconds, solution_weights
+        except Exception as raised_error:
+            error = repr(raised_error)
+            warm_simulation = None
+
+        connection.send(error)
+
+    for attached_buffer in attached_buffers.values():
+        attached_buffer.close()
+
+
+def attach_buffer(attached_buffers: Dict[str, shared_memory.SharedMemory], buffer_name: str):
+    """
+    Attaches a worker process to a shared memory block, unless it already is.
+        Detaches from the least recently attached block if too many are attached
+    :param attached_buffers: The blocks the worker is attached to, in the order they were attached
+    :param buffer_name: The name of the block
+    """
+    if buffer_name in attached_buffers:
+        return
+
+    attached_buffers[buffer_name] = shared_memory.SharedMemory(name=buffer_name)
+
+    if len(attached_buffers) > MAX_ATTACHED_BUFFERS:
+        attached_buffers.popitem(last=False)[1].close()
+
+
+class SharedMemoryWorker:
+    """
+    A persistent process that simulates solutions published to generation buffers
+    """
+    def __init__(self):
+        # Worker processes start fresh instead of copying the threads and open files of the evolving process
+        context = multiprocessing.get_context("spawn")
+
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(target=run_worker_process, args=(worker_connection,), daemon=True)
+        self.process.start()
+
+        worker_connection.close()
+
+    def evaluate(self, buffer: GenerationBuffer, index: int, solution, keep_warm: bool = False):
+        """
+        Simulates a published solution and waits for its results to be written to the buffer
+        :param buffer: The buffer the solution was published to
+        :param index: The index of the solution in the buffer
+        :param solution: The solution
+        :param keep_warm: Whether the worker should keep the robot's body loaded for the next solution
+        """
+        self.connection.send(buffer.create_task(index, solution, keep_warm))
+
+        error = self.connection.recv()
+        if error is not None:
+            raise RuntimeError("Simulation of solution " + str(solution.solution_id) + " failed: " + error)
+
+    def close(self):
+        """
+        Stops the process
+        """
+        try:
+            self.connection.send(None)
+        except OSError:
+            # The process has already stopped
+            pass
+
+        self.process.join()
+        self.connection.close()
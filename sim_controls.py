@@ -7,18 +7,198 @@ Modify these values to change the functioning of the simulation and evolution
 # `num_frames`:    How many frames the simulator should run for
 # `parallel_mode`: Whether multiple simulations should be run in parallel
 # `simulate`:      Whether the simulation should run; Set to false for checking robot designs
+# `backend`:       How solutions are sent to parallel simulations. Either:
+#                    "files":         Each simulation is a new process that reads its brain from a file
+#                                     and writes its fitness to a file
+#                    "shared_memory": Each generation is published to shared memory, and persistent worker
+#                                     processes read each solution by its index and write back its fitness
+# `deterministic_contacts`: Whether pybullet should order contacts the same way in every simulation, so that
+#                           a simulation restarted from a saved state matches a newly loaded one.
+#                           Required by `warm_workers` in `SCHEDULER_CONTROLS`. Changes the fitness of every solution
 SIMULATION_CONTROLS = {"num_frames": 2000,
                        "parallel_mode": True,
-                       "simulate": True}
+                       "simulate": True,
+                       "backend": "files",
+                       "deterministic_contacts": False}
+
+# Simulates each solution several times from perturbed starts, so that evolution favors gaits that do not depend on the
+#   exact start. Each simulation loads the robot once and restores its initial state between trials.
+#   Every solution faces the same trials, which are created from `seed`
+# `num_trials`:     How many times each solution is simulated. With `1`, the robot starts as usual and its fitness is
+#                   its final x-position
+# `position_range`: The most the start position is moved along the x-axis and the y-axis in each trial
+# `yaw_range`:      The most the start orientation is turned about the vertical axis in each trial, in radians
+# `friction_range`: The most the ground's friction is scaled up or down in each trial, as a share of its usual value
+# `aggregate`:      How the distance moved along the x-axis in each trial is combined into the fitness. Either:
+#                     "mean", "median", "min", or "mean_minus_std" (the mean minus the standard deviation)
+# `seed`:           The seed the trials are created from
+ROBUSTNESS_CONTROLS = {"num_trials": 1,
+                       "position_range": 0.5,
+                       "yaw_range": 0.2,
+                       "friction_range": 0.3,
+                       "aggregate": "mean",
+                       "seed": 0}
+
+# Simulates robots for fewer frames in early generations, and lengthens the simulations in stages as the run evolves.
+#   When a stage ends, the parents are simulated again for the next stage's number of frames, so children are only
+#   ever compared with parents simulated for as long. After the listed stages, robots are simulated for the run's own
+#   number of frames. Each list has one item per stage
+# `active`:             Whether the number of frames is lengthened in stages
+# `num_frames`:         How many frames robots are simulated for in each stage. Never more than the run's own
+# `end_generations`:    The generation after which each stage ends
+# `fitness_thresholds`: The best fitness that ends each stage early, or `0` to only end the stage at its generation
+HORIZON_CONTROLS = {"active": False,
+                    "num_frames": [250, 500, 1000],
+                    "end_generations": [50, 100, 200],
+                    "fitness_thresholds": [0.0, 0.0, 0.0]}
 
 # `print_results`: Whether the fitness of each generation should be printed to the console
 # `round_results`: Whether the fitness values should be rounded
 # `round_length`:  How many decimal places the fitness values should be rounded to
 # `run_index`:     The index of the current evolutionary run. Changes the name and solution index of the data outputs
+# `export_csv`:    Whether the binary fitness history should be converted to a csv file at the end of each run
 FITNESS_OUTPUT_CONTROLS = {"print_results": True,
                            "round_results": False,
                            "round_length": 5,
-                           "run_index": 0}
+                           "run_index": 0,
+                           "export_csv": True}
+
+# `background`:       Whether fitness output and saved solutions should be written on a separate thread
+#                       so that evaluation of the next generation can start immediately
+# `queue_size`:       The most output tasks that can wait to be written before evolution pauses for the writer
+# `console_interval`: The minimum number of seconds between console prints. Output in between is combined
+OUTPUT_WRITER_CONTROLS = {"background": True,
+                          "queue_size": 256,
+                          "console_interval": 1.0}
+
+# `snapshot_interval`: How many generations apart full snapshots of the population are saved.
+#                      Between snapshots, only the mutations accepted each generation are saved
+LINEAGE_ARCHIVE_CONTROLS = {"snapshot_interval": 50}
+
+# `active`:              Whether checkpoints should be saved during evolution
+# `generation_interval`: How many generations apart checkpoints are saved. Set to `0` to only use `seconds_interval`
+# `seconds_interval`:    How many seconds apart checkpoints are saved. Set to `0` to only use `generation_interval`
+# `resume`:              Whether runs should continue from their checkpoints instead of starting over.
+#                        Runs without a checkpoint start from the beginning
+CHECKPOINT_CONTROLS = {"active": True,
+                       "generation_interval": 1,
+                       "seconds_interval": 0.0,
+                       "resume": False}
+
+# `active`:           Whether previously simulated genomes should get their fitness from the evaluation cache
+#                     instead of being simulated again. The cache is shared by every run
+# `memory_entries`:   The most fitness values kept in memory
+# `max_disk_entries`: The most fitness values kept on disk. The least recently used values are removed first
+EVALUATION_CACHE_CONTROLS = {"active": True,
+                             "memory_entries": 4096,
+                             "max_disk_entries": 1000000}
+
+# Controls how evaluation workers shared by several runs choose the next simulation.
+#   At the end of the run, the workers' utilization and the accuracy of the predicted simulation times are printed
+# `largest_first`:   Whether the simulation predicted to take longest should run first, so that robots with more legs
+#                    do not finish alone at the end of a generation. Otherwise, the runs take turns
+# `cost_smoothing`:  How much each timed simulation changes the predicted time of its number of legs and frames,
+#                    from `0` to `1`
+# `save_cost_model`: Whether the predicted times should be saved in the `cache` folder for later runs
+# `warm_workers`:    Whether shared memory workers should keep their robot's body loaded and restart from its saved
+#                    state, and be given evaluations of the robot they have loaded. The share of evaluations given to
+#                    a worker that already had their robot loaded is printed as the warm worker hit rate
+# `rebalance_threshold`: How many more evaluations of another robot must be waiting than of a worker's own robot
+#                        before the worker loads the other robot
+SCHEDULER_CONTROLS = {"largest_first": True,
+                      "cost_smoothing": 0.2,
+                      "save_cost_model": True,
+                      "warm_workers": False,
+                      "rebalance_threshold": 10}
+
+# `optimizer`:           How children are created each generation. Either:
+#                          "hillclimber": Each child is a copy of its parent with one weight or the cpg rate changed
+#                          "cma_es":      Every weight and the cpg rate of every child is sampled from a Gaussian
+#                                         distribution that is adapted to the fittest children of each generation.
+#                                         Child `i` replaces parent `i` if it is fitter
+#                          "es":          Each pair of children adds and subtracts the same row of a noise table to a
+#                                         mean genome, which then moves along the fitness gradient estimated from them.
+#                                         With the shared memory backend, workers are only sent the row's offset.
+#                                         Child `i` replaces parent `i` if it is fitter
+# `children_per_parent`: How many mutated children each parent spawns every generation. All of them are evaluated
+#                        together, and the fittest replaces its parent if it is fitter.
+#                        Must be `1` for "cma_es" and "es"
+# `cma_initial_sigma`:   The starting standard deviation of the weights sampled by "cma_es"
+# `es_sigma`:            The standard deviation of the noise "es" adds to the mean genome
+# `es_learning_rate`:    About how far "es" moves each value of the mean genome per generation
+# `es_noise_table_size`: The number of values in the noise table shared by the workers of an "es" run
+# `genome_encoding`:     How the weight matrix is generated from the genome that is mutated or sampled. Either:
+#                          "full":         Every weight is evolved separately
+#                          "mirrored":     The right legs use the same weights as the left legs
+#                          "leg_template": The legs at the same position on both sides share their weights, and
+#                                          the weights between legs only depend on where the legs are relative to
+#                                          each other, so the genome grows linearly with the number of legs
+EVOLUTION_CONTROLS = {"optimizer": "hillclimber",
+                      "children_per_parent": 1,
+                      "cma_initial_sigma": 0.3,
+                      "es_sigma": 0.1,
+                      "es_learning_rate": 0.03,
+                      "es_noise_table_size": 10000000,
+                      "genome_encoding": "full"}
+
+# Screens each generation's children with a surrogate model, a ridge regression of fitness over the genome fitted to
+#   the most recently simulated genomes, so that only the children predicted to improve most on their parents are
+#   simulated. Children that are not simulated never replace their parents, and "cma_es" and "es" treat them as the
+#   least fit. The prediction accuracy, skipped children, and simulation seconds saved by each generation are saved to
+#   `surrogate<index>(...).bin` in the data folder, and to a csv file if `export_csv` is enabled
+# `active`:            Whether children should be screened by the surrogate
+# `simulate_fraction`: The share of each generation's children that are simulated once the surrogate is in use
+# `random_fraction`:   The share of each generation's children that are simulated whatever their prediction, so that
+#                      the surrogate keeps learning from children it would not choose. Counts toward `simulate_fraction`
+# `min_samples`:       How many simulated genomes the surrogate must have seen before it chooses children.
+#                      Until then, every child is simulated
+# `max_samples`:       The most recently simulated genomes the surrogate is fitted to
+# `regularization`:    How strongly the surrogate's coefficients are pulled toward zero
+SURROGATE_CONTROLS = {"active": False,
+                      "simulate_fraction": 0.5,
+                      "random_fraction": 0.1,
+                      "min_samples": 100,
+                      "max_samples": 5000,
+                      "regularization": 1.0}
+
+# Starts new runs from the fittest solutions of earlier runs of the same robot instead of random weights.
+#   At the end of each run, its parents are added to the elite archive of its number of legs and cpg mode in the
+#   `elites` folder, which keeps the fittest `archive_size` solutions. Only solutions of the same number of legs and
+#   cpg mode are used. Resumed runs continue from their checkpoint instead
+# `active`:            Whether the first parents of new runs should be seeded from archived elites
+# `fraction`:          The share of the first parents that are seeded. The rest have random weights
+# `noise`:             The standard deviation of the Gaussian noise added to each genome value of a seeded parent,
+#                      and to its cpg rate divided by half the highest initial cpg rate
+# `include_solutions`: Whether solutions saved in the `solutions` folder by earlier runs should also be used,
+#                      after the archived elites, since their fitness is not saved
+# `transfer`:          Whether the archived elites of the robot with the closest number of legs, preferably fewer,
+#                      should also be used, last. Their weights are mapped to this robot's legs by `weight_transfer.py`,
+#                      which matches legs by side, part, and where they are placed along the torso
+# `save_elites`:       Whether each run should add its final parents to the elite archive
+# `archive_size`:      The most solutions kept in each elite archive
+WARM_START_CONTROLS = {"active": False,
+                       "fraction": 1.0,
+                       "noise": 0.05,
+                       "include_solutions": True,
+                       "transfer": False,
+                       "save_elites": True,
+                       "archive_size": 20}
+
+# Each run stops at its number of generations or once any of these limits is reached. Set a limit to `0` to disable it.
+#   The limits are checked before each generation, so a run can go over a limit by at most one generation
+# `max_evaluations`:     The most simulations a run can use, not counting fitness values found in the evaluation cache
+# `max_frames`:          The most frames a run can simulate
+# `max_wall_seconds`:    The most seconds a run can spend evolving, including time before it was resumed
+# `max_cpu_seconds`:     The most cpu time a run's simulations can use
+# `plateau_generations`: How many generations in a row neither the best nor the median fitness of the population
+#                        can improve before the run stops
+# `plateau_tolerance`:   How much the best or median fitness must increase to count as an improvement
+STOPPING_CONTROLS = {"max_evaluations": 0,
+                     "max_frames": 0,
+                     "max_wall_seconds": 0.0,
+                     "max_cpu_seconds": 0.0,
+                     "plateau_generations": 0,
+                     "plateau_tolerance": 0.0}
 
 # OPERATION MODES #
 
@@ -35,15 +215,156 @@ STANDARD_OPERATING_MODE = {"active": True,
 
 # `active`:  Whether multiple leg configurations should be run
 # `leg_nums`: The numbers of legs to be tested; Must be an even number
+# `concurrent`: Whether every configuration should evolve at the same time, sharing one set of evaluation workers.
+#               Otherwise, each configuration is evolved to completion before the next one starts
+# `max_workers`: The most simulations that can run at once in concurrent mode. Set to `0` to use one per cpu core
 SIMULATE_MULTIPLE_ROBOTS_TYPES = {"active": False,
                                   "generations": 500,
                                   "pop_size": 10,
-                                  "leg_nums": [4, 6, 8]}
+                                  "leg_nums": [4, 6, 8],
+                                  "concurrent": True,
+                                  "max_workers": 0}
+
+# `replicates`:          How many independent runs of each configuration the sweep should evolve
+# `first_run_index`:     The run index of the first replicate. Replicates are numbered consecutively from it
+# `leg_nums`:            The numbers of legs to be tested; Must be an even number
+# `cpg_modes`:           Whether the robots should have a CPG node; Each mode is run for every number of legs
+# `num_frames`:          The numbers of frames each robot should be simulated for
+# `generations`:         How many generations each run should evolve for
+# `pop_size`:            The population size of each run
+# `core_budget`:         The most simulations that can run at once across all runs. Set to `0` to use one per cpu core
+# `max_concurrent_jobs`: The most runs that can evolve at once.
+#                        Set to `0` to run just enough to keep every simulation slot busy
+# `sweep_name`:          The name of the sweep's folder in the `sweeps` folder, which stores the sweep's jobs and
+#                        their progress and a folder of outputs for each job.
+#                        Running `sweep.py` again continues the sweep, skipping the jobs that have finished
+# `share_budget`:        Whether the simulations a job leaves unused under `max_evaluations` in `STOPPING_CONTROLS`
+#                        should be given to the jobs that have used all of theirs
+# `curriculum`:          Whether each job should wait until the jobs of the same replicate, cpg mode, and number of
+#                        frames with fewer legs have finished. With `transfer` in `WARM_START_CONTROLS`, each robot then
+#                        starts from the elites of the robot with the next fewest legs
+SWEEP_CONTROLS = {"replicates": 13,
+                  "first_run_index": 1,
+                  "leg_nums": [4, 6, 8],
+                  "cpg_modes": [False, True],
+                  "num_frames": [2000],
+                  "generations": 500,
+                  "pop_size": 10,
+                  "core_budget": 0,
+                  "max_concurrent_jobs": 0,
+                  "sweep_name": "sweep",
+                  "share_budget": False,
+                  "curriculum": False}
+
+# Controls `islands.py`, which evolves several populations of one robot at once, each in its own process.
+#   Checkpoints and `resume` work as in `CHECKPOINT_CONTROLS`
+# `num_islands`:        How many populations should evolve at once
+# `migration_interval`: How many generations apart each island sends its fittest genomes to the next island and
+#                       receives the previous island's. Set to `0` to evolve the islands independently
+# `num_migrants`:       How many genomes each island sends. Each replaces one of the least fit parents of the next
+#                       island if it is fitter
+# `run_index`:          The run index of every island
+# `generations`:        How many generations each island should evolve for
+# `pop_size`:           The population size of each island
+# `num_legs`:           The number of legs of the robot; Must be an even number
+# `cpg`:                Whether the robot should have a CPG node
+# `islands_name`:       The name of the folder in the `islands` folder that stores a folder of outputs for each island
+#                       and a summary of every island's run
+ISLAND_CONTROLS = {"num_islands": 4,
+                   "migration_interval": 10,
+                   "num_migrants": 1,
+                   "run_index": 0,
+                   "generations": 500,
+                   "pop_size": 10,
+                   "num_legs": 6,
+                   "cpg": False,
+                   "islands_name": "islands"}
+
+# Controls `tuner.py`, which compares settings of how solutions are initialized and mutated with successive halving.
+#   Every configuration is evolved for `min_generations` first. Each round, the fittest `promote_fraction` of the
+#   configurations continue from their checkpoints for `1 / promote_fraction` times as many generations, until one
+#   configuration is left or `max_generations` is reached. Requires `CHECKPOINT_CONTROLS` to be active, so that
+#   promoted runs continue instead of evolving again from the start
+# `num_configs`:         How many configurations are compared
+# `include_defaults`:    Whether the first configuration keeps every default setting, as a baseline
+# `search_space`:        The lowest and highest value of each setting that is searched, both included. Either:
+#                          "max_initial_cpg_rate": The highest the cpg rate can be initialized to
+#                          "max_cpg_change":       The most the cpg rate can change in one mutation
+#                          "num_mutations":        How many genome values or cpg rate changes each mutation makes
+#                        Settings that are left out keep their values from `constants.py`
+# `min_generations`:     How many generations every configuration evolves for in the first round
+# `max_generations`:     The most generations any configuration evolves for
+# `promote_fraction`:    The share of configurations that continue to the next round
+# `seed`:                The seed the configurations are sampled from
+# `run_index`:           The run index of every configuration's run
+# `num_legs`:            The number of legs of the robot; Must be an even number
+# `cpg`:                 Whether the robot should have a CPG node
+# `pop_size`:            The population size of each run
+# `num_frames`:          The number of frames each robot should be simulated for
+# `core_budget`:         The most simulations that can run at once across all runs. Set to `0` to use one per cpu core
+# `max_concurrent_runs`: The most runs that can evolve at once.
+#                        Set to `0` to run just enough to keep every simulation slot busy
+# `tuning_name`:         The name of the tuning's folder in the `tuning` folder, which stores the configurations,
+#                        the jobs of each round, the leaderboard, and a folder of outputs for each configuration.
+#                        Running `tuner.py` again continues the tuning, skipping the jobs that have finished
+TUNER_CONTROLS = {"num_configs": 16,
+                  "include_defaults": True,
+                  "search_space": {"max_initial_cpg_rate": [10, 200],
+                                   "max_cpg_change": [1, 40],
+                                   "num_mutations": [1, 4]},
+                  "min_generations": 25,
+                  "max_generations": 500,
+                  "promote_fraction": 0.5,
+                  "seed": 0,
+                  "run_index": 0,
+                  "num_legs": 4,
+                  "cpg": True,
+                  "pop_size": 10,
+                  "num_frames": 2000,
+                  "core_budget": 0,
+                  "max_concurrent_runs": 0,
+                  "tuning_name": "tuning"}
+
+# Controls `landscape.py`, which simulates sampled genomes of one robot and saves each genome and its fitness to a
+#   dataset of the robot's fitness landscape. The samples are saved in chunks, each sampled from its own seed, and the
+#   throughput is printed after every chunk. The backend in `SIMULATION_CONTROLS` is used, and "shared_memory" is the
+#   fastest. Running `landscape.py` again continues the dataset from its last saved chunk
+# `num_samples`:        How many genomes the dataset should have
+# `chunk_size`:         How many samples each chunk file holds. At most one chunk of samples is kept in memory, and
+#                       at most one chunk is simulated again after an interruption
+# `batch_size`:         How many genomes are simulated together
+# `sampling`:           How genomes are sampled. Either:
+#                         "random":    Like the first generation of a run
+#                         "perturbed": An archived elite of the robot, or a random genome if it has none,
+#                                      plus normally distributed noise
+# `perturbation_sigma`: The standard deviation of the noise added to each value of a perturbed genome
+# `seed`:               The seed the samples are created from
+# `run_index`:          The run index of the dataset's workspace
+# `num_legs`:           The number of legs of the robot; Must be an even number
+# `cpg`:                Whether the robot should have a CPG node
+# `num_frames`:         The number of frames each robot should be simulated for
+# `core_budget`:        The most simulations that can run at once. Set to `0` to use one per cpu core
+# `dataset_name`:       The name of the dataset's folder in the `landscapes` folder
+LANDSCAPE_CONTROLS = {"num_samples": 1000000,
+                      "chunk_size": 10000,
+                      "batch_size": 100,
+                      "sampling": "random",
+                      "perturbation_sigma": 0.1,
+                      "seed": 0,
+                      "run_index": 0,
+                      "num_legs": 4,
+                      "cpg": True,
+                      "num_frames": 2000,
+                      "core_budget": 0,
+                      "dataset_name": "landscape"}
 
 # `active`:    Set to `True` to show a specific solution; Set to `False` to evolve new ones
 # `sol_index`: The index of the solution (the number after 'weights' in the filename)
 # `num_legs`:  The number of legs of the solution you wish to view
+# `generation`: The generation to show, reconstructed from the lineage archive of run `run_index`.
+#               Set to `-1` to show the final solution of run `run_index` from the `solutions` folder
 SHOW_SPECIFIC_SOLUTION = {"active": False,
                           "sol_index": 9,
                           "num_legs": 4,
-                          "cpg": True}
+                          "cpg": True,
+                          "generation": -1}
@@ -6,15 +6,18 @@ import sys
 from simulation import Simulation
 
 
-def begin_simulation(show_gui: bool, solution_id: int):
+def begin_simulation(show_gui: bool, workspace_name: str, solution_id: int, num_legs: int, num_frames: int):
     """
-    Begins one simulation
+    Begins one simulation, which runs every trial of the solution
     :param show_gui: Should the graphical representation of the simulation be shown
+    :param workspace_name: The name of the workspace of the run the solution belongs to
     :param solution_id: The id of the solution being simulated
+    :param num_legs: The number of legs of the robot
+    :param num_frames: How many frames the simulation should run for
     """
-    simulation = Simulation(show_gui, solution_id)
+    simulation = Simulation(show_gui, workspace_name, solution_id, num_legs, num_frames)
 
-    simulation.run()
+    simulation.evaluate()
 
     simulation.get_fitness()
 
@@ -26,6 +29,9 @@ if __name__ == "__main__":
     else:
         gui = False
 
-    sol_id = int(sys.argv[2])
+    workspace = sys.argv[2]
+    sol_id = int(sys.argv[3])
+    legs = int(sys.argv[4])
+    frames = int(sys.argv[5])
 
-    begin_simulation(show_gui=gui, solution_id=sol_id)
+    begin_simulation(show_gui=gui, workspace_name=workspace, solution_id=sol_id, num_legs=legs, num_frames=frames)
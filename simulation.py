@@ -6,6 +6,7 @@ import pybullet
 import pybullet as p
 import pybullet_data
 from robot import Robot
+from trials import aggregate_trial_fitness, create_trial_conditions
 from world import World
 import constants as c
 import sim_controls as sc
@@ -15,9 +16,14 @@ class Simulation:
     """
     Controls a single simulation
     """
-    def __init__(self, show_gui, solution_id):
+    def __init__(self, show_gui, workspace_name, solution_id, num_legs, num_frames, brain_lines=None):
+        """
+        :param brain_lines: The lines of the robot's nndf file. If `None`, the brain is loaded from its file
+        """
         # Setup Sim #
         self.show_gui = show_gui
+        self.num_frames = num_frames
+        self.start_cpu_time = time.process_time()
 
         if self.show_gui:
             self.physics_client = p.connect(p.GUI)
@@ -28,8 +34,40 @@ class Simulation:
 
         p.setGravity(c.gravity["x"], c.gravity["y"], c.gravity["z"])
 
-        self.world = World()
-        self.robot = Robot(solution_id)
+        if sc.SIMULATION_CONTROLS["deterministic_contacts"]:
+            p.setPhysicsEngineParameter(deterministicOverlappingPairs=1)
+
+        self.world = World(workspace_name)
+        self.robot = Robot(workspace_name, solution_id, num_legs, num_frames, brain_lines)
+
+        self.initial_state = None
+        self.start_position, self.start_orientation = p.getBasePositionAndOrientation(self.robot.robotId)
+        self.ground_friction = p.getDynamicsInfo(self.world.planeId, -1)[1]
+
+        # The fitness of the robot, set once it has been evaluated
+        self.fitness = None
+
+    def save_initial_state(self):
+        """
+        Saves the state of the world and robot before the first frame so that the simulation can be restarted
+            without loading them again
+        """
+        self.initial_state = p.saveState()
+
+    def restart(self, solution_id, num_frames, brain_lines):
+        """
+        Returns the world and robot to their saved initial state and gives the robot a new brain.
+            The result of the restarted simulation only matches a newly loaded one if `deterministic_contacts` is set
+        :param solution_id: The id of the solution being simulated
+        :param num_frames: How many frames the simulation should run for
+        :param brain_lines: The lines of the robot's nndf file
+        """
+        p.restoreState(self.initial_state)
+
+        self.num_frames = num_frames
+        self.start_cpu_time = time.process_time()
+
+        self.robot.restart(solution_id, num_frames, brain_lines)
 
     def run(self):
         """
@@ -37,7 +75,7 @@ class Simulation:
         """
         try:
             random.seed()
-            for time_step in range(0, sc.SIMULATION_CONTROLS["num_frames"]):
+            for time_step in range(0, self.num_frames):
                 if self.show_gui:
                     time.sleep(1/240)
 
@@ -55,11 +93,58 @@ class Simulation:
             print("\n*** You closed the simulation window. Simulation aborted. ***")
             sys.exit(0)
 
+    def evaluate(self) -> float:
+        """
+        Simulates the robot once for each trial in `ROBUSTNESS_CONTROLS`, restoring the initial state between trials
+            instead of loading the world and robot again
+        :return: The fitness of the robot. With one trial, it is the robot's final x-position.
+            Otherwise, it combines the distance the robot moved along the x-axis in each trial
+        """
+        controls = sc.ROBUSTNESS_CONTROLS
+        trial_conditions = create_trial_conditions(controls)
+
+        if len(trial_conditions) == 1:
+            self.run()
+            self.fitness = self.robot.get_x_position()
+            return self.fitness
+
+        if self.initial_state is None:
+            self.save_initial_state()
+
+        trial_fitness = []
+        for trial_index, (x_offset, y_offset, yaw, friction_scale) in enumerate(trial_conditions):
+            if trial_index > 0:
+                p.restoreState(self.initial_state)
+                self.robot.restart(self.robot.solution_id, self.num_frames, self.robot.brain_lines)
+
+            start_x = self.start_position[0] + x_offset
+            rotation = p.getQuaternionFromEuler([0, 0, yaw])
+            p.resetBasePositionAndOrientation(self.robot.robotId,
+                                              [start_x, self.start_position[1] + y_offset, self.start_position[2]],
+                                              p.multiplyTransforms([0, 0, 0], rotation,
+                                                                   [0, 0, 0], self.start_orientation)[1])
+            p.changeDynamics(self.world.planeId, -1, lateralFriction=(self.ground_friction * friction_scale))
+
+            self.run()
+            trial_fitness.append(self.robot.get_x_position() - start_x)
+
+        # Friction is not part of the saved state, so it is returned for the next solution of a warm worker
+        p.changeDynamics(self.world.planeId, -1, lateralFriction=self.ground_friction)
+
+        self.fitness = aggregate_trial_fitness(trial_fitness, controls["aggregate"])
+        return self.fitness
+
+    def get_cpu_seconds(self) -> float:
+        """
+        :return: The cpu time used by the simulation so far
+        """
+        return time.process_time() - self.start_cpu_time
+
     def get_fitness(self):
         """
-        Gets the fitness of the simulation's robot
+        Writes the fitness of the simulation's robot to its fitness file
         """
-        self.robot.get_fitness()
+        self.robot.get_fitness(cpu_seconds=self.get_cpu_seconds(), fitness=self.fitness)
 
     def __del__(self):
         """
@@ -1,38 +1,185 @@
 import numpy
 import os
 import random
+import threading
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
+from genome_encoding import ENCODING_FULL, decode_weights, encode_weights, get_genome_length, get_weight_map
 import pyrosim.pyrosim as pyrosim
 import safe_file_access as sfa
-import simulate
+from workspace import Workspace, create_body_filename, create_brain_filename, create_fitness_filename
 import constants as c
+import sim_controls as sc
 import system_info as si
 
 
+# Pyrosim writes files through module-level state, so only one body, world, or brain can be written at a time
+PYROSIM_LOCK = threading.Lock()
+
+
+def create_link_and_joint_names(num_legs: int) -> Tuple[List[str], List[str]]:
+    """
+    Gets the names of a robot's links and joints without writing its body file
+    :param num_legs: The number of legs of the robot
+    :return: The names of the leg links and of the joints, in the order `Solution.create_body` stores them
+    """
+    link_names = []
+    joint_names = []
+
+    for side in ["left", "right"]:
+        for i in range(1, (int(num_legs / 2) + 1)):
+            upper_leg_name = str(i) + side.capitalize() + "Leg"
+            lower_leg_name = str(i) + side.capitalize() + "LowerLeg"
+
+            link_names += [upper_leg_name, lower_leg_name]
+            joint_names += ["torso_" + upper_leg_name, upper_leg_name + "_" + lower_leg_name]
+
+    return link_names, joint_names
+
+
+def send_brain(link_names: List[str], joint_names: List[str], weights: numpy.ndarray, cpg_rate: Optional[int]):
+    """
+    Sends the neurons and synapses of a brain to the neural network pyrosim is writing.
+        Must be called while holding `PYROSIM_LOCK`
+    :param link_names: The names of the robot's links, each of which gets a sensor neuron
+    :param joint_names: The names of the robot's joints, each of which gets a motor neuron
+    :param weights: The synapse weights
+    :param cpg_rate: The rate of the cpg neuron, or `None` if the robot has no cpg
+    """
+    num_sensor_or_hidden_neurons = len(weights)
+    num_motor_neurons = len(weights[0])
+
+    # Neurons #
+    # Sensor Neurons
+    current_neuron_name: int = 0
+    for link_name in link_names:
+        pyrosim.Send_Sensor_Neuron(name=current_neuron_name, linkName=link_name)
+        current_neuron_name += 1
+
+    # Central Pattern Generator (CPG) Neuron
+    if cpg_rate is not None:
+        pyrosim.Send_CPG_Neuron(current_neuron_name, cpg_rate)
+        current_neuron_name += 1
+
+    # Motor Neurons
+    for joint_name in joint_names:
+        pyrosim.Send_Motor_Neuron(current_neuron_name, joint_name)
+        current_neuron_name += 1
+
+    # Synapses #
+    for row in range(num_sensor_or_hidden_neurons):
+        for col in range(num_motor_neurons):
+            pyrosim.Send_Synapse(sourceNeuronName=row,
+                                 targetNeuronName=(col + num_sensor_or_hidden_neurons),
+                                 weight=weights[row][col])
+
+
+def repair_genome_vector(genome: numpy.ndarray, num_weights: int, cpg_active: bool):
+    """
+    Changes a genome vector in place to the closest genome a solution can have, by clipping its weights to their
+        range and rounding its cpg rate
+    :param genome: The weights of a solution, followed by its scaled cpg rate if the cpg is active
+    :param num_weights: The number of weights in the genome
+    :param cpg_active: Whether the genome has a cpg rate
+    """
+    numpy.clip(genome[:num_weights], c.MIN_WEIGHT, c.MAX_WEIGHT, out=genome[:num_weights])
+
+    if cpg_active:
+        genome[num_weights] = get_genome_cpg_rate(genome, num_weights) / c.GENOME_CPG_RATE_SCALE
+
+
+def get_genome_cpg_rate(genome: numpy.ndarray, num_weights: int) -> int:
+    """
+    :param genome: The weights of a solution, followed by its scaled cpg rate
+    :param num_weights: The number of weights in the genome
+    :return: The cpg rate stored in the genome
+    """
+    return max(c.MIN_CPG_RATE, int(round(genome[num_weights] * c.GENOME_CPG_RATE_SCALE)))
+
+
+def get_default_hyperparameters() -> Dict[str, int]:
+    """
+    Gets the settings of how solutions are initialized and mutated, which can differ between runs of the same robot
+    :return: The value of each setting:
+        `max_initial_cpg_rate`: The highest the cpg rate can be initialized to
+        `max_cpg_change`:       The most the cpg rate can change in one mutation
+        `num_mutations`:        How many genome values or cpg rate changes each mutation makes
+    """
+    return {"max_initial_cpg_rate": c.MAX_INITIAL_CPG_RATE,
+            "max_cpg_change": c.MAX_CPG_CHANGE,
+            "num_mutations": 1}
+
+
+def create_brain_lines(link_names: List[str], joint_names: List[str], weights: numpy.ndarray,
+                       cpg_rate: Optional[int]) -> List[str]:
+    """
+    Creates the lines of a brain's nndf file in memory instead of writing the file
+    :return: The lines of the nndf file
+    """
+    with PYROSIM_LOCK:
+        pyrosim.Start_NeuralNetwork_In_Memory()
+
+        send_brain(link_names, joint_names, weights, cpg_rate)
+
+        return pyrosim.End_NeuralNetwork_In_Memory()
+
+
 class Solution:
     """
     Data and controls for creating and simulation a single solution
     """
 
-    def __init__(self, solution_id: int, num_legs: int, cpg_active: bool):
+    def __init__(self, solution_id: int, num_legs: int, cpg_active: bool, workspace: Workspace,
+                 num_frames: int = None, hyperparameters: Dict[str, int] = None,
+                 python_random: random.Random = None, numpy_random: numpy.random.Generator = None):
+        """
+        :param hyperparameters: How the solution is initialized and mutated. Settings that are left out have the
+            values from `get_default_hyperparameters`
+        :param python_random: The random number generator of the solution's run, used to create its cpg rate.
+            Defaults to the global generator
+        :param numpy_random: The numpy random number generator of the solution's run, used to create its genome.
+            Defaults to the global generator
+        """
         self.solution_id = solution_id
         self.num_legs = num_legs
         self.cpg_active = cpg_active
+        # The folders of the run the solution belongs to
+        self.workspace = workspace
+
+        # How many frames the solution is simulated for
+        if num_frames is None:
+            self.num_frames = sc.SIMULATION_CONTROLS["num_frames"]
+        else:
+            self.num_frames = num_frames
+
+        self.hyperparameters = get_default_hyperparameters()
+        if hyperparameters is not None:
+            self.hyperparameters.update(hyperparameters)
+
+        self.body_filename = create_body_filename(self.workspace.name, self.num_legs)
 
         self.fitness: float = -1
+        # The cpu time used by the most recent simulation of the solution
+        self.cpu_seconds: float = 0.0
         self.link_names: List[str] = []
         self.joint_names: List[str] = []
 
+        # The weights are generated from the genome by the encoding in `EVOLUTION_CONTROLS`
+        self.encoding = sc.EVOLUTION_CONTROLS["genome_encoding"]
+        self.weight_map = get_weight_map(self.encoding, self.num_legs)
+        self.genome: numpy.ndarray
+
         self.weights: numpy.matrix
         self.cpg_rate: int
+        # The row, column, and new value of each weight changed by the most recent mutation
+        self.mutations: List[Tuple[int, int, float]] = []
         self.num_sensor_or_hidden_neurons: int
         self.num_motor_neurons: int
 
         self.create_world()
         self.create_body()
-        self.initialize_weights_and_rate(new_brain=True)
+        self.initialize_weights_and_rate(new_brain=True, python_random=python_random, numpy_random=numpy_random)
 
     def start_simulation(self, show_gui=False, parallel=True):
         """
@@ -53,7 +200,10 @@ class Solution:
             else:
                 system_call += " DIRECT"
 
+            system_call += " \"" + self.workspace.name + "\""
             system_call += " " + str(self.solution_id)
+            system_call += " " + str(self.num_legs)
+            system_call += " " + str(self.num_frames)
 
             if si.WINDOWS:
                 system_call = "start /B " + system_call
@@ -68,38 +218,35 @@ class Solution:
         if parallel:
             os.system(create_simulate_begin_system_call())
         else:
-            simulate.begin_simulation(show_gui=show_gui, solution_id=self.solution_id)
+            # Imported here so that only simulating in this process loads the physics engine
+            import simulate
+
+            simulate.begin_simulation(show_gui=show_gui, workspace_name=self.workspace.name,
+                                      solution_id=self.solution_id, num_legs=self.num_legs,
+                                      num_frames=self.num_frames)
 
     def wait_for_sim_to_end(self):
         """
         Waits for the simulation to end and gets its fitness
         """
-        fitness_filename = c.FITNESS_FOLDER_NAME + "fitness" + str(self.solution_id) + ".txt"
+        fitness_filename = create_fitness_filename(self.workspace.name, self.solution_id)
 
         # Wait until simulations are done before reading fitness values
         while not os.path.exists(fitness_filename):
             time.sleep(0.01)
 
-        self.fitness = float(sfa.safe_file_read(fitness_filename)[0])
+        fitness_lines = sfa.safe_file_read(fitness_filename)
+        self.fitness = float(fitness_lines[0])
+        self.cpu_seconds = float(fitness_lines[1])
 
         # Delete the fitness file after it has been read
-        if si.WINDOWS:
-            system_call = "del "
-        else:
-            system_call = "rm "
-
-        system_call += "\"" + si.PROJECT_FILEPATH + fitness_filename + "\""
-
-        os.system(system_call)
+        os.remove(fitness_filename)
 
     def show_solution(self, solution_index: int):
         """
         Show a specific solution without evolving the solution at all
         :param solution_index: The index of the solution to be shown
         """
-        self.create_world()
-        self.create_body()
-
         if self.cpg_active:
             weights_filename, cpg_rate_filename = self.create_weights_and_rate_filenames(solution_index)
 
@@ -110,17 +257,33 @@ class Solution:
 
             self.initialize_weights_and_rate(new_brain=False, weights_filename=weights_filename)
 
+        self.replay()
+
+    def replay(self):
+        """
+        Show the solution's current weights and cpg rate in the graphical simulation
+        """
+        self.workspace.create_intermediate_folders()
+
+        self.create_world()
+        self.create_body()
         self.create_brain()
 
-        simulate.begin_simulation(show_gui=True, solution_id=self.solution_id)
+        import simulate
+
+        simulate.begin_simulation(show_gui=True, workspace_name=self.workspace.name, solution_id=self.solution_id,
+                                  num_legs=self.num_legs, num_frames=self.num_frames)
+
+        self.workspace.remove_intermediate_folders()
 
     def create_world(self):
         """
         Initializes world
         """
-        sfa.safe_start_sdf(c.WORLD_FILENAME)
+        with PYROSIM_LOCK:
+            sfa.safe_start_sdf(self.workspace.world_filename)
 
-        pyrosim.End()
+            pyrosim.End()
 
     def create_body(self):
         """
@@ -303,108 +466,158 @@ class Solution:
         rotation_axes = {"upper": c.joint_axes["x"],
                          "lower": c.joint_axes["y"]}
 
-        sfa.safe_start_urdf(c.ROBOT_FILENAME)
+        with PYROSIM_LOCK:
+            sfa.safe_start_urdf(self.body_filename)
+
+            create_torso()
+            create_legs()
 
-        create_torso()
-        create_legs()
+            pyrosim.End()
 
         self.num_sensor_or_hidden_neurons = len(self.link_names) + 1
         self.num_motor_neurons = len(self.joint_names)
 
-        pyrosim.End()
-
     def create_brain(self):
         """
         Initializes the robot's neurons and synapses
         """
-        brain_filename = c.OBJECTS_FOLDER_NAME + "brain" + str(self.solution_id) + ".nndf"
-        sfa.safe_start_neural_network(brain_filename)
+        brain_filename = create_brain_filename(self.workspace.name, self.solution_id)
 
-        # Neurons #
-        # Sensor Neurons
-        current_neuron_name: int = 0
-        for link_name in self.link_names:
-            pyrosim.Send_Sensor_Neuron(name=current_neuron_name, linkName=link_name)
-            current_neuron_name += 1
+        with PYROSIM_LOCK:
+            sfa.safe_start_neural_network(brain_filename)
 
-        # Central Pattern Generator (CPG) Neuron
-        if self.cpg_active:
-            pyrosim.Send_CPG_Neuron(current_neuron_name, self.cpg_rate)
-            current_neuron_name += 1
-
-        # Motor Neurons
-        for joint_name in self.joint_names:
-            pyrosim.Send_Motor_Neuron(current_neuron_name, joint_name)
-            current_neuron_name += 1
+            send_brain(self.link_names, self.joint_names, self.weights, self.get_brain_cpg_rate())
 
-        # Synapses #
-        for row in range(self.num_sensor_or_hidden_neurons):
-            for col in range(self.num_motor_neurons):
-                pyrosim.Send_Synapse(sourceNeuronName=row,
-                                     targetNeuronName=(col + self.num_sensor_or_hidden_neurons),
-                                     weight=self.weights[row][col])
+            pyrosim.End()
 
-        pyrosim.End()
+    def get_brain_cpg_rate(self) -> Optional[int]:
+        """
+        :return: The cpg rate, or `None` if the robot has no cpg
+        """
+        if self.cpg_active:
+            return self.cpg_rate
+        else:
+            return None
 
-    def initialize_weights_and_rate(self, new_brain: bool, weights_filename: str = None, cpg_rate_filename: str = None):
+    def initialize_weights_and_rate(self, new_brain: bool, weights_filename: str = None, cpg_rate_filename: str = None,
+                                    python_random: random.Random = None, numpy_random: numpy.random.Generator = None):
         """
         Initializes the synapse weights and cpg rate
         :param new_brain: Should the weights a cpg rate be randomly generated
         :param weights_filename: The .npy file storing the weights matrix
         :param cpg_rate_filename: The .txt file storing the cpg rate, if this is a robot with a cpg
+        :param python_random: The random number generator a new cpg rate is created with. Defaults to the global one
+        :param numpy_random: The numpy random number generator a new genome is created with. Defaults to the global one
         """
+        if python_random is None:
+            python_random = random
+        if numpy_random is None:
+            numpy_random = numpy.random
+
         if new_brain:
-            # Generate a random matrix to store neuron weights normalized to [-1, 1]
-            self.weights = (numpy.random.rand(self.num_sensor_or_hidden_neurons, self.num_motor_neurons) * 2) - 1
+            # Generate a random genome, and the matrix of neuron weights created from it, normalized to [-1, 1]
+            self.genome = (numpy_random.random(get_genome_length(self.weight_map)) * 2) - 1
+            self.weights = decode_weights(self.genome, self.weight_map)
 
             if self.cpg_active:
-                self.cpg_rate = random.randint(1, c.MAX_INITIAL_CPG_RATE)
+                self.cpg_rate = python_random.randint(1, self.hyperparameters["max_initial_cpg_rate"])
         else:
-            self.weights = sfa.safe_numpy_file_load(weights_filename)
+            self.set_weights(sfa.safe_numpy_file_load(weights_filename))
 
             if self.cpg_active:
                 self.cpg_rate = sfa.safe_file_read(cpg_rate_filename)[0]
 
-    def mutate(self):
+    def set_weights(self, weights: numpy.ndarray):
+        """
+        Sets the weights of the solution and the genome they were created from
+        :param weights: A weight matrix created by the solution's encoding
         """
-        Randomly changes either one neuron weight or, if cpg_active is true, the cpg_rate
+        self.genome = encode_weights(weights, self.weight_map)
+        self.weights = decode_weights(self.genome, self.weight_map)
+
+    def get_genome_vector(self) -> numpy.ndarray:
         """
+        :return: The genome of the solution, followed by its scaled cpg rate if the cpg is active
+        """
+        genome = self.genome.copy()
+
+        if self.cpg_active:
+            genome = numpy.append(genome, self.cpg_rate / c.GENOME_CPG_RATE_SCALE)
+
+        return genome
+
+    def set_genome_vector(self, genome: numpy.ndarray):
+        """
+        Sets the genome, weights, and cpg rate of the solution from a genome vector, which is first repaired in place
+            with `repair_genome_vector`. Every weight is recorded as mutated
+        :param genome: The genome, followed by the scaled cpg rate if the cpg is active
+        """
+        num_weights = len(self.genome)
+        repair_genome_vector(genome, num_weights, self.cpg_active)
+
+        self.genome = genome[:num_weights].copy()
+        self.weights = decode_weights(self.genome, self.weight_map)
+        if self.cpg_active:
+            self.cpg_rate = get_genome_cpg_rate(genome, num_weights)
+
+        self.mutations = [(row, col, self.weights[row][col])
+                          for row in range(len(self.weights)) for col in range(len(self.weights[0]))]
+
+    def mutate(self, python_random: random.Random = None):
+        """
+        Randomly changes either one neuron weight or, if cpg_active is true, the cpg_rate.
+            Repeated `num_mutations` times
+        :param python_random: The random number generator of the solution's run. Defaults to the global generator
+        """
+        if python_random is None:
+            python_random = random
+
         def mutate_weights():
             """
-            Randomly changes one synapse weight
+            Randomly changes one genome value, and every synapse weight created from it
             """
-            row_to_change = random.randint(0, (len(self.weights) - 1))
-            col_to_change = random.randint(0, (len(self.weights[0]) - 1))
+            genome_index_to_change = python_random.randint(0, (len(self.genome) - 1))
+
+            self.genome[genome_index_to_change] = (python_random.random() * 2 - 1)
+
+            for row_to_change, col_to_change in numpy.argwhere(self.weight_map == genome_index_to_change):
+                self.weights[row_to_change][col_to_change] = self.genome[genome_index_to_change]
 
-            self.weights[row_to_change][col_to_change] = (random.random() * 2 - 1)
+                self.mutations.append((int(row_to_change), int(col_to_change),
+                                       self.weights[row_to_change][col_to_change]))
 
         def mutate_cpg_rate():
             """
-            Randomly changes the cpg rate by at most plus or minus `c.MAX_CPG_CHANGE`
+            Randomly changes the cpg rate by at most plus or minus `max_cpg_change`
             """
-            rate_change = max(c.MIN_CPG_RATE, random.randint(-c.MAX_CPG_CHANGE, c.MAX_CPG_CHANGE))
+            max_cpg_change = self.hyperparameters["max_cpg_change"]
+            rate_change = max(c.MIN_CPG_RATE, python_random.randint(-max_cpg_change, max_cpg_change))
             self.cpg_rate += rate_change
 
-        if self.cpg_active:
-            if random.randint(1, 2) % 2 == 0:
-                mutate_weights()
+        self.mutations = []
+
+        for _ in range(self.hyperparameters["num_mutations"]):
+            if self.cpg_active:
+                if python_random.randint(1, 2) % 2 == 0:
+                    mutate_weights()
+                else:
+                    mutate_cpg_rate()
             else:
-                mutate_cpg_rate()
-        else:
-            mutate_weights()
+                mutate_weights()
 
     def save_weights(self, index: int):
         """
-        Saves the matrix storing the synapse weights to a .npy file and, if there's a cpg, saves the rate to a .txt file
+        Saves the matrix storing the synapse weights to a .npy file and, if there's a cpg, the rate to a .txt file.
+            If the weights are encoded by a smaller genome, the genome is saved to a .npy file as well
         """
         weights_filename, cpg_rate_filename = self.create_weights_and_rate_filenames(index)
 
         sfa.safe_numpy_file_save(weights_filename, self.weights)
 
-        if self.cpg_active:
-            cpg_rate_filename = c.SOLUTIONS_FOLDER_NAME + "cpg_rate" + str(index) \
-                                + "(" + str(self.num_legs) + "_legs)" + ".txt"
+        if self.encoding != ENCODING_FULL:
+            sfa.safe_numpy_file_save(self.create_genome_filename(index), self.genome)
 
+        if self.cpg_active:
             sfa.safe_file_write(cpg_rate_filename, str(self.cpg_rate), overwrite=True)
 
     def create_weights_and_rate_filenames(self, index: int):
@@ -413,8 +626,8 @@ class Solution:
         :return: A tuple containing the weights filename and either the cpg rate filename or None, if there is no cpg
         """
         if self.cpg_active:
-            cpg_rate_filename = c.SOLUTIONS_FOLDER_NAME + "cpg_rate" + str(index) \
-                                + "(" + str(self.num_legs) + "_legs)" + ".txt"
+            cpg_rate_filename = os.path.join(self.workspace.solutions_folder, "cpg_rate" + str(index)
+                                             + "(" + str(self.num_legs) + "_legs)" + ".txt")
 
             cpg_type_name = "active"
 
@@ -423,11 +636,20 @@ class Solution:
 
             cpg_type_name = "inactive"
 
-        weights_filename = c.SOLUTIONS_FOLDER_NAME + "weights" + str(index) \
-            + "(" + str(self.num_legs) + "_legs, " + cpg_type_name + "_cpg)" + ".npy"
+        weights_filename = os.path.join(self.workspace.solutions_folder, "weights" + str(index)
+                                        + "(" + str(self.num_legs) + "_legs, " + cpg_type_name + "_cpg)" + ".npy")
 
         return weights_filename, cpg_rate_filename
 
+    def create_genome_filename(self, index: int) -> str:
+        """
+        Creates the filename for storing the genome of an encoded solution, in the format
+            `genome<index>(<number of legs>_legs, <encoding>).npy`
+        :return: The genome filename
+        """
+        return os.path.join(self.workspace.solutions_folder, "genome" + str(index)
+                            + "(" + str(self.num_legs) + "_legs, " + self.encoding + ")" + ".npy")
+
     def set_id(self, solution_id: int):
         """
         Set the solution's id
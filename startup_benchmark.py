@@ -0,0 +1,64 @@
+"""
+Measures how long each entry point takes to import in a fresh python process, and whether it loads the physics engine.
+Run with `python startup_benchmark.py [repeats]`
+"""
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+
+# The modules that start evolution or analysis, followed by the module that every simulation process imports
+BENCHMARK_MODULES = ["search", "sweep", "hillclimber", "fitness_history", "lineage_archive", "solution", "simulate"]
+
+# Imports a module and prints the import time in seconds and whether pybullet was loaded
+IMPORT_TIMING_CODE = "import sys, time\n" \
+                     "start_time = time.perf_counter()\n" \
+                     "import {module}\n" \
+                     "print(time.perf_counter() - start_time, 'pybullet' in sys.modules)"
+
+
+def time_module_import(module: str) -> Dict:
+    """
+    Imports a module in a new python process
+    :param module: The name of the module
+    :return: A dictionary containing the import time in seconds and whether pybullet was loaded
+    """
+    output = subprocess.run([sys.executable, "-c", IMPORT_TIMING_CODE.format(module=module)],
+                            capture_output=True, text=True, check=True).stdout.split()
+
+    return {"seconds": float(output[-2]), "loads_pybullet": (output[-1] == "True")}
+
+
+def run_startup_benchmark(modules: List[str], repeats: int) -> Dict[str, Dict]:
+    """
+    Times the import of each module several times
+    :param modules: The names of the modules
+    :param repeats: How many times each module is imported
+    :return: A dictionary matching each module to its median import time in seconds and whether it loads pybullet
+    """
+    results = {}
+    for module in modules:
+        timings = [time_module_import(module) for _ in range(repeats)]
+
+        results[module] = {"seconds": statistics.median([timing["seconds"] for timing in timings]),
+                           "loads_pybullet": timings[0]["loads_pybullet"]}
+
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        num_repeats = int(sys.argv[1])
+    else:
+        num_repeats = 5
+
+    print("*** Median import time over " + str(num_repeats) + " fresh processes ***")
+
+    for module_name, result in run_startup_benchmark(BENCHMARK_MODULES, num_repeats).items():
+        if result["loads_pybullet"]:
+            physics = "loads pybullet"
+        else:
+            physics = "no pybullet"
+
+        print(module_name.ljust(20) + str(round(result["seconds"] * 1000, 1)).rjust(8) + " ms  (" + physics + ")")
@@ -0,0 +1,165 @@
+"""
+Decides when a run should stop before reaching its number of generations, based on its compute budget and progress
+"""
+import threading
+from typing import Dict, List, Optional
+
+import numpy
+
+
+STOP_GENERATIONS = "generations"
+STOP_MAX_EVALUATIONS = "max_evaluations"
+STOP_MAX_FRAMES = "max_frames"
+STOP_MAX_WALL_SECONDS = "max_wall_seconds"
+STOP_MAX_CPU_SECONDS = "max_cpu_seconds"
+STOP_PLATEAU = "plateau"
+
+
+class SharedBudget:
+    """
+    Simulations given up by runs that stopped early, which other runs in the same sweep can use once they have used
+        all of their own
+    """
+    def __init__(self, available_evaluations: int = 0):
+        """
+        :param available_evaluations: The number of simulations that can be given out
+        """
+        self.available_evaluations = available_evaluations
+        self.lock = threading.Lock()
+
+    def add(self, evaluations: int):
+        """
+        Gives simulations to the shared budget
+        :param evaluations: The number of simulations
+        """
+        with self.lock:
+            self.available_evaluations += evaluations
+
+    def take(self, evaluations: int) -> int:
+        """
+        Takes simulations from the shared budget
+        :param evaluations: The number of simulations wanted
+        :return: The number of simulations given, which is less than wanted if the budget is running out
+        """
+        with self.lock:
+            taken = min(evaluations, self.available_evaluations)
+            self.available_evaluations -= taken
+
+            return taken
+
+
+class StoppingCriteria:
+    """
+    Checks a run's progress against the limits in `STOPPING_CONTROLS`. A limit of `0` is never reached
+    """
+    def __init__(self, controls: Dict):
+        """
+        :param controls: The stopping controls
+        """
+        self.max_evaluations = controls["max_evaluations"]
+        self.max_frames = controls["max_frames"]
+        self.max_wall_seconds = controls["max_wall_seconds"]
+        self.max_cpu_seconds = controls["max_cpu_seconds"]
+        self.plateau_generations = controls["plateau_generations"]
+        self.plateau_tolerance = controls["plateau_tolerance"]
+
+        # The number of simulations the run may use, including any taken from a shared budget
+        self.evaluation_limit = self.max_evaluations
+
+        # The best and median fitness to beat, and how many generations have passed without beating either
+        self.best_fitness: Optional[float] = None
+        self.median_fitness: Optional[float] = None
+        self.generations_without_improvement = 0
+
+    def update_plateau(self, fitness_values: List[float]):
+        """
+        Records the fitness of the current population. Call once per generation, after selection
+        :param fitness_values: The fitness of each parent
+        """
+        best_fitness = float(numpy.max(fitness_values))
+        median_fitness = float(numpy.median(fitness_values))
+
+        if self.best_fitness is None:
+            self.best_fitness = best_fitness
+            self.median_fitness = median_fitness
+            return
+
+        improved = False
+        if best_fitness > self.best_fitness + self.plateau_tolerance:
+            self.best_fitness = best_fitness
+            improved = True
+        if median_fitness > self.median_fitness + self.plateau_tolerance:
+            self.median_fitness = median_fitness
+            improved = True
+
+        if improved:
+            self.generations_without_improvement = 0
+        else:
+            self.generations_without_improvement += 1
+
+    def reset_plateau(self):
+        """
+        Forgets the fitness to beat, such as when every fitness value has changed because the robots are simulated
+            for a different number of frames. The next call to `update_plateau` sets it again
+        """
+        self.best_fitness = None
+        self.median_fitness = None
+        self.generations_without_improvement = 0
+
+    def get_stop_reason(self, num_evaluations: int, num_frames: int, wall_seconds: float, cpu_seconds: float,
+                        population_size: int, shared_budget: SharedBudget = None) -> Optional[str]:
+        """
+        Checks whether the run should stop. If the run has used all of its simulations, it first tries to take
+            another generation's worth from the shared budget
+        :param num_evaluations: The number of simulations run so far
+        :param num_frames: The number of frames simulated so far
+        :param wall_seconds: The number of seconds the run has spent evolving
+        :param cpu_seconds: The cpu time used by the run's simulations
+        :param population_size: The number of simulations in a generation
+        :param shared_budget: The budget shared with the other runs of a sweep, if any
+        :return: The reason the run should stop, or `None` if it should continue
+        """
+        if 0 < self.max_evaluations and self.evaluation_limit <= num_evaluations and shared_budget is not None:
+            self.evaluation_limit += shared_budget.take(num_evaluations + population_size - self.evaluation_limit)
+
+        if 0 < self.max_evaluations and self.evaluation_limit <= num_evaluations:
+            return STOP_MAX_EVALUATIONS
+        if 0 < self.max_frames <= num_frames:
+            return STOP_MAX_FRAMES
+        if 0 < self.max_wall_seconds <= wall_seconds:
+            return STOP_MAX_WALL_SECONDS
+        if 0 < self.max_cpu_seconds <= cpu_seconds:
+            return STOP_MAX_CPU_SECONDS
+        if 0 < self.plateau_generations <= self.generations_without_improvement:
+            return STOP_PLATEAU
+
+        return None
+
+    def return_unused_evaluations(self, num_evaluations: int, shared_budget: SharedBudget):
+        """
+        Gives the simulations the run did not use to the shared budget. Call once, when the run stops
+        :param num_evaluations: The number of simulations the run used
+        :param shared_budget: The budget shared with the other runs of a sweep
+        """
+        if 0 < self.max_evaluations and num_evaluations < self.evaluation_limit:
+            shared_budget.add(self.evaluation_limit - num_evaluations)
+            self.evaluation_limit = num_evaluations
+
+    def get_state(self) -> Dict:
+        """
+        :return: Everything needed to continue checking the run after it is resumed from a checkpoint
+        """
+        return {"evaluation_limit": self.evaluation_limit,
+                "best_fitness": self.best_fitness,
+                "median_fitness": self.median_fitness,
+                "generations_without_improvement": self.generations_without_improvement}
+
+    def set_state(self, state: Dict):
+        """
+        :param state: The state created by `get_state`
+        """
+        # The limit may have been raised since the checkpoint was saved
+        self.evaluation_limit = max(state["evaluation_limit"], self.max_evaluations)
+        self.best_fitness = state["best_fitness"]
+        self.median_fitness = state["median_fitness"]
+        self.generations_without_improvement = state["generations_without_improvement"]
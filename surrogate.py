@@ -0,0 +1,266 @@
+"""
+Predicts the fitness of genomes from the genomes that have already been simulated, so that only the children predicted
+    to improve the most on their parents are simulated. A random share of the children is always simulated, so that
+    the model keeps learning from children it would not have chosen
+"""
+import math
+from typing import List, Tuple
+
+import numpy
+
+from record_log import RecordLog, read_record_log
+
+
+# The fitness given to children that were not simulated, so that they never replace their parents
+SKIPPED_FITNESS = -math.inf
+
+# One record per generation
+#   `generation`:           The generation number, starting at 1
+#   `children`:             The number of children created
+#   `simulated`:            The number of children simulated, including the random ones
+#   `random`:               The number of children simulated because they were chosen at random
+#   `skipped`:              The number of children that were not simulated
+#   `rank_correlation`:     The rank correlation of the predicted and simulated improvements of the simulated children,
+#                           or `nan` if the model was not used
+#   `sign_accuracy`:        The share of simulated children whose improvement was predicted to be positive or not
+#                           correctly, or `nan` if the model was not used
+#   `seconds_saved`:        The simulation cpu seconds the skipped children would have used, from the run's average
+#   `surrogate_seconds`:    The seconds spent training the model and choosing the children
+SURROGATE_RECORD_DTYPE = numpy.dtype([("generation", "<i4"),
+                                      ("children", "<i4"),
+                                      ("simulated", "<i4"),
+                                      ("random", "<i4"),
+                                      ("skipped", "<i4"),
+                                      ("rank_correlation", "<f8"),
+                                      ("sign_accuracy", "<f8"),
+                                      ("seconds_saved", "<f8"),
+                                      ("surrogate_seconds", "<f8")])
+
+
+def get_rank_correlation(first: numpy.ndarray, second: numpy.ndarray) -> float:
+    """
+    :param first: The first set of values
+    :param second: The second set of values, in the same order
+    :return: The Spearman rank correlation of the values, or `nan` if either set has fewer than two different values
+    """
+    if len(first) < 2 or numpy.all(first == first[0]) or numpy.all(second == second[0]):
+        return math.nan
+
+    first_ranks = numpy.argsort(numpy.argsort(first, kind="stable"), kind="stable")
+    second_ranks = numpy.argsort(numpy.argsort(second, kind="stable"), kind="stable")
+
+    return float(numpy.corrcoef(first_ranks, second_ranks)[0][1])
+
+
+class RidgeSurrogate:
+    """
+    A linear model of fitness over genome vectors, fitted with ridge regression to the most recently simulated genomes
+    """
+    def __init__(self, max_samples: int, regularization: float):
+        """
+        :param max_samples: The most simulated genomes the model is fitted to. The oldest are forgotten first
+        :param regularization: How strongly the model's coefficients are pulled toward zero
+        """
+        self.max_samples = max_samples
+        self.regularization = regularization
+
+        self.genomes: List[numpy.ndarray] = []
+        self.fitness: List[float] = []
+
+        # The coefficient of each genome value, set when the model is fitted
+        self.coefficients = None
+        self.intercept = 0.0
+        self.fitted = False
+
+    def get_num_samples(self) -> int:
+        """
+        :return: The number of simulated genomes the model is fitted to
+        """
+        return len(self.fitness)
+
+    def reset(self):
+        """
+        Forgets every simulated genome, such as when their fitness no longer matches how solutions are simulated
+        """
+        self.genomes = []
+        self.fitness = []
+        self.fitted = False
+
+    def observe(self, genomes: List[numpy.ndarray], fitness: List[float]):
+        """
+        Adds simulated genomes to the model. The model is fitted again the next time it predicts
+        :param genomes: The genome vector of each simulated solution
+        :param fitness: The simulated fitness of each solution
+        """
+        for genome, solution_fitness in zip(genomes, fitness):
+            if math.isfinite(solution_fitness):
+                self.genomes.append(numpy.asarray(genome, dtype=float))
+                self.fitness.append(float(solution_fitness))
+
+        if len(self.fitness) > self.max_samples:
+            del self.genomes[:(len(self.fitness) - self.max_samples)]
+            del self.fitness[:(len(self.fitness) - self.max_samples)]
+
+        self.fitted = False
+
+    def fit(self):
+        """
+        Fits the coefficients to the simulated genomes
+        """
+        genomes = numpy.array(self.genomes)
+        fitness = numpy.array(self.fitness)
+
+        genome_mean = genomes.mean(axis=0)
+        fitness_mean = fitness.mean()
+        centered_genomes = genomes - genome_mean
+
+        self.coefficients = numpy.linalg.solve(centered_genomes.T @ centered_genomes
+                                               + self.regularization * numpy.eye(genomes.shape[1]),
+                                               centered_genomes.T @ (fitness - fitness_mean))
+        self.intercept = fitness_mean - genome_mean @ self.coefficients
+        self.fitted = True
+
+    def predict(self, genomes: numpy.ndarray) -> numpy.ndarray:
+        """
+        :param genomes: Genome vectors, with the shape (genomes, genome length)
+        :return: The predicted fitness of each genome
+        """
+        if not self.fitted:
+            self.fit()
+
+        return genomes @ self.coefficients + self.intercept
+
+
+class SurrogateScreen:
+    """
+    Chooses which children of a generation are simulated, and keeps the totals printed at the end of a run
+    """
+    def __init__(self, controls: dict):
+        """
+        :param controls: The surrogate controls
+        """
+        self.simulate_fraction = controls["simulate_fraction"]
+        self.random_fraction = controls["random_fraction"]
+        self.min_samples = controls["min_samples"]
+
+        self.model = RidgeSurrogate(controls["max_samples"], controls["regularization"])
+
+        self.num_children = 0
+        self.num_skipped = 0
+        self.seconds_saved = 0.0
+        self.surrogate_seconds = 0.0
+
+    def is_ready(self) -> bool:
+        """
+        :return: Whether the model has been fitted to enough genomes to choose children
+        """
+        return self.model.get_num_samples() >= self.min_samples
+
+    def predict_improvements(self, child_genomes: numpy.ndarray, parent_genomes: numpy.ndarray) -> numpy.ndarray:
+        """
+        :param child_genomes: The genome vector of each child, with the shape (children, genome length)
+        :param parent_genomes: The genome vector of each child's parent, in the same order
+        :return: How much fitter than its parent each child is predicted to be
+        """
+        return self.model.predict(child_genomes) - self.model.predict(parent_genomes)
+
+    def choose_children(self, predicted_improvements: numpy.ndarray,
+                        numpy_random: numpy.random.Generator) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Chooses `simulate_fraction` of the children: `random_fraction` of them at random,
+            and the rest by their predicted improvement, largest first
+        :param predicted_improvements: How much fitter than its parent each child is predicted to be
+        :param numpy_random: The random number generator of the run
+        :return: The indices of the children to simulate, in order, and the indices of those chosen at random
+        """
+        num_children = len(predicted_improvements)
+        num_simulated = max(1, math.ceil(self.simulate_fraction * num_children))
+        num_random = min(num_simulated, round(self.random_fraction * num_children))
+
+        random_indices = numpy_random.choice(num_children, size=num_random, replace=False)
+
+        ranked_indices = [index for index in numpy.argsort(-predicted_improvements, kind="stable")
+                          if index not in random_indices]
+        chosen_indices = numpy.concatenate((random_indices, ranked_indices[:(num_simulated - num_random)]))
+
+        return numpy.sort(chosen_indices).astype(int), numpy.sort(random_indices).astype(int)
+
+    def add_generation(self, num_children: int, num_skipped: int, seconds_saved: float, surrogate_seconds: float):
+        """
+        Adds a generation to the totals
+        :param num_children: The number of children created
+        :param num_skipped: The number of children that were not simulated
+        :param seconds_saved: The simulation cpu seconds the skipped children would have used
+        :param surrogate_seconds: The seconds spent training the model and choosing the children
+        """
+        self.num_children += num_children
+        self.num_skipped += num_skipped
+        self.seconds_saved += seconds_saved
+        self.surrogate_seconds += surrogate_seconds
+
+
+class SurrogateLog:
+    """
+    Writes how well the surrogate predicted each generation and how much simulation it saved to a binary record log
+    """
+    def __init__(self, filename: str, overwrite: bool):
+        """
+        :param filename: The file that stores the log
+        :param overwrite: Whether an existing log in the file should be deleted
+        """
+        self.log = RecordLog(filename, SURROGATE_RECORD_DTYPE, overwrite=overwrite)
+
+    def create_generation_record(self, generation: int, num_children: int, num_simulated: int, num_random: int,
+                                 rank_correlation: float, sign_accuracy: float, seconds_saved: float,
+                                 surrogate_seconds: float) -> numpy.ndarray:
+        """
+        Creates the record of one generation. See `SURROGATE_RECORD_DTYPE`
+        :return: The record, as an array of length 1
+        """
+        record = numpy.empty(1, dtype=SURROGATE_RECORD_DTYPE)
+        record["generation"] = generation
+        record["children"] = num_children
+        record["simulated"] = num_simulated
+        record["random"] = num_random
+        record["skipped"] = num_children - num_simulated
+        record["rank_correlation"] = rank_correlation
+        record["sign_accuracy"] = sign_accuracy
+        record["seconds_saved"] = seconds_saved
+        record["surrogate_seconds"] = surrogate_seconds
+
+        return record
+
+    def append(self, record: numpy.ndarray):
+        """
+        Adds a generation's record to the log
+        :param record: The record created by `create_generation_record`
+        """
+        self.log.append(record)
+
+    def flush(self):
+        """
+        Writes any buffered records to the file
+        """
+        self.log.flush()
+
+    def close(self):
+        """
+        Writes any buffered records and closes the file
+        """
+        self.log.close()
+
+
+def export_surrogate_log_to_csv(log_filename: str, csv_filename: str):
+    """
+    Converts a surrogate log to a csv file with a column for each field of `SURROGATE_RECORD_DTYPE`,
+        followed by `net_seconds_saved`, the seconds saved minus the seconds spent on the surrogate
+    :param log_filename: The file that stores the surrogate log
+    :param csv_filename: The csv file to write
+    """
+    records = read_record_log(log_filename, SURROGATE_RECORD_DTYPE)
+
+    with open(csv_filename, "w") as fileout:
+        fileout.write(",".join(SURROGATE_RECORD_DTYPE.names) + ",net_seconds_saved\n")
+
+        for record in records.tolist():
+            fileout.write(",".join(str(value) for value in record) + "," + str(record[-2] - record[-1]) + "\n")
@@ -0,0 +1,273 @@
+"""
+Evolves every combination of replicate, number of legs, cpg mode, and number of frames in `SWEEP_CONTROLS`.
+The jobs are stored on disk so that an interrupted sweep continues where it stopped when it is run again.
+Each job saves its outputs in its own folder in the sweep's folder
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+from evaluation_pool import EvaluationPool
+from optimizers import create_optimizer
+from search import verify_controls
+from stopping import SharedBudget
+import constants as c
+import sim_controls as sc
+
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def create_job_id(run_index: int, num_legs: int, cpg_active: bool, num_frames: int) -> str:
+    """
+    Creates the name that identifies a job in the format
+        `run<index>_<number of legs>_legs_<active/inactive>_cpg_<frames>_frames`.
+        It is also the name of the folder of the job's outputs
+    :return: The job id
+    """
+    if cpg_active:
+        cpg_mode = "active_cpg"
+    else:
+        cpg_mode = "inactive_cpg"
+
+    return "run" + str(run_index) + "_" + str(num_legs) + "_legs_" + cpg_mode + "_" + str(num_frames) + "_frames"
+
+
+def get_curriculum_prerequisites(job: Dict, jobs: List[Dict]) -> List[Dict]:
+    """
+    :param job: A job
+    :param jobs: Every job of the sweep
+    :return: The jobs of the same replicate, cpg mode, and number of frames with fewer legs,
+        which must finish before the job starts if the sweep is a curriculum
+    """
+    return [other_job for other_job in jobs
+            if other_job["run_index"] == job["run_index"] and other_job["cpg"] == job["cpg"]
+            and other_job["num_frames"] == job["num_frames"] and other_job["num_legs"] < job["num_legs"]]
+
+
+def create_sweep_jobs(controls: Dict) -> List[Dict]:
+    """
+    Creates a job for every combination of replicate, number of legs, cpg mode, and number of frames
+    :param controls: The sweep controls
+    :return: The jobs, each a dictionary of its settings and progress
+    """
+    jobs = []
+    for replicate in range(controls["replicates"]):
+        run_index = controls["first_run_index"] + replicate
+
+        for num_frames in controls["num_frames"]:
+            for cpg_mode in controls["cpg_modes"]:
+                for num_legs in controls["leg_nums"]:
+                    jobs.append({"job_id": create_job_id(run_index, num_legs, cpg_mode, num_frames),
+                                 "run_index": run_index,
+                                 "num_legs": num_legs,
+                                 "cpg": cpg_mode,
+                                 "num_frames": num_frames,
+                                 "generations": controls["generations"],
+                                 "pop_size": controls["pop_size"],
+                                 "status": JOB_PENDING,
+                                 "wall_time": 0.0,
+                                 "evaluations": 0,
+                                 "stop_reason": None})
+
+    return jobs
+
+
+class JobQueue:
+    """
+    The jobs of a sweep and the simulations they have given up, saved to disk every time a job's progress changes
+    """
+    def __init__(self, filename: str, jobs: List[Dict]):
+        """
+        Loads the queue if it has already been saved. Jobs that are in the saved queue keep their progress,
+            and jobs that are not are added to it
+        :param filename: The queue file
+        :param jobs: The jobs created by `create_sweep_jobs`
+        """
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.shared_budget = SharedBudget()
+
+        saved_jobs = {}
+        if os.path.exists(self.filename):
+            with open(self.filename, "r") as filein:
+                saved_queue = json.load(filein)
+
+            for job in saved_queue["jobs"]:
+                saved_jobs[job["job_id"]] = job
+            self.shared_budget.add(saved_queue["shared_evaluations"])
+
+        self.jobs = []
+        for job in jobs:
+            if job["job_id"] in saved_jobs:
+                job = saved_jobs[job["job_id"]]
+            self.jobs.append(job)
+
+        self.save()
+
+    def save(self):
+        """
+        Writes the queue to a temporary file that then replaces the old queue, so it is never left partially written
+        """
+        folder = os.path.dirname(self.filename)
+        if folder != "":
+            os.makedirs(folder, exist_ok=True)
+
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w") as fileout:
+            json.dump({"jobs": self.jobs, "shared_evaluations": self.shared_budget.available_evaluations},
+                      fileout, indent=2)
+
+        os.replace(tmp_filename, self.filename)
+
+    def get_unfinished_jobs(self) -> List[Dict]:
+        """
+        Gets every job that has not finished. Jobs that were running or failed when the sweep stopped are included
+        :return: The unfinished jobs
+        """
+        return [job for job in self.jobs if job["status"] != JOB_DONE]
+
+    def update_job(self, job: Dict, **progress):
+        """
+        Changes a job's progress and saves the queue
+        :param job: The job to update
+        :param progress: The fields of the job to change
+        """
+        with self.lock:
+            job.update(progress)
+            self.save()
+
+
+def run_sweep(controls: Dict, parallel: bool):
+    """
+    Runs every unfinished job of the sweep. Jobs share one set of evaluation workers
+    :param controls: The sweep controls
+    :param parallel: Whether each evaluation should run as a separate process
+    """
+    sweep_folder = os.path.join(c.SWEEPS_FOLDER_NAME, controls["sweep_name"])
+    queue = JobQueue(os.path.join(sweep_folder, "jobs.json"), create_sweep_jobs(controls))
+    unfinished_jobs = queue.get_unfinished_jobs()
+
+    print("*** " + str(len(queue.jobs) - len(unfinished_jobs)) + "/" + str(len(queue.jobs))
+          + " sweep jobs already done ***")
+
+    if len(unfinished_jobs) == 0:
+        return
+
+    core_budget = controls["core_budget"]
+    if core_budget <= 0:
+        core_budget = os.cpu_count()
+
+    # Each run waits for its whole generation to be evaluated, so one more run than fills the workers keeps them busy
+    max_concurrent_jobs = controls["max_concurrent_jobs"]
+    if max_concurrent_jobs <= 0:
+        max_concurrent_jobs = core_budget // controls["pop_size"] + 1
+
+    pool = EvaluationPool(max_workers=core_budget, parallel=parallel)
+
+    waiting_jobs = list(unfinished_jobs)
+    # The jobs that have finished, successfully or not, since the sweep was started
+    finished_job_ids = set()
+    jobs_changed = threading.Condition()
+
+    def is_job_ready(job: Dict) -> bool:
+        """
+        :param job: A waiting job
+        :return: Whether the job can start. In a curriculum, every job with fewer legs must have finished first
+        """
+        if not controls["curriculum"]:
+            return True
+
+        return all(prerequisite["status"] == JOB_DONE or prerequisite["job_id"] in finished_job_ids
+                   for prerequisite in get_curriculum_prerequisites(job, queue.jobs))
+
+    def take_next_job():
+        """
+        Waits until a job is ready to start
+        :return: The first waiting job that is ready, or `None` if no jobs are waiting
+        """
+        with jobs_changed:
+            while len(waiting_jobs) > 0:
+                for index, waiting_job in enumerate(waiting_jobs):
+                    if is_job_ready(waiting_job):
+                        return waiting_jobs.pop(index)
+
+                jobs_changed.wait()
+
+            return None
+
+    def run_jobs():
+        """
+        Runs on each job thread. Repeatedly takes the next unfinished job and evolves it
+        """
+        while True:
+            job = take_next_job()
+            if job is None:
+                return
+
+            # Jobs that were interrupted continue from their checkpoints
+            resume = job["status"] != JOB_PENDING
+            queue.update_job(job, status=JOB_RUNNING)
+
+            start_time = time.time()
+            experiment = None
+            try:
+                experiment = create_optimizer(num_generations=job["generations"], population_size=job["pop_size"],
+                                              num_legs=job["num_legs"], cpg_active=job["cpg"], parallel=parallel,
+                                              run_index=job["run_index"], resume=resume,
+                                              num_frames=job["num_frames"],
+                                              output_folder=os.path.join(sweep_folder, job["job_id"]))
+                experiment.pool = pool
+                if controls["share_budget"]:
+                    experiment.shared_budget = queue.shared_budget
+
+                experiment.evolve()
+                status = JOB_DONE
+            except Exception as error:
+                print("*** Sweep job " + job["job_id"] + " failed: " + repr(error) + " ***")
+                status = JOB_FAILED
+
+            if experiment is not None:
+                evaluations = experiment.num_evaluations
+                stop_reason = experiment.stop_reason
+            else:
+                evaluations = job["evaluations"]
+                stop_reason = None
+
+            queue.update_job(job, status=status, wall_time=(job["wall_time"] + time.time() - start_time),
+                             evaluations=evaluations, stop_reason=stop_reason)
+
+            with jobs_changed:
+                finished_job_ids.add(job["job_id"])
+                jobs_changed.notify_all()
+
+            print("*** Sweep job " + job["job_id"] + " " + status + " in "
+                  + str(round(job["wall_time"], 1)) + " seconds ***")
+
+    threads = []
+    for _ in range(min(max_concurrent_jobs, len(unfinished_jobs))):
+        thread = threading.Thread(target=run_jobs, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+    pool.close()
+
+    with open(os.path.join(sweep_folder, "scheduler.json"), "w") as fileout:
+        json.dump(pool.get_stats(), fileout, indent=2)
+
+    num_done = len([job for job in queue.jobs if job["status"] == JOB_DONE])
+    print("*** " + str(num_done) + "/" + str(len(queue.jobs)) + " sweep jobs done ***")
+
+
+if __name__ == "__main__":
+    verify_controls()
+
+    run_sweep(sc.SWEEP_CONTROLS, parallel=sc.SIMULATION_CONTROLS["parallel_mode"])
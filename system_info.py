@@ -3,7 +3,3 @@ Set these values to the proper ones for your system.
 """
 # Leave as `True` for Windows systems, set to false for mac or linux
 WINDOWS = True
-# The filepath of the current project folder. Must include separator character at end of string
-#   On windows, the filepath must use '\\' as the seperator
-PROJECT_FILEPATH = "C:\\One Drive\\OneDrive\\[1] Documents\\[1] College\\[1] Senior Year\\Semester 2\\" \
-                   "Evolutionary Robotics\\[Final Project]\\Evolutionary Experiment\\"
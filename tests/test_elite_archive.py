@@ -0,0 +1,40 @@
+import threading
+
+import numpy
+
+from elite_archive import add_elites, load_elites
+
+
+def test_add_elites_from_several_threads_keeps_every_update(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    num_legs = 4
+    num_threads = 8
+    elites_per_thread = 3
+    generator = numpy.random.default_rng(0)
+    weights = generator.uniform(-1, 1, size=(num_threads, elites_per_thread, 2 * num_legs + 1, 2 * num_legs))
+    fitness = generator.uniform(0, 1, size=(num_threads, elites_per_thread))
+
+    errors = []
+    start = threading.Barrier(num_threads)
+
+    def add_thread_elites(thread_index: int):
+        try:
+            start.wait()
+            add_elites(num_legs, True, weights[thread_index], numpy.full(elites_per_thread, thread_index + 1),
+                       fitness[thread_index], max_elites=num_threads * elites_per_thread)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=add_thread_elites, args=(thread_index,)) for thread_index in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+    archived_weights, archived_cpg_rates, archived_fitness = load_elites(num_legs, True)
+    assert len(archived_fitness) == num_threads * elites_per_thread
+    assert numpy.array_equal(archived_fitness, numpy.sort(fitness.ravel())[::-1])
+    assert sorted(tmp_path.joinpath("elites").iterdir()) == [tmp_path / "elites" / "elites(4_legs, active_cpg).npz"]
@@ -0,0 +1,69 @@
+"""
+Describes the trials each solution is simulated for. With more than one trial, every solution is simulated from the
+    same set of perturbed start positions, orientations, and ground frictions, and its fitness combines the distance
+    it walked in each trial
+"""
+from typing import List, Tuple
+
+import numpy
+
+
+# How the fitness of each trial is combined
+AGGREGATE_MEAN = "mean"
+AGGREGATE_MEDIAN = "median"
+AGGREGATE_MIN = "min"
+# The mean minus the standard deviation, which favors solutions that walk about as far in every trial
+AGGREGATE_MEAN_MINUS_STD = "mean_minus_std"
+
+AGGREGATES = [AGGREGATE_MEAN, AGGREGATE_MEDIAN, AGGREGATE_MIN, AGGREGATE_MEAN_MINUS_STD]
+
+# Ground friction is never scaled below this share of its usual value
+MIN_FRICTION_SCALE = 0.05
+
+
+def get_num_trials(controls: dict) -> int:
+    """
+    :param controls: The robustness controls
+    :return: How many times each solution is simulated
+    """
+    return max(1, controls["num_trials"])
+
+
+def create_trial_conditions(controls: dict) -> List[Tuple[float, float, float, float]]:
+    """
+    Creates the conditions of each trial. The conditions only depend on the controls, so every solution faces the same
+        trials. A single trial is never perturbed
+    :param controls: The robustness controls
+    :return: The x offset and y offset of the robot's start position, the rotation of its start orientation about the
+        vertical axis in radians, and the scale of the ground's friction in each trial
+    """
+    num_trials = get_num_trials(controls)
+    if num_trials == 1:
+        return [(0.0, 0.0, 0.0, 1.0)]
+
+    generator = numpy.random.default_rng(controls["seed"])
+
+    offsets = generator.uniform(-controls["position_range"], controls["position_range"], size=(num_trials, 2))
+    yaws = generator.uniform(-controls["yaw_range"], controls["yaw_range"], size=num_trials)
+    friction_scales = numpy.maximum(MIN_FRICTION_SCALE,
+                                    1 + generator.uniform(-controls["friction_range"], controls["friction_range"],
+                                                          size=num_trials))
+
+    return [(float(x_offset), float(y_offset), float(yaw), float(friction_scale))
+            for (x_offset, y_offset), yaw, friction_scale in zip(offsets, yaws, friction_scales)]
+
+
+def aggregate_trial_fitness(trial_fitness: List[float], aggregate: str) -> float:
+    """
+    :param trial_fitness: The fitness of each trial
+    :param aggregate: The name of the statistic to combine them with, one of `AGGREGATES`
+    :return: The fitness of the solution
+    """
+    if aggregate == AGGREGATE_MEDIAN:
+        return float(numpy.median(trial_fitness))
+    elif aggregate == AGGREGATE_MIN:
+        return float(numpy.min(trial_fitness))
+    elif aggregate == AGGREGATE_MEAN_MINUS_STD:
+        return float(numpy.mean(trial_fitness) - numpy.std(trial_fitness))
+    else:
+        return float(numpy.mean(trial_fitness))
@@ -0,0 +1,288 @@
+"""
+Searches for the settings of how solutions are initialized and mutated with successive halving.
+Every configuration in `TUNER_CONTROLS` is first evolved for a few generations. In each following round, only the
+    fittest share of the configurations is evolved further, continuing from its checkpoint, so the whole search costs
+    a small multiple of one full run. Every run shares one set of evaluation workers.
+The configurations, the jobs of each round, and a leaderboard are saved in the tuning's folder, and an interrupted
+    tuning continues where it stopped when it is run again
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import numpy
+
+from evaluation_pool import EvaluationPool
+from optimizers import create_optimizer
+from search import verify_controls
+from solution import get_default_hyperparameters
+from sweep import JOB_DONE, JOB_FAILED, JOB_PENDING, JOB_RUNNING, JobQueue
+import constants as c
+import sim_controls as sc
+
+
+def create_configs(controls: Dict) -> List[Dict]:
+    """
+    Samples the configurations to be compared. Each setting in `search_space` is drawn uniformly from its range,
+        and every other setting keeps its default value
+    :param controls: The tuner controls
+    :return: The id and settings of each configuration
+    """
+    generator = numpy.random.default_rng(controls["seed"])
+
+    configs = []
+    if controls["include_defaults"]:
+        configs.append(get_default_hyperparameters())
+
+    while len(configs) < controls["num_configs"]:
+        hyperparameters = get_default_hyperparameters()
+
+        for name, (low, high) in sorted(controls["search_space"].items()):
+            hyperparameters[name] = int(generator.integers(low, high, endpoint=True))
+
+        configs.append(hyperparameters)
+
+    return [{"config_id": "config" + str(index), "hyperparameters": hyperparameters}
+            for index, hyperparameters in enumerate(configs)]
+
+
+def get_round_generations(controls: Dict, round_index: int) -> int:
+    """
+    :param controls: The tuner controls
+    :param round_index: The index of the round
+    :return: How many generations each configuration has evolved for by the end of the round.
+        The number grows by the inverse of `promote_fraction` every round
+    """
+    generations = int(round(controls["min_generations"] / controls["promote_fraction"] ** round_index))
+
+    return min(generations, controls["max_generations"])
+
+
+def create_round_jobs(controls: Dict, round_index: int, config_ids: List[str]) -> List[Dict]:
+    """
+    :param controls: The tuner controls
+    :param round_index: The index of the round
+    :param config_ids: The configurations evolved in the round
+    :return: The jobs of the round, each a dictionary of its settings and progress
+    """
+    return [{"job_id": config_id + "_round" + str(round_index),
+             "config_id": config_id,
+             "generations": get_round_generations(controls, round_index),
+             "status": JOB_PENDING,
+             "wall_time": 0.0,
+             "evaluations": 0,
+             "stop_reason": None,
+             "completed_generations": 0,
+             "best_fitness": None} for config_id in config_ids]
+
+
+def get_promoted_config_ids(controls: Dict, jobs: List[Dict]) -> List[str]:
+    """
+    :param controls: The tuner controls
+    :param jobs: The jobs of a finished round
+    :return: The fittest `promote_fraction` of the round's configurations, fittest first.
+        Configurations whose run failed are never promoted
+    """
+    finished_jobs = [job for job in jobs if job["status"] == JOB_DONE]
+    finished_jobs.sort(key=lambda job: job["best_fitness"], reverse=True)
+
+    num_promoted = max(1, int(len(jobs) * controls["promote_fraction"]))
+
+    return [job["config_id"] for job in finished_jobs[:num_promoted]]
+
+
+def run_round(controls: Dict, queue: JobQueue, configs: Dict[str, Dict], tuning_folder: str, pool: EvaluationPool,
+              parallel: bool, max_concurrent_runs: int):
+    """
+    Evolves every unfinished configuration of a round
+    :param controls: The tuner controls
+    :param queue: The jobs of the round
+    :param configs: The settings of each configuration, by id
+    :param tuning_folder: The folder of the tuning's outputs
+    :param pool: The evaluation workers shared by every run
+    :param parallel: Whether each evaluation should run as a separate process
+    :param max_concurrent_runs: The most runs that can evolve at once
+    """
+    waiting_jobs = queue.get_unfinished_jobs()
+    waiting_jobs_lock = threading.Lock()
+
+    def run_jobs():
+        """
+        Runs on each job thread. Repeatedly takes the next unfinished job and evolves it
+        """
+        while True:
+            with waiting_jobs_lock:
+                if len(waiting_jobs) == 0:
+                    return
+                job = waiting_jobs.pop(0)
+
+            queue.update_job(job, status=JOB_RUNNING)
+
+            start_time = time.time()
+            experiment = None
+            try:
+                # Every round continues the run's checkpoint from the round before, so a promoted configuration only
+                #   evolves the generations it has not yet
+                experiment = create_optimizer(num_generations=job["generations"], population_size=controls["pop_size"],
+                                              num_legs=controls["num_legs"], cpg_active=controls["cpg"],
+                                              parallel=parallel, run_index=controls["run_index"], resume=True,
+                                              num_frames=controls["num_frames"],
+                                              output_folder=os.path.join(tuning_folder, job["config_id"]),
+                                              hyperparameters=configs[job["config_id"]]["hyperparameters"])
+                experiment.pool = pool
+
+                experiment.evolve()
+                status = JOB_DONE
+            except Exception as error:
+                print("*** Tuning job " + job["job_id"] + " failed: " + repr(error) + " ***")
+                status = JOB_FAILED
+
+            if experiment is not None and status == JOB_DONE:
+                summary = experiment.get_run_summary()
+                queue.update_job(job, status=status, wall_time=(job["wall_time"] + time.time() - start_time),
+                                 evaluations=summary["evaluations"], stop_reason=summary["stop_reason"],
+                                 completed_generations=summary["completed_generations"],
+                                 best_fitness=summary["best_fitness"])
+            else:
+                queue.update_job(job, status=status, wall_time=(job["wall_time"] + time.time() - start_time))
+
+            print("*** Tuning job " + job["job_id"] + " " + status + " in "
+                  + str(round(job["wall_time"], 1)) + " seconds ***")
+
+    threads = []
+    for _ in range(min(max_concurrent_runs, len(waiting_jobs))):
+        thread = threading.Thread(target=run_jobs, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+
+def create_leaderboard(configs: Dict[str, Dict], rounds: List[List[Dict]]) -> List[Dict]:
+    """
+    Ranks the configurations by how many rounds they reached, then by their fitness in the last round they reached
+    :param configs: The settings of each configuration, by id
+    :param rounds: The jobs of each round
+    :return: The result of each configuration, best first
+    """
+    results = {}
+    for round_index, jobs in enumerate(rounds):
+        for job in jobs:
+            results[job["config_id"]] = {"config_id": job["config_id"],
+                                         "rounds": round_index + 1,
+                                         "status": job["status"],
+                                         "completed_generations": job["completed_generations"],
+                                         "best_fitness": job["best_fitness"],
+                                         "hyperparameters": configs[job["config_id"]]["hyperparameters"]}
+
+    def get_rank_key(result: Dict):
+        """
+        :param result: The result of a configuration
+        :return: A key that sorts the best configuration first
+        """
+        if result["best_fitness"] is None:
+            fitness = -math.inf
+        else:
+            fitness = result["best_fitness"]
+
+        return -result["rounds"], -fitness
+
+    return sorted(results.values(), key=get_rank_key)
+
+
+def print_leaderboard(leaderboard: List[Dict]):
+    """
+    Prints the result of each configuration, best first
+    :param leaderboard: The leaderboard created by `create_leaderboard`
+    """
+    print("*** Tuning leaderboard ***")
+
+    for rank, result in enumerate(leaderboard):
+        if result["best_fitness"] is None:
+            fitness = result["status"]
+        else:
+            fitness = str(round(result["best_fitness"], 4))
+
+        settings = ", ".join(name + "=" + str(value) for name, value in sorted(result["hyperparameters"].items()))
+
+        print(str(rank + 1) + ". " + result["config_id"] + ": " + fitness + " after "
+              + str(result["completed_generations"]) + " generations (" + settings + ")")
+
+
+def run_tuning(controls: Dict, parallel: bool):
+    """
+    Runs every round of the tuning that has not finished, then saves and prints the leaderboard
+    :param controls: The tuner controls
+    :param parallel: Whether each evaluation should run as a separate process
+    """
+    # Without checkpoints, every round would evolve each promoted configuration again from its first generation
+    if not sc.CHECKPOINT_CONTROLS["active"]:
+        print("*** The tuner continues promoted runs from their checkpoints. Set active in CHECKPOINT_CONTROLS to True "
+              "before tuning. ***")
+        sys.exit(-1)
+
+    tuning_folder = os.path.join(c.TUNING_FOLDER_NAME, controls["tuning_name"])
+    os.makedirs(tuning_folder, exist_ok=True)
+
+    # The configurations are kept, so a continued tuning compares the same ones
+    configs_filename = os.path.join(tuning_folder, "configs.json")
+    if os.path.exists(configs_filename):
+        with open(configs_filename, "r") as filein:
+            config_list = json.load(filein)
+    else:
+        config_list = create_configs(controls)
+        with open(configs_filename, "w") as fileout:
+            json.dump(config_list, fileout, indent=2)
+
+    configs = {config["config_id"]: config for config in config_list}
+
+    core_budget = controls["core_budget"]
+    if core_budget <= 0:
+        core_budget = os.cpu_count()
+
+    # Each run waits for its whole generation to be evaluated, so one more run than fills the workers keeps them busy
+    max_concurrent_runs = controls["max_concurrent_runs"]
+    if max_concurrent_runs <= 0:
+        max_concurrent_runs = core_budget // controls["pop_size"] + 1
+
+    pool = EvaluationPool(max_workers=core_budget, parallel=parallel)
+
+    rounds = []
+    config_ids = list(configs)
+    round_index = 0
+    try:
+        while True:
+            queue = JobQueue(os.path.join(tuning_folder, "round" + str(round_index) + ".json"),
+                             create_round_jobs(controls, round_index, config_ids))
+
+            print("*** Tuning round " + str(round_index) + ": " + str(len(config_ids)) + " configurations for "
+                  + str(get_round_generations(controls, round_index)) + " generations ***")
+
+            run_round(controls, queue, configs, tuning_folder, pool, parallel, max_concurrent_runs)
+            rounds.append(queue.jobs)
+
+            config_ids = get_promoted_config_ids(controls, queue.jobs)
+            if len(config_ids) <= 1 or get_round_generations(controls, round_index) >= controls["max_generations"]:
+                break
+
+            round_index += 1
+    finally:
+        pool.close()
+
+    leaderboard = create_leaderboard(configs, rounds)
+
+    with open(os.path.join(tuning_folder, "leaderboard.json"), "w") as fileout:
+        json.dump(leaderboard, fileout, indent=2)
+
+    print_leaderboard(leaderboard)
+
+
+if __name__ == "__main__":
+    verify_controls()
+
+    run_tuning(sc.TUNER_CONTROLS, parallel=sc.SIMULATION_CONTROLS["parallel_mode"])
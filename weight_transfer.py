@@ -0,0 +1,129 @@
+"""
+Maps an evolved weight matrix from one number of legs to another, so that a robot with more legs can start from
+    what a robot with fewer legs has learned.
+    Each sensor and motor neuron keeps its side and part (upper leg or hip, lower leg or knee), and the legs are
+    matched by where they are placed along the torso. The weights of a leg between two legs of the original robot
+    are interpolated from both
+"""
+import sys
+
+import numpy
+
+from genome_encoding import get_neuron_leg
+
+
+def get_leg_placements(num_legs: int) -> numpy.ndarray:
+    """
+    Finds where the legs at each position along a side are placed on the torso, in the same order as
+        `Solution.create_body`. The first half of the legs are placed toward one end, starting next to the middle
+        of the torso, and the rest toward the other end, also starting next to the middle.
+        If there is an odd number of legs on a side, the middle one is placed at the middle of the torso
+    :param num_legs: The number of legs of the robot
+    :return: The position of each leg along the torso, from `1` at the end of the first legs to `-1` at the other end.
+        A robot with one leg on each side has it at `0`
+    """
+    legs_per_side = num_legs // 2
+    legs_per_region = legs_per_side // 2
+
+    placements = numpy.empty(legs_per_side)
+    for position in range(legs_per_side):
+        if legs_per_side % 2 == 0:
+            if position < legs_per_region:
+                placements[position] = position + 0.5
+            else:
+                placements[position] = -(position - legs_per_region + 0.5)
+        else:
+            if position < legs_per_region:
+                placements[position] = position + 1
+            elif position == legs_per_region:
+                placements[position] = 0
+            else:
+                placements[position] = -(position - legs_per_region)
+
+    furthest_placement = numpy.abs(placements).max()
+    if furthest_placement > 0:
+        placements /= furthest_placement
+
+    return placements
+
+
+def get_leg_interpolation(source_num_legs: int, target_num_legs: int) -> numpy.ndarray:
+    """
+    Matches each leg position of the target robot to the one or two leg positions of the source robot placed closest
+        to it on the torso
+    :param source_num_legs: The number of legs of the robot the weights were evolved for
+    :param target_num_legs: The number of legs of the robot the weights are transferred to
+    :return: How much each source leg position contributes to each target leg position,
+        with the shape (target positions, source positions). Each row adds up to `1`
+    """
+    source_placements = get_leg_placements(source_num_legs)
+    target_placements = get_leg_placements(target_num_legs)
+
+    source_order = numpy.argsort(source_placements, kind="stable")
+    sorted_placements = source_placements[source_order]
+
+    interpolation = numpy.zeros((len(target_placements), len(source_placements)))
+    for target_position, placement in enumerate(target_placements):
+        if len(sorted_placements) == 1 or placement <= sorted_placements[0]:
+            interpolation[target_position][source_order[0]] = 1
+        elif placement >= sorted_placements[-1]:
+            interpolation[target_position][source_order[-1]] = 1
+        else:
+            upper_index = int(numpy.searchsorted(sorted_placements, placement))
+            lower_placement = sorted_placements[upper_index - 1]
+            upper_placement = sorted_placements[upper_index]
+
+            upper_share = (placement - lower_placement) / (upper_placement - lower_placement)
+            interpolation[target_position][source_order[upper_index - 1]] = 1 - upper_share
+            interpolation[target_position][source_order[upper_index]] = upper_share
+
+    return interpolation
+
+
+def get_neuron_interpolation(source_num_legs: int, target_num_legs: int, include_extra_row: bool) -> numpy.ndarray:
+    """
+    Matches each sensor or motor neuron of the target robot to the neurons of the source robot with the same side
+        and part on the closest legs
+    :param source_num_legs: The number of legs of the robot the weights were evolved for
+    :param target_num_legs: The number of legs of the robot the weights are transferred to
+    :param include_extra_row: Whether the neurons are the rows of the weight matrix, whose extra last row is matched
+        to the source's extra row
+    :return: How much each source neuron contributes to each target neuron, with the shape
+        (target neurons, source neurons)
+    """
+    leg_interpolation = get_leg_interpolation(source_num_legs, target_num_legs)
+
+    interpolation = numpy.zeros((2 * target_num_legs + int(include_extra_row),
+                                 2 * source_num_legs + int(include_extra_row)))
+
+    for target_neuron in range(2 * target_num_legs):
+        side, target_position, part = get_neuron_leg(target_neuron, target_num_legs)
+
+        for source_position, share in enumerate(leg_interpolation[target_position]):
+            source_neuron = side * source_num_legs + source_position * 2 + part
+            interpolation[target_neuron][source_neuron] = share
+
+    if include_extra_row:
+        interpolation[-1][-1] = 1
+
+    return interpolation
+
+
+def transfer_weights(weights: numpy.ndarray, target_num_legs: int) -> numpy.ndarray:
+    """
+    Creates the weight matrix of a robot with a different number of legs from an evolved weight matrix
+    :param weights: The evolved weight matrix, with the shape (2 * legs + 1, 2 * legs)
+    :param target_num_legs: The number of legs of the robot the weights are transferred to
+    :return: The transferred weight matrix, with the shape (2 * target legs + 1, 2 * target legs)
+    """
+    source_num_legs = weights.shape[1] // 2
+
+    row_interpolation = get_neuron_interpolation(source_num_legs, target_num_legs, include_extra_row=True)
+    col_interpolation = get_neuron_interpolation(source_num_legs, target_num_legs, include_extra_row=False)
+
+    return row_interpolation @ numpy.asarray(weights, dtype=float) @ col_interpolation.T
+
+
+# Transfers a saved weight matrix: `python weight_transfer.py <weights file> <number of legs> <output weights file>`
+if __name__ == "__main__":
+    numpy.save(sys.argv[3], transfer_weights(numpy.load(sys.argv[1]), int(sys.argv[2])))
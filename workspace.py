@@ -0,0 +1,115 @@
+"""
+Gives each run its own folders so that several runs can evolve on the same machine without touching each other's files
+"""
+import os
+import shutil
+import tempfile
+
+import constants as c
+
+
+def create_world_filename(workspace_name: str) -> str:
+    """
+    :param workspace_name: The name of the workspace
+    :return: The sdf file of the workspace's world
+    """
+    return os.path.join(c.OBJECTS_FOLDER_NAME, workspace_name, "world.sdf")
+
+
+def create_body_filename(workspace_name: str, num_legs: int) -> str:
+    """
+    Each morphology has its own body file so that robots with different numbers of legs can be simulated at once
+    :param workspace_name: The name of the workspace
+    :param num_legs: The number of legs of the robot
+    :return: The urdf file of the robot's body
+    """
+    return os.path.join(c.OBJECTS_FOLDER_NAME, workspace_name, "body" + str(num_legs) + ".urdf")
+
+
+def create_brain_filename(workspace_name: str, solution_id: int) -> str:
+    """
+    :param workspace_name: The name of the workspace
+    :param solution_id: The id of the solution
+    :return: The nndf file of the solution's brain
+    """
+    return os.path.join(c.OBJECTS_FOLDER_NAME, workspace_name, "brain" + str(solution_id) + ".nndf")
+
+
+def create_fitness_filename(workspace_name: str, solution_id: int) -> str:
+    """
+    :param workspace_name: The name of the workspace
+    :param solution_id: The id of the solution
+    :return: The file the solution's fitness is written to once its simulation has finished
+    """
+    return os.path.join(c.FITNESS_FOLDER_NAME, workspace_name, "fitness" + str(solution_id) + ".txt")
+
+
+def create_tmp_fitness_filename(workspace_name: str, solution_id: int) -> str:
+    """
+    :param workspace_name: The name of the workspace
+    :param solution_id: The id of the solution
+    :return: The file the solution's fitness is written to before it is renamed to its fitness file
+    """
+    return os.path.join(c.FITNESS_FOLDER_NAME, workspace_name, "tmp" + str(solution_id) + ".txt")
+
+
+def create_solutions_folder(output_folder: str, run_index: int) -> str:
+    """
+    :param output_folder: The folder that holds the run's output folders
+    :param run_index: The index of the evolutionary run
+    :return: The folder the run's final solutions are saved in
+    """
+    return os.path.join(output_folder, c.SOLUTIONS_FOLDER_NAME, "run" + str(run_index))
+
+
+class Workspace:
+    """
+    The folders used by a single run.
+        Intermediate files (the world, body, and brain files and the fitness of each simulation) are kept in
+        folders in `objects` and `fitness` that are created for the run and deleted once it has finished.
+        Outputs (`data`, `solutions`, `lineage`, and `checkpoints`) are kept in the run's output folder.
+        Saved solutions are kept in a folder for the run's index
+    """
+    def __init__(self, name_prefix: str, run_index: int, output_folder: str = ""):
+        """
+        :param name_prefix: The start of the workspace's name. A unique ending is added to it
+        :param run_index: The index of the evolutionary run
+        :param output_folder: The folder that holds the run's output folders. Defaults to the project folder
+        """
+        self.output_folder = output_folder
+
+        self.data_folder = os.path.join(self.output_folder, c.DATA_FOLDER_NAME)
+        self.solutions_folder = create_solutions_folder(self.output_folder, run_index)
+        self.lineage_folder = os.path.join(self.output_folder, c.LINEAGE_FOLDER_NAME)
+        self.checkpoints_folder = os.path.join(self.output_folder, c.CHECKPOINTS_FOLDER_NAME)
+
+        for folder in [self.data_folder, self.solutions_folder, self.lineage_folder, self.checkpoints_folder]:
+            os.makedirs(folder, exist_ok=True)
+
+        # The name of a new, empty folder in `objects` is unique even between runs started by separate processes
+        os.makedirs(c.OBJECTS_FOLDER_NAME, exist_ok=True)
+        self.name = os.path.basename(tempfile.mkdtemp(prefix=(name_prefix + "_"), dir=c.OBJECTS_FOLDER_NAME))
+
+        self.create_intermediate_folders()
+
+        self.world_filename = create_world_filename(self.name)
+
+    def create_intermediate_folders(self):
+        """
+        Creates the folders for intermediate files, if they do not already exist
+        """
+        os.makedirs(os.path.join(c.OBJECTS_FOLDER_NAME, self.name), exist_ok=True)
+        os.makedirs(os.path.join(c.FITNESS_FOLDER_NAME, self.name), exist_ok=True)
+
+    def remove_intermediate_folders(self):
+        """
+        Deletes the folders for intermediate files and everything in them
+        """
+        shutil.rmtree(os.path.join(c.OBJECTS_FOLDER_NAME, self.name), ignore_errors=True)
+        shutil.rmtree(os.path.join(c.FITNESS_FOLDER_NAME, self.name), ignore_errors=True)
+
+    def __deepcopy__(self, memo):
+        """
+        Copies of a solution share the workspace of the original
+        """
+        return self
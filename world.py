@@ -1,6 +1,6 @@
 import pybullet as p
 
-from constants import WORLD_FILENAME
+from workspace import create_world_filename
 import safe_file_access as sfa
 
 
@@ -8,6 +8,6 @@ class World:
     """
     Creates the world of a simulation
     """
-    def __init__(self):
-        sfa.safe_load_sdf(WORLD_FILENAME)
+    def __init__(self, workspace_name):
+        sfa.safe_load_sdf(create_world_filename(workspace_name))
         self.planeId = p.loadURDF("plane.urdf")